@@ -1,18 +1,21 @@
 # app/__init__.py
-import os, click, re
+import os, click, re, uuid
 from flask import Flask, jsonify, request
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from flask.cli import with_appcontext
 from datetime import timedelta
 from dotenv import load_dotenv
-from werkzeug.security import generate_password_hash
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 from .extensions import db, jwt, migrate, mail
 from .seed import seed_roles_and_superadmin
-from .routes import auth, category, comment, contact, post, user, watched, google_auth
+from .routes import auth, category, comment, contact, images, media, post, user, watched, google_auth
 from .error import bp as errors
-from .models.user import User  # Import User model for lookup
+from .utils import (
+    google_oidc, google_revoke, identity, image_worker, outbound, outbox, passwords, rate_limit,
+    response_cache, session_cache,
+)
 
 def create_app():
     load_dotenv()
@@ -22,7 +25,7 @@ def create_app():
 
     app.config["IMAGE_BASE_URL"] = os.getenv(
         "IMAGE_BASE_URL",
-        "http://localhost:5000/static/uploads/"
+        "http://localhost:5000/media/"
     )
 
     # --- JWT Configuration ---
@@ -42,6 +45,15 @@ def create_app():
     jwt.init_app(app)
     migrate.init_app(app, db)
     mail.init_app(app)
+    response_cache.init_app(app)
+    session_cache.init_app(app)
+    rate_limit.init_app(app)
+    image_worker.init_app(app)
+    outbound.init_app(app)
+    outbox.init_app(app)
+    google_oidc.init_app(app)
+    google_revoke.init_app(app)
+    passwords.init_app(app)
 
     register_commands(app)
 
@@ -54,22 +66,8 @@ def create_app():
         # Allow passing either the user object or the ID directly
         return user.id if hasattr(user, 'id') else user
 
-    @jwt.user_lookup_loader
-    def user_lookup_callback(_jwt_header, jwt_data):
-        """
-        Automatically loads the user from the DB on every protected request.
-        The identity (sub) is the user ID.
-        """
-        identity = jwt_data["sub"]
-        user = User.query.get(identity)
-        
-        # 🛡️ THE SECURITY KICK:
-        # If user is blocked, this returns None or we can handle it in the 
-        # unauthorized loader. However, checking it here is most efficient.
-        if user and user.is_blocked:
-            return None # This triggers the @jwt.unauthorized_loader
-            
-        return user
+    # Token revocation (session_token) and user lookup: app/utils/identity.py
+    identity.init_app(app)
 
     # --- JWT Error Handlers ---
     @jwt.unauthorized_loader
@@ -88,19 +86,6 @@ def create_app():
             return jsonify(message="Preflight OK"), 200
         return jsonify(message="Invalid token signature"), 401
 
-    @jwt.token_in_blocklist_loader
-    def check_if_token_revoked(jwt_header, jwt_payload):
-        from app.models.user import User
-        user_id = jwt_payload["sub"]
-        token_session = jwt_payload.get("session_token")
-        
-        user = User.query.get(user_id)
-        
-        # If user doesn't exist OR the token's session doesn't match the DB, revoke access
-        if not user or user.session_token != token_session:
-            return True # Returns True to indicate the token is revoked/invalid
-        return False
-
     # --- Preflight handler ---
     @app.before_request
     def check_preflight():
@@ -114,6 +99,8 @@ def create_app():
     app.register_blueprint(contact.bp)
     app.register_blueprint(errors)
     app.register_blueprint(google_auth.bp)
+    app.register_blueprint(images.bp)
+    app.register_blueprint(media.bp)
     app.register_blueprint(post.bp)
     app.register_blueprint(user.bp)
     app.register_blueprint(watched.bp)
@@ -169,7 +156,8 @@ def register_commands(app):
                 return
 
             existing_user.role = role
-            existing_user.password = generate_password_hash(password)
+            session_cache.invalidate_on_commit(existing_user.id)
+            existing_user.password = passwords.hash_password(password)
             existing_user.is_approved = True
             existing_user.is_confirmed = True
         else:
@@ -177,7 +165,7 @@ def register_commands(app):
             new_user = User(
                 username=username,
                 email=email,
-                password=generate_password_hash(password),
+                password=passwords.hash_password(password),
                 role=role,
                 is_approved=True,
                 is_confirmed=True,
@@ -193,3 +181,171 @@ def register_commands(app):
             db.session.rollback()
             click.echo(f"Database Error: {str(e)}")
 
+    @app.cli.command("calibrate-password-hash")
+    @click.option("--target-ms", default=250, show_default=True, help="Hash time to aim for on this machine")
+    @with_appcontext
+    def calibrate_password_hash(target_ms):
+        """Picks the scrypt cost that hashes in about --target-ms here."""
+        method, timings = passwords.calibrate_scrypt(target_ms)
+        for tried, ms in timings:
+            click.echo(f"{tried:<20} {ms:7.1f}ms")
+        current = app.config.get("PASSWORD_HASH_METHOD", passwords.DEFAULT_METHOD)
+        if timings[0][1] > target_ms:
+            click.echo(f"Even the minimum cost exceeds {target_ms}ms on this machine")
+        click.echo(f"PASSWORD_HASH_METHOD={method}" + (" (unchanged)" if method == current else ""))
+        click.echo("Set it in the environment; logins rehash older passwords on the fly.")
+
+    @app.cli.command("rebuild-search-index")
+    @with_appcontext
+    def rebuild_search_index():
+        """Recomputes the full-text search vector of every post."""
+        from app.models.post import Post
+        from app.extensions import db
+
+        try:
+            Post.refresh_search_vectors()
+            db.session.commit()
+            click.echo("Search index rebuilt")
+        except Exception as e:
+            db.session.rollback()
+            click.echo(f"Database Error: {str(e)}")
+
+    @app.cli.command("generate-image-variants")
+    @click.option("--force", is_flag=True, help="Regenerate images that already have variants")
+    @with_appcontext
+    def generate_image_variants(force):
+        """Writes the responsive variants of existing post and category images."""
+        from app.models.image import Image
+        from app.models.category import Category
+        from app.extensions import db
+        from app.utils.images import generate_variants
+
+        upload_root = os.path.join(app.root_path, app.config.get("UPLOAD_FOLDER", "static/uploads"))
+        targets = [
+            (Image, "file_path", "variants", "PostPics"),
+            (Category, "image_path", "image_variants", "CategoryPics"),
+        ]
+        done = 0
+        try:
+            for model, path_attr, variants_attr, folder in targets:
+                for obj in model.query.filter(getattr(model, path_attr).isnot(None)):
+                    if getattr(obj, variants_attr) and not force:
+                        continue
+                    path = os.path.join(upload_root, folder, getattr(obj, path_attr))
+                    if not os.path.isfile(path):
+                        continue
+                    setattr(obj, variants_attr, generate_variants(path))
+                    done += 1
+            db.session.commit()
+            click.echo(f"Generated variants for {done} images")
+        except Exception as e:
+            db.session.rollback()
+            click.echo(f"Database Error: {str(e)}")
+
+    @app.cli.command("process-image-jobs")
+    @click.option("--retry-failed", is_flag=True, help="Also retry failed jobs")
+    @click.option("--max-attempts", default=3, show_default=True, help="Skip jobs tried this many times")
+    @with_appcontext
+    def process_image_jobs(retry_failed, max_attempts):
+        """Drains pending (and optionally failed) profile-picture jobs inline."""
+        from app.models.image_job import ImageJob
+        from app.extensions import db
+
+        statuses = [ImageJob.PENDING, ImageJob.RUNNING]
+        if retry_failed:
+            statuses.append(ImageJob.FAILED)
+
+        job_ids = [
+            job_id for (job_id,) in db.session.query(ImageJob.id)
+            .filter(ImageJob.status.in_(statuses), ImageJob.attempts < max_attempts)
+            .order_by(ImageJob.id)
+        ]
+        worker = app.extensions["image_worker"]
+        results = {}
+        for job_id in job_ids:
+            try:
+                status = worker.run(job_id)
+            except Exception as e:
+                status = "error"
+                click.echo(f"Job {job_id}: {e}")
+            results[status] = results.get(status, 0) + 1
+        summary = ", ".join(f"{count} {status}" for status, count in sorted(results.items()))
+        click.echo(f"Processed {len(job_ids)} image jobs" + (f" ({summary})" if summary else ""))
+
+    @app.cli.command("deliver-emails")
+    @click.option("--loop", is_flag=True, help="Keep running as a delivery worker")
+    @with_appcontext
+    def deliver_emails(loop):
+        """Sends due emails from the outbox (once, or forever with --loop)."""
+        worker = app.extensions["email_outbox"]
+        if loop:
+            click.echo("Outbox worker running")
+            worker.run_forever()
+            return
+        sent, failed = worker.drain()
+        click.echo(f"Sent {sent} emails, {failed} failed")
+
+    @app.cli.command("session-cache-stats")
+    @with_appcontext
+    def session_cache_stats():
+        """Prints the session cache's hit/miss/invalidation counters."""
+        cache = session_cache.get_cache()
+        if cache is None:
+            click.echo("Session cache is off (SESSION_CACHE_BACKEND)")
+            return
+        stats = cache.stats()
+        lookups = stats["hits"] + stats["misses"]
+        ratio = f" ({stats['hits'] / lookups:.1%} hit rate)" if lookups else ""
+        click.echo(f"{stats['hits']} hits, {stats['misses']} misses, "
+                   f"{stats['invalidations']} invalidations{ratio}")
+
+    @app.cli.command("purge-refresh-tokens")
+    @click.option("--batch-size", default=1000, show_default=True, help="Rows deleted per transaction")
+    @with_appcontext
+    def purge_refresh_tokens(batch_size):
+        """Deletes expired refresh tokens and revoked ones past their retention."""
+        from app.models.user import RefreshToken
+
+        retention = timedelta(days=app.config.get("REFRESH_TOKEN_REVOKED_RETENTION", 7))
+        deleted = RefreshToken.purge(retention, batch_size=batch_size)
+        click.echo(f"Purged {deleted} refresh tokens")
+
+    @app.cli.command("revoke-google-tokens")
+    @click.option("--loop", is_flag=True, help="Keep running as a revocation worker")
+    @with_appcontext
+    def revoke_google_tokens(loop):
+        """Sends due Google token revocations queued at logout."""
+        worker = app.extensions["google_revoke"]
+        if loop:
+            click.echo("Google revocation worker running")
+            worker.run_forever()
+            return
+        done, failed = worker.drain()
+        click.echo(f"Revoked {done} Google tokens, {failed} failed")
+
+    @app.cli.command("outbound-stats")
+    @with_appcontext
+    def outbound_stats():
+        """Prints circuit state, latency and errors of outbound dependencies (this process)."""
+        stats = app.extensions["outbound"].stats()
+        if not stats:
+            click.echo("No outbound calls made by this process")
+        for name, s in stats.items():
+            click.echo(f"{name:<14} {s['state']:<9} {s['calls']} calls, {s['failures']} failed, "
+                       f"{s['rejected']} rejected, avg {s['latency_avg_ms']}ms, max {s['latency_max_ms']}ms")
+
+    @app.cli.command("rebuild-rating-summaries")
+    @with_appcontext
+    def rebuild_rating_summaries():
+        """Recomputes every post_rating_summary row from the post ratings."""
+        from app.models.rating import PostRatingSummary
+        from app.extensions import db
+
+        try:
+            PostRatingSummary.rebuild()
+            db.session.commit()
+            click.echo(f"Rebuilt {PostRatingSummary.query.count()} rating summaries")
+        except Exception as e:
+            db.session.rollback()
+            click.echo(f"Database Error: {str(e)}")
+
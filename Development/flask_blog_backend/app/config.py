@@ -22,8 +22,98 @@ class Config:
     MAIL_PASSWORD = '*info@Loftier.1899'
     MAIL_DEFAULT_SENDER = 'info@loftiermovies.com'
     UPLOAD_FOLDER = "static/uploads"
-    IMAGE_BASE_URL = os.environ.get("IMAGE_BASE_URL", "/static/uploads/")
+    IMAGE_BASE_URL = os.environ.get("IMAGE_BASE_URL", "/media/")
     MAX_CONTENT_LENGTH = 1 * 1024 * 1024  # 5 MB max upload
     ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "gif"}
+    # Listing totals (app/utils/counts.py)
+    COUNT_CACHE_TTL = int(os.environ.get("COUNT_CACHE_TTL", 30))  # seconds
+    COUNT_USE_ESTIMATES = os.environ.get("COUNT_USE_ESTIMATES", "false").lower() == "true"
+    COUNT_ESTIMATE_MIN_ROWS = 10000
+    # Worker processes serving the app (gunicorn reads the same variable);
+    # per-process caches warn when there is more than one
+    WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY", 1))
+    # Anonymous response cache (app/utils/response_cache.py): use "redis"
+    # whenever several workers serve the app, or writes in one worker leave
+    # the others serving stale bodies until the TTL
+    RESPONSE_CACHE_ENABLED = os.environ.get("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+    RESPONSE_CACHE_BACKEND = os.environ.get("RESPONSE_CACHE_BACKEND", "memory")  # memory | redis
+    RESPONSE_CACHE_URL = os.environ.get("RESPONSE_CACHE_URL", "redis://localhost:6379/0")
+    RESPONSE_CACHE_TTL = int(os.environ.get("RESPONSE_CACHE_TTL", 60))  # seconds
+    RESPONSE_CACHE_MAX_ENTRIES = 2048
+    # Session state checked by the JWT loaders (app/utils/session_cache.py):
+    # "redis" shares it across gunicorn workers; "memory" is per process
+    SESSION_CACHE_BACKEND = os.environ.get("SESSION_CACHE_BACKEND", "off")  # off | memory | redis
+    SESSION_CACHE_URL = os.environ.get("SESSION_CACHE_URL", "redis://localhost:6379/1")
+    SESSION_CACHE_TTL = int(os.environ.get("SESSION_CACHE_TTL", 30))  # seconds
+    SESSION_CACHE_MAX_ENTRIES = 10000
+    # Rate limits (app/utils/rate_limit.py): per client IP and per account
+    # (email), as (burst, seconds to refill the whole bucket). "redis"
+    # shares the buckets across gunicorn workers and replicas
+    RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "memory")  # off | memory | redis
+    RATE_LIMIT_URL = os.environ.get("RATE_LIMIT_URL", "redis://localhost:6379/2")
+    RATE_LIMIT_MAX_BUCKETS = 50000
+    RATE_LIMITS = {
+        "login": {"ip": (20, 60), "account": (10, 300)},
+        "register": {"ip": (5, 3600), "account": (3, 3600)},
+        "reset_request": {"ip": (5, 900), "account": (3, 3600)},
+        "contact": {"ip": (5, 600), "account": (3, 600)},
+    }
+    # Google sign-in (app/utils/google_oidc.py): id_tokens are verified
+    # against the cached JWKS; one pooled HTTP session per process
+    GOOGLE_JWKS_URL = os.environ.get("GOOGLE_JWKS_URL", "https://www.googleapis.com/oauth2/v3/certs")
+    GOOGLE_HTTP_POOL_SIZE = 4
+    # Google token revocation at logout (app/utils/google_revoke.py):
+    # "thread" revokes from each web process, "off" leaves it to
+    # `flask revoke-google-tokens --loop`
+    GOOGLE_REVOKE_WORKER = os.environ.get("GOOGLE_REVOKE_WORKER", "thread")
+    GOOGLE_REVOKE_URL = os.environ.get("GOOGLE_REVOKE_URL", "https://oauth2.googleapis.com/revoke")
+    GOOGLE_REVOKE_MAX_ATTEMPTS = 8
+    GOOGLE_REVOKE_BACKOFF = 30  # seconds, doubled per attempt
+    GOOGLE_REVOKE_MAX_BACKOFF = 6 * 3600
+    # Refresh tokens (POST /api/auth/refresh); digests are keyed with
+    # REFRESH_TOKEN_HMAC_KEY, falling back to SECRET_KEY
+    REFRESH_TOKEN_HMAC_KEY = os.environ.get("REFRESH_TOKEN_HMAC_KEY", "")
+    REFRESH_TOKEN_DAYS = 30
+    REFRESH_TOKEN_REVOKED_RETENTION = 7  # days revoked rows are kept to detect reuse
+    # Password hashing (app/utils/passwords.py): werkzeug method string for
+    # new hashes (pick with `flask calibrate-password-hash`), and the
+    # per-process pool that runs them; a full queue answers 503
+    PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", 1))
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get("PASSWORD_HASH_MAX_PENDING", 4))
+    PASSWORD_HASH_QUEUE_TIMEOUT = 2  # seconds a hash may wait for a worker
+    # Upload serving (app/routes/media.py). Set the prefix behind nginx so
+    # files go out via X-Accel-Redirect; leave empty to stream from Flask.
+    MEDIA_ACCEL_REDIRECT_PREFIX = os.environ.get("MEDIA_ACCEL_REDIRECT_PREFIX", "")
+    MEDIA_CACHE_MAX_AGE = int(os.environ.get("MEDIA_CACHE_MAX_AGE", 604800))  # 7 days
+    # On-the-fly resizing (app/routes/images.py); derivatives default to
+    # <instance>/derivatives and are LRU-evicted past the byte budget
+    IMAGE_RESIZE_SIZES = (160, 320, 480, 640, 960, 1280, 1600)
+    IMAGE_DERIVATIVE_DIR = os.environ.get("IMAGE_DERIVATIVE_DIR", "")
+    IMAGE_DERIVATIVE_MAX_BYTES = int(os.environ.get("IMAGE_DERIVATIVE_MAX_BYTES", 512 * 1024 * 1024))
+    # Profile-picture cartoonization (app/utils/image_worker.py); 0 processes = inline
+    IMAGE_WORKER_PROCESSES = int(os.environ.get("IMAGE_WORKER_PROCESSES", 2))
+    IMAGE_WORKER_MAX_PENDING = int(os.environ.get("IMAGE_WORKER_MAX_PENDING", 8))
+    IMAGE_WORKER_TIMEOUT = int(os.environ.get("IMAGE_WORKER_TIMEOUT", 30))  # seconds
+    # Email outbox (app/utils/outbox.py): "thread" delivers from each web
+    # process, "off" leaves it to `flask deliver-emails --loop`
+    EMAIL_OUTBOX_WORKER = os.environ.get("EMAIL_OUTBOX_WORKER", "thread")
+    EMAIL_OUTBOX_BATCH_SIZE = 50
+    EMAIL_OUTBOX_MAX_ATTEMPTS = 6
+    EMAIL_OUTBOX_BACKOFF = 30  # seconds, doubled per attempt
+    EMAIL_OUTBOX_MAX_BACKOFF = 3600
+    EMAIL_OUTBOX_POLL_INTERVAL = 30
+    EMAIL_SMTP_POOL_SIZE = 1
+    # Outbound calls (app/utils/outbound.py): timeouts per dependency, and
+    # the circuit breaker that fails fast after repeated errors
+    OUTBOUND_TIMEOUTS = {  # seconds
+        "smtp": 10,
+        "google_token": 5,
+        "google_jwks": 5,
+        "google_revoke": 5,
+    }
+    OUTBOUND_FAILURE_THRESHOLD = 5  # consecutive failures that open the circuit
+    OUTBOUND_RESET_TIMEOUT = 30  # seconds before a half-open probe
     
 
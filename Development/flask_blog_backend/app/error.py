@@ -10,7 +10,7 @@ logger = logging.getLogger(__name__)
 
 
 # Setup logging to logs/app.log
-log_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'logs')
+log_dir = os.environ.get('LOG_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'logs')
 os.makedirs(log_dir, exist_ok=True)
 log_path = os.path.join(log_dir, 'app.log')
 
@@ -1,5 +1,6 @@
 # app.models.category.py
 
+from datetime import datetime, timezone
 from app.extensions import db
 from .associations import post_categories
 
@@ -9,10 +10,19 @@ class Category(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(80), unique=True, nullable=False)
     image_path = db.Column(db.String(255), nullable=True)
+    # Responsive copies of image_path, same shape as Image.variants
+    image_variants = db.Column(db.JSON, nullable=True)
     created_at = db.Column(
         db.DateTime(timezone=True), 
         default=lambda: datetime.now(timezone.utc)
     )
+    updated_at = db.Column(
+        db.DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+        server_default=db.func.now(),
+        nullable=False
+    )
 
    # Many-to-Many with Post
     posts = db.relationship(
@@ -19,6 +19,8 @@ class Comment(db.Model):
             their comments are removed as well.
         created_at (datetime): Timestamp when the comment was created. Defaults to
             datetime.utcnow at insertion time.
+        updated_at (datetime): Last change to the comment, including changes to
+            its rating aggregate. Used as the validator of the comment reads.
         ratings (list[CommentRating]): Relationship to CommentRating objects that
             reference this comment. Configured with back_populates="comment",
             cascade="all, delete-orphan" so that rating objects are automatically
@@ -31,6 +33,11 @@ class Comment(db.Model):
         - When relying on DB-side cascades, ensure the database and SQLAlchemy
           session are configured to honor ON DELETE actions (passive_deletes=True).
     """
+    __table_args__ = (
+        # Serves keyset pagination of a post's comments (see utils/pagination.py)
+        db.Index('ix_comment_post_created_id', 'post_id', 'created_at', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
     
@@ -50,6 +57,15 @@ class Comment(db.Model):
                                         db.DateTime,
                                         default=lambda: datetime.now(timezone.utc)
                                     )
+    # Bumped on edits and by CommentRating.upsert_many(), so it also tracks
+    # the comment's rating aggregate (ETag of the comment reads)
+    updated_at = db.Column(
+        db.DateTime,
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+        server_default=db.func.now(),
+        nullable=False
+    )
     ratings = db.relationship(
         "CommentRating",
         back_populates="comment",
@@ -23,6 +23,16 @@ class ContactMessage(db.Model):
         - Instances are persisted via SQLAlchemy's session (e.g., db.session.add(...); db.session.commit()).
         - Use is_read and is_actioned to drive admin inbox behavior (filtering, sorting, and workflow).
     """
+    __table_args__ = (
+        # Trigram indexes serving the admin inbox search (ILIKE '%term%')
+        db.Index('ix_contact_message_email_trgm', 'email',
+                 postgresql_using='gin', postgresql_ops={'email': 'gin_trgm_ops'}),
+        db.Index('ix_contact_message_subject_trgm', 'subject',
+                 postgresql_using='gin', postgresql_ops={'subject': 'gin_trgm_ops'}),
+        db.Index('ix_contact_message_message_trgm', 'message',
+                 postgresql_using='gin', postgresql_ops={'message': 'gin_trgm_ops'}),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), nullable=False)
     subject = db.Column(db.String(200), nullable=False)
@@ -0,0 +1,57 @@
+# app/models/email_outbox.py
+from datetime import datetime, timezone
+from app.extensions import db
+
+
+class EmailOutbox(db.Model):
+    """
+    Outgoing email, written in the same transaction as the change that
+    triggers it and delivered later by app/utils/outbox.py.
+
+    Attributes
+    ----------
+    id : int
+        Primary key; delivery order.
+    subject : str
+        Message subject.
+    recipients : list of str
+        JSON list of addresses.
+    html : str
+        HTML body.
+    status : str
+        "pending" (waiting or scheduled for retry), "sent" or "failed"
+        (gave up after EMAIL_OUTBOX_MAX_ATTEMPTS).
+    attempts : int
+        Delivery attempts so far.
+    next_attempt_at : datetime
+        Not picked up before this time (exponential backoff after errors).
+    last_error : str or None
+        SMTP error of the last failed attempt.
+    sent_at : datetime or None
+        When the SMTP server accepted the message.
+    """
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        # The delivery worker's "due" scan: status = 'pending' ORDER BY id
+        db.Index("ix_email_outbox_due", "status", "next_attempt_at"),
+    )
+
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(255), nullable=False)
+    recipients = db.Column(db.JSON, nullable=False)
+    html = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default=PENDING)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(
+        db.DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc)
+    )
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    sent_at = db.Column(db.DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<EmailOutbox {self.id} {self.status} {self.recipients}>"
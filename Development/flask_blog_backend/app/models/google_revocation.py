@@ -0,0 +1,55 @@
+# app/models/google_revocation.py
+from datetime import datetime, timezone
+from app.extensions import db
+
+
+class GoogleRevocation(db.Model):
+    """
+    Google refresh token waiting to be revoked at Google, written in the
+    logout transaction and sent later by app/utils/google_revoke.py.
+
+    Attributes
+    ----------
+    id : int
+        Primary key; revocation order.
+    user_id : int or None
+        User who logged out (informational, no foreign key: the revocation
+        must still go out if the user is deleted meanwhile).
+    token : str
+        The Google refresh token, Fernet-encrypted like
+        User.google_refresh_token.
+    status : str
+        "pending" (waiting or scheduled for retry), "done" or "failed"
+        (gave up after GOOGLE_REVOKE_MAX_ATTEMPTS).
+    attempts : int
+        Calls to the revocation endpoint so far.
+    next_attempt_at : datetime
+        Not picked up before this time (exponential backoff after errors).
+    last_error : str or None
+        Error of the last failed attempt.
+    revoked_at : datetime or None
+        When Google confirmed the token is no longer valid.
+    """
+    __tablename__ = "google_revocation"
+    __table_args__ = (
+        db.Index("ix_google_revocation_due", "status", "next_attempt_at"),
+    )
+
+    PENDING = "pending"
+    DONE = "done"
+    FAILED = "failed"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=True)
+    token = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default=PENDING)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(
+        db.DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc)
+    )
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    revoked_at = db.Column(db.DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<GoogleRevocation {self.id} {self.status} user={self.user_id}>"
@@ -1,5 +1,6 @@
 # app.models.image.py
 import os
+from datetime import datetime, timezone
 from flask import current_app
 from sqlalchemy import event
 from app.extensions import db
@@ -8,6 +9,10 @@ class Image(db.Model):
     # ... (Keep your existing Image class definition here) ...
     id = db.Column(db.Integer, primary_key=True)
     file_path = db.Column(db.String(300), nullable=False)
+    # Responsive copies written at upload time (see utils/images.py):
+    # {"thumb"|"card"|"full": {"width", "height", "webp", "jpg"}}; NULL/{} when
+    # the original could not be decoded, in which case only it is served
+    variants = db.Column(db.JSON, nullable=True)
     created_at = db.Column(
         db.DateTime(timezone=True), 
         default=lambda: datetime.now(timezone.utc)
@@ -28,19 +33,21 @@ def receive_after_delete(mapper, connection, target):
     when an Image record is deleted from the database.
     """
     if target.file_path:
-        # Since file_path might just be the filename (e.g., 'admin_123.jpg'), 
-        # we join it with the UPLOAD_FOLDER config
+        # file_path is just the filename (e.g. 'post_poster.jpg'); post
+        # images and their variants live in UPLOAD_FOLDER/PostPics
+        from app.utils.images import variant_files
+
         upload_folder = current_app.config.get('UPLOAD_FOLDER', 'static/uploads')
-        
-        # Build the full system path
-        full_path = os.path.join(upload_folder, target.file_path)
-        
-        try:
-            if os.path.exists(full_path):
-                os.remove(full_path)
-                print(f"Successfully deleted file: {full_path}")
-        except Exception as e:
-            print(f"Error deleting physical file: {e}")
+        post_pics = os.path.join(current_app.root_path, upload_folder, "PostPics")
+
+        for name in [target.file_path, *variant_files(target.variants)]:
+            full_path = os.path.join(post_pics, name)
+            try:
+                if os.path.exists(full_path):
+                    os.remove(full_path)
+                    current_app.logger.info(f"Deleted image file: {full_path}")
+            except OSError as e:
+                current_app.logger.warning(f"Error deleting image file {full_path}: {e}")
 
 
 @event.listens_for(Image, 'after_update')
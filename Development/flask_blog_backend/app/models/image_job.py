@@ -0,0 +1,50 @@
+# app/models/image_job.py
+from datetime import datetime, timezone
+from app.extensions import db
+
+
+class ImageJob(db.Model):
+    """
+    Background image processing job (see app/utils/image_worker.py).
+
+    Attributes
+    ----------
+    id : int
+        Primary key.
+    user_id : int
+        Owner of the image; the job is removed with the user.
+    kind : str
+        Processing step to run, currently only "cartoonize".
+    source_path : str
+        Upload path relative to UPLOAD_FOLDER, e.g. "ProfilePics/x.jpg".
+        This is what the user is served until the job succeeds.
+    status : str
+        "pending", "running", "done" or "failed".
+    attempts : int
+        Number of times the job has been started.
+    error : str or None
+        Last failure ("timeout", decode errors, ...).
+    """
+    __tablename__ = "image_job"
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    kind = db.Column(db.String(30), nullable=False, default="cartoonize")
+    source_path = db.Column(db.String(1024), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default=PENDING, index=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    updated_at = db.Column(
+        db.DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
+
+    def __repr__(self):
+        return f"<ImageJob {self.id} {self.kind} {self.status}>"
@@ -1,16 +1,47 @@
 # app.models.post.py
 
 from datetime import datetime, timezone
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from app.extensions import db
 from .associations import post_categories
 from flask import current_app
 
 
+# Text search configuration used for Post.search_vector and all queries on it
+SEARCH_CONFIG = "english"
+
+# Weighted document: title (A) > content (B) > author and categories (C).
+# Author and category names live in other tables, so the vector is kept
+# current by the routes that change them rather than a generated column.
+REFRESH_SEARCH_VECTOR_SQL = f"""
+UPDATE post p SET search_vector =
+    setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(p.title, '')), 'A') ||
+    setweight(to_tsvector('{SEARCH_CONFIG}',
+        regexp_replace(coalesce(p.content, ''), '<[^>]*>', ' ', 'g')), 'B') ||
+    setweight(to_tsvector('simple', coalesce(u.username, '')), 'C') ||
+    setweight(to_tsvector('{SEARCH_CONFIG}', coalesce((
+        SELECT string_agg(c.name, ' ')
+        FROM post_categories pc
+        JOIN category c ON c.id = pc.category_id
+        WHERE pc.post_id = p.id
+    ), '')), 'C')
+FROM users u
+WHERE u.id = p.author_id
+"""
+
+
 
 
 
 class Post(db.Model):
     __tablename__ = 'post'
+    __table_args__ = (
+        # Serves keyset pagination of the public feed (see utils/pagination.py)
+        db.Index('ix_post_published_created_id', 'is_published', 'created_at', 'id'),
+        db.Index('ix_post_search_vector', 'search_vector', postgresql_using='gin'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False, unique=True)
@@ -19,8 +50,20 @@ class Post(db.Model):
         db.DateTime,
         default=lambda: datetime.now(timezone.utc)
     )
+    # Bumped on every change to the post row or its category/image links;
+    # drives the ETag/Last-Modified of the post reads (utils/conditional.py)
+    updated_at = db.Column(
+        db.DateTime,
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+        server_default=db.func.now(),
+        nullable=False
+    )
     is_published = db.Column(db.Boolean, nullable=False, default=False)
 
+    # Full-text search document, see REFRESH_SEARCH_VECTOR_SQL
+    search_vector = db.deferred(db.Column(TSVECTOR, nullable=True))
+
     author_id = db.Column(
         db.Integer,
         db.ForeignKey('users.id', ondelete="CASCADE"),
@@ -59,6 +102,15 @@ class Post(db.Model):
         passive_deletes=True
     )
 
+    # Maintained by PostRating.upsert_many(); joined so listings get the
+    # average in the same query as the post row.
+    rating_summary = db.relationship(
+        'PostRatingSummary',
+        uselist=False,
+        lazy="joined",
+        viewonly=True
+    )
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -68,9 +120,39 @@ class Post(db.Model):
             "is_published": self.is_published,
             "author_id": self.author_id,
             "image_url": self.image_url,  # This calls your @property
+            "image_variants": self.image_variants,
+            "average_rating": self.average_rating,
             "categories": [cat.name for cat in self.categories] # Optional: list genre names
         }
 
+    @classmethod
+    def refresh_search_vectors(cls, post_ids=None):
+        """Rebuild search_vector for the given posts (or all posts if None).
+
+        Call after flushing changes to a post's title, content, categories or
+        author name, in the same transaction.
+        """
+        if post_ids is not None:
+            if not post_ids:
+                return
+            db.session.execute(
+                text(REFRESH_SEARCH_VECTOR_SQL + " AND p.id = ANY(:post_ids)"),
+                {"post_ids": list(post_ids)}
+            )
+        else:
+            db.session.execute(text(REFRESH_SEARCH_VECTOR_SQL))
+
+    # ---------------------------------
+    # Computed Rating Property
+    # ---------------------------------
+    @property
+    def average_rating(self):
+        """Return the denormalized average rating or None if unrated."""
+        summary = self.rating_summary
+        if summary is None or summary.average is None:
+            return None
+        return float(summary.average)
+
     # ---------------------------------
     # Computed Image URL Property
     # ---------------------------------
@@ -82,4 +164,25 @@ class Post(db.Model):
 
         base_url = current_app.config.get("IMAGE_BASE_URL", "/static/uploads")
         base_url = f"{base_url.rstrip('/')}/PostPics/"
-        return f"{base_url}{self.images[0].file_path}"
\ No newline at end of file
+        return f"{base_url}{self.images[0].file_path}"
+
+    @property
+    def image_variants(self):
+        """Responsive variant URLs of the first image ({} if there are none)."""
+        if not self.images:
+            return {}
+
+        from app.utils.images import variant_urls
+        base_url = current_app.config.get("IMAGE_BASE_URL", "/static/uploads")
+        return variant_urls(f"{base_url.rstrip('/')}/PostPics/", self.images[0].variants)
+
+
+@event.listens_for(Session, "before_flush")
+def _touch_modified_posts(session, flush_context, instances):
+    """Bump updated_at for relationship-only changes (categories, images),
+    which do not issue an UPDATE of their own and so skip onupdate."""
+    now = datetime.now(timezone.utc)
+    for obj in session.dirty:
+        if isinstance(obj, Post) and session.is_modified(obj):
+            obj.updated_at = now
+
@@ -1,7 +1,148 @@
 # app.models.rating.py
+from datetime import datetime, timezone
+from sqlalchemy import delete, func, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
 from app.extensions import db
 
 
+# ---------------------------------------------------------------------------
+# Rating upserts
+#
+# Each statement locks the user's existing rating rows, updates or inserts
+# them and folds the resulting deltas into the aggregate, all in a single
+# round trip. `old` uses FOR UPDATE so the delta is computed from the value
+# actually being replaced; the insert uses ON CONFLICT DO NOTHING so a
+# concurrent first rating by the same user never raises a unique violation
+# (that item is simply absent from the result and can be retried).
+# ---------------------------------------------------------------------------
+_RATING_DELTA_CTES = """
+    old AS (
+        SELECT r.id, r.{fk}, r.value
+        FROM {table} r
+        JOIN input i ON i.{fk} = r.{fk}
+        WHERE r.user_id = :user_id
+        FOR UPDATE OF r
+    ),
+    upd AS (
+        UPDATE {table} r
+        SET value = i.value
+        FROM old
+        JOIN input i ON i.{fk} = old.{fk}
+        WHERE r.id = old.id
+        RETURNING r.{fk}, old.value AS old_value, r.value AS new_value
+    ),
+    ins AS (
+        INSERT INTO {table} ({fk}, user_id, value{extra_cols})
+        SELECT i.{fk}, :user_id, i.value{extra_vals}
+        FROM input i
+        WHERE NOT EXISTS (SELECT 1 FROM old WHERE old.{fk} = i.{fk})
+        ON CONFLICT ON CONSTRAINT {constraint} DO NOTHING
+        RETURNING {fk}, NULL::integer AS old_value, value AS new_value
+    ),
+    delta AS (
+        SELECT {fk}, old_value, new_value,
+               CASE WHEN old_value IS NULL THEN 1 ELSE 0 END AS d_count,
+               new_value - COALESCE(old_value, 0) AS d_sum
+        FROM (SELECT * FROM upd UNION ALL SELECT * FROM ins) AS changed
+    )"""
+
+_HISTOGRAM_DELTAS = ",\n               ".join(
+    f"(new_value = {n})::int - COALESCE((old_value = {n})::int, 0)" for n in range(1, 6)
+)
+
+UPSERT_POST_RATINGS_SQL = text("""
+WITH input AS (
+        SELECT DISTINCT ON (t.post_id) t.post_id, t.value
+        FROM unnest(CAST(:post_ids AS integer[]), CAST(:values AS integer[])) AS t(post_id, value)
+        JOIN post p ON p.id = t.post_id
+    ),""" + _RATING_DELTA_CTES.format(
+    table="post_rating", fk="post_id", constraint="unique_user_post_rating",
+    extra_cols=", created_at", extra_vals=", now()"
+) + """,
+    summ AS (
+        INSERT INTO post_rating_summary AS s
+            (post_id, rating_count, rating_sum,
+             count_1, count_2, count_3, count_4, count_5, average, updated_at)
+        SELECT post_id, d_count, d_sum,
+               """ + _HISTOGRAM_DELTAS + """,
+               ROUND(d_sum::numeric / NULLIF(d_count, 0), 2),
+               now()
+        FROM delta
+        ON CONFLICT (post_id) DO UPDATE SET
+            rating_count = s.rating_count + EXCLUDED.rating_count,
+            rating_sum = s.rating_sum + EXCLUDED.rating_sum,
+            count_1 = s.count_1 + EXCLUDED.count_1,
+            count_2 = s.count_2 + EXCLUDED.count_2,
+            count_3 = s.count_3 + EXCLUDED.count_3,
+            count_4 = s.count_4 + EXCLUDED.count_4,
+            count_5 = s.count_5 + EXCLUDED.count_5,
+            average = ROUND(
+                (s.rating_sum + EXCLUDED.rating_sum)::numeric
+                / NULLIF(s.rating_count + EXCLUDED.rating_count, 0), 2),
+            updated_at = EXCLUDED.updated_at
+        RETURNING post_id, rating_count, average
+    )
+SELECT d.post_id AS item_id, d.old_value, d.new_value, s.rating_count, s.average
+FROM delta d
+JOIN summ s ON s.post_id = d.post_id
+""")
+
+UPSERT_COMMENT_RATINGS_SQL = text("""
+WITH input AS (
+        SELECT DISTINCT ON (t.comment_id) t.comment_id, t.value, c.post_id
+        FROM unnest(CAST(:comment_ids AS integer[]), CAST(:values AS integer[])) AS t(comment_id, value)
+        JOIN comment c ON c.id = t.comment_id
+    ),""" + _RATING_DELTA_CTES.format(
+    table="comment_rating", fk="comment_id", constraint="unique_user_comment_rating",
+    extra_cols="", extra_vals=""
+) + """,
+    agg AS (
+        SELECT r.comment_id, COUNT(*) AS n, SUM(r.value) AS total
+        FROM comment_rating r
+        JOIN input i ON i.comment_id = r.comment_id
+        GROUP BY r.comment_id
+    ),
+    touch AS (
+        UPDATE comment c SET updated_at = now()
+        FROM delta d
+        WHERE c.id = d.comment_id AND d.new_value IS DISTINCT FROM d.old_value
+    )
+SELECT d.comment_id AS item_id, d.old_value, d.new_value,
+       COALESCE(a.n, 0) + d.d_count AS rating_count,
+       ROUND((COALESCE(a.total, 0) + d.d_sum)::numeric
+             / NULLIF(COALESCE(a.n, 0) + d.d_count, 0), 2) AS average,
+       i.post_id
+FROM delta d
+JOIN input i ON i.comment_id = d.comment_id
+LEFT JOIN agg a ON a.comment_id = d.comment_id
+""")
+
+
+def _run_rating_upsert(statement, id_param, user_id, ratings):
+    """Execute one of the upsert statements for {item_id: value}.
+
+    Returns {item_id: row}. Items that do not exist are left out, as are
+    items whose first rating lost a race with a concurrent insert by the
+    same user; those are retried once, by which time the winner's row is
+    visible and takes the update path.
+    """
+    results = {}
+    pending = dict(ratings)
+    for _attempt in range(2):
+        if not pending:
+            break
+        rows = db.session.execute(statement, {
+            id_param: list(pending.keys()),
+            "values": list(pending.values()),
+            "user_id": int(user_id),
+        }).mappings().all()
+        for row in rows:
+            results[row["item_id"]] = row
+            pending.pop(row["item_id"], None)
+    return results
+
+
 class PostRating(db.Model):
     """SQLAlchemy model representing a rating that a user assigns to a post.
 
@@ -56,6 +197,17 @@ class PostRating(db.Model):
         db.UniqueConstraint('post_id', 'user_id', name='unique_user_post_rating'),
     )
 
+    @classmethod
+    def upsert_many(cls, user_id, ratings):
+        """Insert or update the user's ratings for {post_id: value} in one statement.
+
+        The post rating summaries are updated in the same statement. Returns
+        {post_id: row} where each row has `old_value`, `new_value`,
+        `rating_count` and `average`; posts that do not exist are omitted.
+        Values must already be validated to 1-5. The caller commits.
+        """
+        return _run_rating_upsert(UPSERT_POST_RATINGS_SQL, "post_ids", user_id, ratings)
+
 
 class CommentRating(db.Model):
     """Model representing a user's numeric rating for a comment.
@@ -110,3 +262,114 @@ class CommentRating(db.Model):
     __table_args__ = (
         db.UniqueConstraint('comment_id', 'user_id', name='unique_user_comment_rating'),
     )
+
+    @classmethod
+    def upsert_many(cls, user_id, ratings):
+        """Insert or update the user's ratings for {comment_id: value} in one statement.
+
+        Returns {comment_id: row} with `old_value`, `new_value`,
+        `rating_count`, `average` (the comment aggregate including this
+        write) and the comment's `post_id`; comments that do not exist are
+        omitted. The caller commits.
+        """
+        return _run_rating_upsert(UPSERT_COMMENT_RATINGS_SQL, "comment_ids", user_id, ratings)
+
+
+class PostRatingSummary(db.Model):
+    """Denormalized per-post rating aggregate.
+
+    One row per rated post, maintained in the same transaction as every
+    PostRating write so listings can read the average with a single join
+    instead of aggregating PostRating rows per post.
+
+    Attributes
+    ----------
+    post_id : int
+        Primary key and foreign key referencing post.id (ondelete="CASCADE").
+    rating_count : int
+        Number of ratings recorded for the post.
+    rating_sum : int
+        Sum of all rating values for the post.
+    count_1 .. count_5 : int
+        Histogram of rating values, one column per star.
+    average : Decimal | None
+        rating_sum / rating_count rounded to two places; NULL while the post
+        has no ratings. Indexed so listings can sort by rating.
+    updated_at : datetime
+        Time of the last rating write; part of the post read validators.
+
+    Notes
+    -----
+    - Writes go through `PostRating.upsert_many()` (and `rebuild()` for
+      repairs), which apply deltas with ON CONFLICT DO UPDATE against the
+      locked row, so concurrent raters never lose increments.
+    - `Post.rating_summary` is a view-only relationship onto this table.
+    """
+    __tablename__ = "post_rating_summary"
+
+    post_id = db.Column(
+        db.Integer,
+        db.ForeignKey('post.id', ondelete="CASCADE"),
+        primary_key=True
+    )
+    rating_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+    count_1 = db.Column(db.Integer, nullable=False, default=0)
+    count_2 = db.Column(db.Integer, nullable=False, default=0)
+    count_3 = db.Column(db.Integer, nullable=False, default=0)
+    count_4 = db.Column(db.Integer, nullable=False, default=0)
+    count_5 = db.Column(db.Integer, nullable=False, default=0)
+    average = db.Column(db.Numeric(4, 2), nullable=True, index=True)
+    updated_at = db.Column(
+        db.DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc),
+        server_default=func.now()
+    )
+
+    @property
+    def histogram(self):
+        return {n: getattr(self, f"count_{n}") for n in range(1, 6)}
+
+    def to_dict(self):
+        return {
+            "count": self.rating_count,
+            "sum": self.rating_sum,
+            "average": float(self.average) if self.average is not None else None,
+            "histogram": self.histogram,
+        }
+
+    @classmethod
+    def rebuild(cls, post_ids=None):
+        """Recompute summary rows from PostRating.
+
+        Used after bulk changes that bypass `PostRating.upsert_many()` (e.g. a user delete
+        cascading their ratings) and by the `rebuild-rating-summaries` CLI.
+        Pass `post_ids` to limit the rebuild, or None for every post.
+        """
+        if post_ids is not None and not post_ids:
+            return
+
+        wipe = delete(cls.__table__)
+        aggregate = (
+            db.select(
+                PostRating.post_id,
+                func.count(PostRating.id),
+                func.sum(PostRating.value),
+                *[func.count(PostRating.id).filter(PostRating.value == n) for n in range(1, 6)],
+                func.round(func.avg(PostRating.value), 2),
+            )
+            .group_by(PostRating.post_id)
+        )
+        if post_ids is not None:
+            wipe = wipe.where(cls.post_id.in_(post_ids))
+            aggregate = aggregate.where(PostRating.post_id.in_(post_ids))
+
+        db.session.execute(wipe)
+        db.session.execute(
+            pg_insert(cls.__table__).from_select(
+                ["post_id", "rating_count", "rating_sum",
+                 "count_1", "count_2", "count_3", "count_4", "count_5", "average"],
+                aggregate
+            )
+        )
@@ -3,7 +3,12 @@ from datetime import datetime, timezone
 
 class RejectedRequest(db.Model):
     __tablename__ = 'rejected_requests'
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        # Case-insensitive title lookups (ILIKE) are served from this index
+        db.Index('ix_rejected_requests_title_trgm', 'title',
+                 postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'}),
+        {'extend_existing': True},
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False, index=True)
@@ -1,6 +1,11 @@
+import hashlib
+import hmac
+import secrets
 import uuid
 from datetime import datetime, timezone
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import current_app
+from sqlalchemy import delete, exists, literal, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from app.extensions import db
 from app.models.associations import watched_posts
 
@@ -38,8 +43,17 @@ class User(db.Model):
     Example (conceptual)
     - user.posts -> list of Post instances authored by the user.
     - user.watched.filter(...).all() -> query watched posts (dynamic relationship).
+    Watched state by id (no Post rows loaded)
+    - User.watched_ids / watched_clause / watch_posts / unwatch_posts; see their docstrings.
     """
     __tablename__ = "users"
+    __table_args__ = (
+        # Trigram indexes serving the admin substring searches (ILIKE '%term%')
+        db.Index('ix_users_username_trgm', 'username',
+                 postgresql_using='gin', postgresql_ops={'username': 'gin_trgm_ops'}),
+        db.Index('ix_users_email_trgm', 'email',
+                 postgresql_using='gin', postgresql_ops={'email': 'gin_trgm_ops'}),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -107,6 +121,85 @@ class User(db.Model):
     def __repr__(self):
         return f"<User id={self.id} email='{self.email}' role='{self.role}'>"
 
+    # ------------------------
+    # Watched posts, by id
+    # ------------------------
+
+    @staticmethod
+    def watched_ids(user_id, post_ids=None):
+        """
+        Ids of the posts `user_id` watches, as a set. With `post_ids`, only
+        those among them (e.g. the posts of one page).
+        """
+        query = select(watched_posts.c.post_id).where(watched_posts.c.user_id == user_id)
+        if post_ids is not None:
+            post_ids = list(post_ids)
+            if not post_ids:
+                return set()
+            query = query.where(watched_posts.c.post_id.in_(post_ids))
+        return set(db.session.scalars(query))
+
+    @staticmethod
+    def watched_clause(user_id):
+        """
+        EXISTS filter on watched_posts for Post queries:
+        query.filter(User.watched_clause(user_id)) keeps watched posts,
+        ~User.watched_clause(user_id) unwatched ones.
+        """
+        from app.models.post import Post
+        return exists().where(
+            watched_posts.c.user_id == user_id,
+            watched_posts.c.post_id == Post.id,
+        )
+
+    @staticmethod
+    def watch_posts(user_id, post_ids):
+        """
+        Mark `post_ids` as watched in one INSERT ... ON CONFLICT DO NOTHING.
+        Idempotent; returns the ids actually added.
+        """
+        from app.models.post import Post
+        from app.utils import counts
+
+        post_ids = set(post_ids)
+        if not post_ids:
+            return set()
+        # Unknown posts are skipped by the SELECT, watched ones by ON CONFLICT
+        stmt = (
+            pg_insert(watched_posts)
+            .from_select(
+                ["user_id", "post_id"],
+                select(literal(user_id), Post.id).where(Post.id.in_(post_ids)),
+            )
+            .on_conflict_do_nothing()
+            .returning(watched_posts.c.post_id)
+        )
+        added = set(db.session.scalars(stmt))
+        if added:
+            counts.invalidate_on_commit("watched_posts")
+        return added
+
+    @staticmethod
+    def unwatch_posts(user_id, post_ids):
+        """
+        Unmark `post_ids` in one DELETE ... RETURNING. Idempotent; returns
+        the ids actually removed.
+        """
+        from app.utils import counts
+
+        post_ids = set(post_ids)
+        if not post_ids:
+            return set()
+        stmt = (
+            delete(watched_posts)
+            .where(watched_posts.c.user_id == user_id, watched_posts.c.post_id.in_(post_ids))
+            .returning(watched_posts.c.post_id)
+        )
+        removed = set(db.session.scalars(stmt))
+        if removed:
+            counts.invalidate_on_commit("watched_posts")
+        return removed
+
 
 
 class RefreshToken(db.Model):
@@ -114,9 +207,9 @@ class RefreshToken(db.Model):
     RefreshToken model representing a persistent refresh token for a user.
 
     This SQLAlchemy model stores refresh tokens tied to a specific user and
-    tracks their lifecycle (creation time, expiration, and revocation). It is
-    intended for use with session or JWT refresh flows where long-lived tokens
-    must be revocable and expiry-checked on each use.
+    tracks their lifecycle (creation time, expiration, and revocation). Tokens
+    are single use: POST /api/auth/refresh revokes the presented token and
+    issues a new one.
 
     Attributes
     ----------
@@ -125,8 +218,10 @@ class RefreshToken(db.Model):
     user_id : int
         Foreign key referencing the associated User record (ondelete="CASCADE").
     token_hash : str
-        The hashed version of the refresh token value. Stored securely using 
-        scrypt or pbkdf2. This column is unique and non-nullable.
+        HMAC-SHA256 of the raw token (hex), keyed with REFRESH_TOKEN_HMAC_KEY
+        (SECRET_KEY when unset). The digest is deterministic, so a presented
+        token is found through the unique index in one lookup; the key keeps
+        a leaked table from being checked against guessed tokens offline.
     created_at : datetime
         Timestamp for when the refresh token was created. Defaults to a
         timezone-aware UTC datetime.
@@ -135,51 +230,126 @@ class RefreshToken(db.Model):
         expired when the current UTC time is greater than this value.
     revoked : bool
         Flag indicating whether the token has been revoked. Defaults to False.
+    revoked_at : datetime or None
+        When the token was revoked (rotation, logout, password reset).
+        Revoked rows are kept for REFRESH_TOKEN_REVOKED_RETENTION so reuse of
+        a rotated token can still be detected, then purged.
     user : User
         SQLAlchemy relationship to the owning User object. Backref name:
         "refresh_tokens".
 
     Methods
     -------
+    digest(token: str) -> str
+        Keyed digest of a raw token, as stored in token_hash.
+    issue(user_id: int, lifetime: timedelta) -> (RefreshToken, str)
+        Creates (and adds to the session) a token row; returns it with the
+        raw token, which is only available at this point.
+    find(token: str) -> RefreshToken or None
+        Looks a raw token up by its digest.
+    revoke_all(user_id: int) -> int
+        Revokes every live token of a user.
+    purge(retention: timedelta, batch_size: int) -> int
+        Deletes expired rows and revoked rows past the retention, in batches.
+    revoke() -> None
+        Marks the token revoked now.
     set_token(token: str) -> None
-        Hashes the raw token string and stores it in the token_hash attribute.
+        Stores the digest of the raw token in the token_hash attribute.
     check_token(token: str) -> bool
-        Verifies a raw token string against the stored hash.
+        Verifies a raw token string against the stored digest.
     is_valid() -> bool
         Returns True if the token is not revoked and the current UTC time is
         before the token's expires_at; otherwise returns False.
 
     Notes
     -----
-    - created_at uses a timezone-aware UTC timestamp to avoid ambiguity across
+    - Timestamps are timezone-aware UTC to avoid ambiguity across
       deployments in different timezones.
-    - The token is stored as a hash; once set, the original raw token cannot 
+    - The token is stored as a digest; once set, the original raw token cannot
       be retrieved from the database.
     - The foreign key uses ON DELETE CASCADE so tokens are removed automatically
       when the associated user is deleted.
     """
     __tablename__ = "refresh_tokens"
+    __table_args__ = (
+        # Purge scan (expired rows) and per-user revocation (logout, reset)
+        db.Index("ix_refresh_tokens_expires_at", "expires_at"),
+        db.Index("ix_refresh_tokens_user_id", "user_id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"))
     token_hash = db.Column(db.String(512), unique=True, nullable=False)
 
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
-    expires_at = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    expires_at = db.Column(db.DateTime(timezone=True), nullable=False)
     revoked = db.Column(db.Boolean, default=False)
+    revoked_at = db.Column(db.DateTime(timezone=True), nullable=True)
 
     user = db.relationship("User", backref="refresh_tokens")
 
+    @staticmethod
+    def digest(token):
+        """Keyed HMAC-SHA256 digest of a raw token."""
+        config = current_app.config
+        key = config.get("REFRESH_TOKEN_HMAC_KEY") or config["SECRET_KEY"]
+        return hmac.new(key.encode(), token.encode(), hashlib.sha256).hexdigest()
+
+    @classmethod
+    def issue(cls, user_id, lifetime):
+        raw = secrets.token_urlsafe(64)
+        record = cls(user_id=user_id, expires_at=datetime.now(timezone.utc) + lifetime)
+        record.set_token(raw)
+        db.session.add(record)
+        return record, raw
+
+    @classmethod
+    def find(cls, token, for_update=False):
+        query = cls.query.filter_by(token_hash=cls.digest(token))
+        if for_update:
+            # Two concurrent refreshes with the same token: one rotates, the
+            # other sees it revoked
+            query = query.with_for_update()
+        return query.first()
+
+    @classmethod
+    def revoke_all(cls, user_id):
+        return cls.query.filter_by(user_id=user_id, revoked=False).update(
+            {"revoked": True, "revoked_at": datetime.now(timezone.utc)},
+            synchronize_session=False,
+        )
+
+    @classmethod
+    def purge(cls, retention, batch_size=1000):
+        """Delete expired and long-revoked rows; returns the number deleted."""
+        now = datetime.now(timezone.utc)
+        stale = db.or_(
+            cls.expires_at < now,
+            db.and_(cls.revoked.is_(True), cls.revoked_at < now - retention),
+            # Revoked before revoked_at existed
+            db.and_(cls.revoked.is_(True), cls.revoked_at.is_(None)),
+        )
+        total = 0
+        while True:
+            ids = db.session.query(cls.id).filter(stale).limit(batch_size).scalar_subquery()
+            deleted = cls.query.filter(cls.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
+            total += deleted
+            if deleted < batch_size:
+                return total
+
+    def revoke(self):
+        self.revoked = True
+        self.revoked_at = datetime.now(timezone.utc)
+
     def set_token(self, token):
-        """Hash and set the refresh token."""
-        self.token_hash = generate_password_hash(token)
+        """Store the keyed digest of the refresh token."""
+        self.token_hash = self.digest(token)
 
     def check_token(self, token):
-        """Verify the raw token against the stored hash."""
-        return check_password_hash(self.token_hash, token)
+        """Verify the raw token against the stored digest."""
+        return hmac.compare_digest(self.token_hash, self.digest(token))
 
     def is_valid(self):
         """Check if token is not revoked and hasn't expired."""
         return not self.revoked and datetime.now(timezone.utc) < self.expires_at
-
-
@@ -2,20 +2,23 @@
 import os
 import logging
 import uuid
-import cv2
 from datetime import timedelta, datetime, timezone
 from logging.handlers import RotatingFileHandler
 
 
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import create_access_token
-from flask_mail import Message
-from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 from itsdangerous import URLSafeTimedSerializer
 
-from app.extensions import db, mail
-from app.models.user import User
+from app.extensions import db
+from app.models.user import User, RefreshToken
+from app.models.image_job import ImageJob
+from app.utils.image_worker import get_worker
+from app.utils.outbox import queue_email
+from app.utils import session_cache
+from app.utils.passwords import PasswordHasherBusy, hash_password, needs_rehash, verify_password
+from app.utils.rate_limit import form_field, json_field, rate_limited
 
 
 bp = Blueprint("auth", __name__, url_prefix="/api/auth")
@@ -34,7 +37,9 @@ ACCESS_EXPIRES = timedelta(hours=3)
 # LOGGING SETUP
 # ============================================================
 
-log_path = os.path.join(os.path.dirname(__file__), "../../logs/email_errors.log")
+# LOG_DIR lets tests (and deployments) keep log files out of the source tree
+log_dir = os.environ.get("LOG_DIR") or os.path.join(os.path.dirname(__file__), "../../logs")
+log_path = os.path.join(log_dir, "email_errors.log")
 os.makedirs(os.path.dirname(log_path), exist_ok=True)
 
 logger = logging.getLogger("email_logger")
@@ -53,47 +58,18 @@ def allowed_file(filename: str) -> bool:
     allowed = current_app.config.get("ALLOWED_EXTENSIONS", {"png", "jpg", "jpeg", "gif"})
     return "." in filename and filename.rsplit(".", 1)[1].lower() in allowed
 
-def cartoonize_image(input_path, username):
-    """Processes image and returns a BytesIO object (in-memory file)."""
-    img = cv2.imread(input_path)
-    if img is None:
-        return None
+def hashing_busy(e: PasswordHasherBusy):
+    """503 for a saturated password hasher (app/utils/passwords.py)."""
+    return jsonify({"msg": "Server busy, please try again shortly"}), 503, {
+        "Retry-After": str(e.retry_after)
+    }
 
-    try:
-        # --- Your Processing Logic ---
-        smooth = cv2.bilateralFilter(img, 9, 75, 75)
-        gray = cv2.cvtColor(smooth, cv2.COLOR_BGR2GRAY)
-        edges = cv2.adaptiveThreshold(
-            gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C,
-            cv2.THRESH_BINARY, 9, 9
-        )
-        cartoon = cv2.bitwise_and(smooth, smooth, mask=edges)
-
-        # --- The In-Memory Magic ---
-        # 1. Encode the image into a JPEG buffer in memory
-        success, buffer = cv2.imencode(".jpg", cartoon)
-        if not success:
-            return None
-
-        # 2. Convert buffer to a BytesIO object (acts like a file)
-        memory_file = io.BytesIO(buffer.tobytes())
-        memory_file.seek(0)  # Reset pointer to the start of the file
-
-        return memory_file
-    except Exception as e:
-        # Use your project's logger here
-        print(f"OpenCV processing failed for {username}: {e}")
-        return None
-
-def send_email(subject: str, recipients: list, html: str) -> bool:
-    msg = Message(subject=subject, recipients=recipients, html=html)
-    try:
-        mail.send(msg)
-        logger.info(f"Email sent successfully to {recipients}")
-        return True
-    except Exception as e:
-        logger.exception(f"Email failed for {recipients}: {e}")
-        return False
+def send_email(subject: str, recipients: list, html: str):
+    """
+    Queue an email in the outbox (app/utils/outbox.py). It is delivered
+    after the caller commits, in the same transaction as its other changes.
+    """
+    return queue_email(subject, recipients, html)
 
 # ============================================================
 # AUTH ROUTES
@@ -119,6 +95,7 @@ def get_upload_dir(subfolder="ProfilePics"): # Add the parameter here
 
 
 @bp.route("/register", methods=["POST"])
+@rate_limited("register", account=form_field("email"))
 def register():
     data = request.form
     username = data.get("username")
@@ -132,6 +109,12 @@ def register():
     if User.query.filter((User.username == username) | (User.email == email)).first():
         return jsonify({"msg": "User already exists"}), 400
 
+    # Hash first, so a saturated hasher turns us away before any upload is stored
+    try:
+        password_hash = hash_password(password)
+    except PasswordHasherBusy as e:
+        return hashing_busy(e)
+
     db_profile_path = None
 
 
@@ -150,50 +133,37 @@ def register():
         upload_dir = get_upload_dir("ProfilePics") 
         final_save_path = os.path.join(upload_dir, final_filename)
 
-        # 2. Save incoming file to temp for OpenCV
-        temp_path = os.path.join("/tmp", f"raw_{uuid.uuid4().hex}.{ext}")
-        pic.save(temp_path)
-
-        
-
+        # 2. Store the original right away; it is served until the
+        # cartoonized version is ready (app/utils/image_worker.py)
         try:
-            # 3. Process image (Cartoonize)
-            processed_mem_file = cartoonize_image(temp_path, username)
-            
-            if processed_mem_file:
-                # 4. Save the IN-MEMORY cartoon image to local disk
-                with open(final_save_path, 'wb') as f:
-                    f.write(processed_mem_file.getbuffer())
-            else:
-                # Fallback: Copy original if processing fails
-                import shutil
-                shutil.copy(temp_path, final_save_path)
-
-            # 5. Store the relative path in DB for URL generation later
-            # Typically: "ProfilePics/filename.jpg"
-            db_profile_path = os.path.join("ProfilePics", final_filename)
-
+            pic.save(final_save_path)
         except Exception as e:
-            current_app.logger.error(f"Image processing failed: {e}")
+            current_app.logger.error(f"Saving profile picture failed: {e}")
             return jsonify({"msg": "Image processing error"}), 500
-        finally:
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
+
+        # 3. Store the relative path in DB for URL generation later
+        # Typically: "ProfilePics/filename.jpg"
+        db_profile_path = os.path.join("ProfilePics", final_filename)
 
     # 6. Create User
     user = User(
         username=username,
         email=email,
-        password=generate_password_hash(password),
+        password=password_hash,
         role=role,
         is_approved=(role == "commentator"),
         profile_picture=db_profile_path,
         is_confirmed=False
     )
     db.session.add(user)
-    db.session.commit()
 
-    # Generate Confirmation Email
+    job = None
+    if db_profile_path:
+        db.session.flush()
+        job = ImageJob(user_id=user.id, kind="cartoonize", source_path=db_profile_path)
+        db.session.add(job)
+
+    # Generate Confirmation Email (queued with the user row, sent after commit)
     ts = get_serializer()
     token = ts.dumps(email, salt="email-confirm-salt")
     frontend_url = current_app.config.get("FRONTEND_URL",
@@ -207,6 +177,14 @@ def register():
     """
 
     send_email("Confirm Your Email", [email], email_html)
+    db.session.commit()
+
+    # 7. Cartoonize in the background; the user keeps the original on failure
+    if job is not None:
+        try:
+            get_worker().submit(job.id)
+        except Exception as e:
+            current_app.logger.error(f"Queueing image job {job.id} failed: {e}")
 
     return jsonify({"msg": "Registration successful. Check your email to confirm."}), 201
 
@@ -231,6 +209,7 @@ def confirm(token):
 
 
 @bp.route("/login", methods=["POST"])
+@rate_limited("login", account=json_field("email"))
 def login():
     data = request.get_json()
     email = data.get("email")
@@ -238,8 +217,11 @@ def login():
 
     user = User.query.filter_by(email=email).first()
 
-    if not user or not check_password_hash(user.password, password):
-        return jsonify({"msg": "Invalid credentials"}), 401
+    try:
+        if not user or not verify_password(user.password, password):
+            return jsonify({"msg": "Invalid credentials"}), 401
+    except PasswordHasherBusy as e:
+        return hashing_busy(e)
 
     if not user.is_confirmed:
         return jsonify({"msg": "Please confirm your email first"}), 403
@@ -250,6 +232,15 @@ def login():
     if user.is_blocked:
         return jsonify({"msg": "Your account has been blocked"}), 403
 
+    # Upgrade hashes made with older PASSWORD_HASH_METHOD parameters while
+    # we have the plaintext; best effort, the login goes ahead regardless
+    if needs_rehash(user.password):
+        try:
+            user.password = hash_password(password)
+            db.session.commit()
+        except PasswordHasherBusy:
+            pass
+
     # Create token with role claim for our role_required decorator
     access_token = create_access_token(
     identity=str(user.id),
@@ -276,7 +267,58 @@ def login():
     }), 200
 
 
+@bp.route("/refresh", methods=["POST"])
+def refresh():
+    """
+    Trade a refresh token for a new access token and a new refresh token.
+
+    The token is looked up by its keyed digest and rotated: the presented
+    token is revoked, so each one works once. Presenting an already revoked
+    token means it leaked (or a client raced itself), so every refresh token
+    of that user is revoked.
+    """
+    data = request.get_json(silent=True) or {}
+    raw_token = data.get("refresh_token")
+    if not raw_token or not isinstance(raw_token, str):
+        return jsonify({"msg": "Refresh token is required"}), 400
+
+    record = RefreshToken.find(raw_token, for_update=True)
+    if record is None:
+        return jsonify({"msg": "Invalid refresh token"}), 401
+
+    if record.revoked:
+        RefreshToken.revoke_all(record.user_id)
+        db.session.commit()
+        current_app.logger.warning(f"Revoked refresh token reused for user {record.user_id}")
+        return jsonify({"msg": "Invalid refresh token"}), 401
+
+    user = record.user
+    if not record.is_valid() or user is None or user.is_blocked:
+        db.session.rollback()
+        return jsonify({"msg": "Invalid refresh token"}), 401
+
+    record.revoke()
+    _, new_raw_token = RefreshToken.issue(
+        user.id, timedelta(days=current_app.config.get("REFRESH_TOKEN_DAYS", 30))
+    )
+    db.session.commit()
+
+    access_token = create_access_token(
+        identity=str(user.id),
+        additional_claims={
+            "role": user.role,
+            "session_token": user.session_token
+        },
+        expires_delta=ACCESS_EXPIRES
+    )
+    return jsonify({
+        "access_token": access_token,
+        "refresh_token": new_raw_token
+    }), 200
+
+
 @bp.route("/reset-password/request", methods=["POST"])
+@rate_limited("reset_request", account=json_field("email"))
 def request_reset():
     data = request.get_json()
     email = data.get("email")
@@ -291,6 +333,7 @@ def request_reset():
         
         html = f"<p>Click to reset your password: <a href='{reset_link}'>Reset Now</a></p>"
         send_email("Password Reset Request", [email], html)
+        db.session.commit()
 
     return jsonify({"msg": "If the account exists, a reset email has been sent."}), 200
 
@@ -316,12 +359,18 @@ def confirm_reset():
         return jsonify({"msg": "User not found"}), 404
 
     # 1. Update the password
-    user.password = generate_password_hash(new_password)
+    try:
+        user.password = hash_password(new_password)
+    except PasswordHasherBusy as e:
+        return hashing_busy(e)
     
     # 2. Rotate the session_token
     # This changes the "key" stored in the DB. Existing JWTs will still have 
     # the OLD session_token in their claims, making them fail validation.
     user.session_token = str(uuid.uuid4())
+    session_cache.invalidate_on_commit(user.id)
+    # Refresh tokens would mint access tokens for the new session
+    RefreshToken.revoke_all(user.id)
     
     try:
         db.session.commit()
@@ -1,6 +1,6 @@
 import os
 from flask import Blueprint, request, jsonify, current_app, send_from_directory
-from sqlalchemy import func, or_
+from sqlalchemy import func, select
 from sqlalchemy.orm import joinedload
 from flask_jwt_extended import jwt_required
 from werkzeug.utils import secure_filename
@@ -8,9 +8,16 @@ from werkzeug.utils import secure_filename
 from app.models.category import Category
 from app.models.associations import post_categories
 from app.models.post import Post
+from app.models.rating import PostRatingSummary
 from app.models.user import User
 from app.extensions import db
 from app.utils.decorators import role_required
+from app.utils.counts import paginate_with_count
+from app.utils import search as post_search
+from app.utils.facets import wants_facets, facet_counts
+from app.utils.response_cache import cache_anonymous
+from app.utils.conditional import conditional_get, latest
+from app.utils.images import generate_variants, variant_files, variant_urls
 
 bp = Blueprint("category", __name__, url_prefix="/api/categories")
 
@@ -38,13 +45,13 @@ def allowed_file(filename):
     return ext in allowed
 
 def save_category_file(file_storage):
-    """Saves file with 'cat_' prefix and returns the filename."""
+    """Saves file with 'cat_' prefix plus its variants; returns (filename, variants)."""
     upload_dir = get_upload_dir()
     # Logic similar to post.py: prefixing to prevent collisions
     filename = "cat_" + secure_filename(file_storage.filename)
     target = os.path.join(upload_dir, filename)
     file_storage.save(target)
-    return filename
+    return filename, generate_variants(target)
 
 def get_file_url(filename: str) -> str:
     """Generates the full URL for a category image."""
@@ -54,11 +61,26 @@ def get_file_url(filename: str) -> str:
     return f"{base}CategoryPics/{filename}"
 
 
+def remove_category_files(upload_dir, category):
+    """Delete a category's cover image and its variants from disk."""
+    for name in [category.image_path, *variant_files(category.image_variants)]:
+        path = os.path.join(upload_dir, name)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def get_variant_urls(variants):
+    """Per-variant URLs of a category image ({} if it has none)."""
+    base = current_app.config.get("IMAGE_BASE_URL", "/media/")
+    return variant_urls(f"{base}CategoryPics/", variants)
+
+
 
 # ------------------------------------------------------
 # 1. CATEGORY LIST WITH POST COUNT (For Admin/Sidebar)
 # ------------------------------------------------------
 @bp.route("/with_post_count", methods=["GET"])
+@cache_anonymous(["categories", "feed"])
 def categories_with_post_count():
     # Get pagination parameters from the URL (e.g., /with_post_count?page=1&per_page=10)
     page = request.args.get("page", 1, type=int)
@@ -70,6 +92,7 @@ def categories_with_post_count():
             Category.id,
             Category.name,
             Category.image_path,
+            Category.image_variants,
             db.func.count(post_categories.c.post_id).label("post_count")
         )
         .outerjoin(post_categories, Category.id == post_categories.c.category_id)
@@ -88,7 +111,8 @@ def categories_with_post_count():
             "id": cat.id, 
             "name": cat.name, 
             "post_count": cat.post_count,
-            "image_url": f"{base}CategoryPics/{cat.image_path}" if cat.image_path else None
+            "image_url": f"{base}CategoryPics/{cat.image_path}" if cat.image_path else None,
+            "image_variants": get_variant_urls(cat.image_variants)
         }
         for cat in pagination.items
     ]
@@ -104,10 +128,36 @@ def categories_with_post_count():
         "has_prev": pagination.has_prev
     }), 200
 
+def categories_version():
+    """Validator for the category list: number of categories and last change."""
+    count, changed = db.session.query(func.count(Category.id), func.max(Category.updated_at)).one()
+    return (count, changed), latest(changed)
+
+
+def category_posts_version(category_id):
+    """Validator for a category page: the category plus its posts and their ratings."""
+    in_category = post_categories.c.category_id == Category.id
+    row = db.session.query(
+        Category.updated_at,
+        select(func.count(post_categories.c.post_id)).where(in_category).scalar_subquery(),
+        select(func.max(Post.updated_at))
+        .join(post_categories, post_categories.c.post_id == Post.id)
+        .where(in_category).scalar_subquery(),
+        select(func.max(PostRatingSummary.updated_at))
+        .join(post_categories, post_categories.c.post_id == PostRatingSummary.post_id)
+        .where(in_category).scalar_subquery(),
+    ).filter(Category.id == category_id).first()
+    if row is None:
+        return None
+    return tuple(row), latest(row[0], row[2], row[3])
+
+
 # ------------------------------------------------------
 # 2. SIMPLE CATEGORY LIST (For Dropdowns)
 # ------------------------------------------------------
 @bp.route("/list_categories", methods=["GET"])
+@conditional_get(categories_version)
+@cache_anonymous(["categories"])
 def list_categories():
     categories = Category.query.order_by(Category.name.asc()).all()
     return jsonify([
@@ -133,8 +183,8 @@ def create_category():
 
     # Save using the new helper logic
     try:
-        filename = save_category_file(image)
-        category = Category(name=name, image_path=filename)
+        filename, variants = save_category_file(image)
+        category = Category(name=name, image_path=filename, image_variants=variants)
         db.session.add(category)
         db.session.commit()
     except Exception as e:
@@ -146,6 +196,7 @@ def create_category():
         "id": category.id,
         "name": category.name,
         "image_url": get_file_url(filename),
+        "image_variants": get_variant_urls(variants),
     }), 201
 
 
@@ -168,10 +219,11 @@ def search_by_category():
     if not category:
         return jsonify({"message": f"No category found with name '{category_name}'."}), 404
 
-    # Use joinedload to prevent N+1 query problem for author and ratings
+    # Use joinedload to prevent N+1 query problem for author; the rating
+    # summary is joined by the Post mapper itself
     posts = (
         Post.query
-        .options(joinedload(Post.author), joinedload(Post.ratings))
+        .options(joinedload(Post.author))
         .filter(Post.categories.any(id=category.id))
         .order_by(Post.created_at.desc())
         .all()
@@ -179,14 +231,11 @@ def search_by_category():
 
     results = []
     for post in posts:
-        # Calculate average rating
-        avg = round(sum(r.value for r in post.ratings) / len(post.ratings), 2) if post.ratings else None
-
         results.append({
             "id": post.id,
             "title": post.title,
             "content": post.content,
-            "average_rating": avg,
+            "average_rating": post.average_rating,
             "timestamp": post.created_at.isoformat(),
             "author": {
                 "id": post.author.id if post.author else None,
@@ -225,9 +274,7 @@ def delete_category(category_id):
 
     try:
         if category.image_path:
-            file_path = os.path.join(upload_dir, category.image_path)
-            if os.path.exists(file_path):
-                os.remove(file_path)
+            remove_category_files(upload_dir, category)
 
         db.session.delete(category)
         db.session.commit()
@@ -253,6 +300,7 @@ def search_categories():
             Category.id,
             Category.name,
             Category.image_path,
+            Category.image_variants,
             db.func.count(post_categories.c.post_id).label("post_count")
         )
         .outerjoin(post_categories, Category.id == post_categories.c.category_id)
@@ -268,7 +316,8 @@ def search_categories():
             "id": cat.id,
             "name": cat.name,
             "post_count": cat.post_count,
-            "image_url": f"{base}CategoryPics/{cat.image_path}" if cat.image_path else None
+            "image_url": f"{base}CategoryPics/{cat.image_path}" if cat.image_path else None,
+            "image_variants": get_variant_urls(cat.image_variants)
         }
         for cat in categories
     ]
@@ -281,6 +330,7 @@ def search_categories():
 # 7. SEARCH CATEGORIES BY id
 # ------------------------------------------------------
 @bp.route('/category_by_id/<int:category_id>', methods=['GET'])
+@conditional_get(category_posts_version)
 def get_category_by_id(category_id):
     # 1. Get query parameters for pagination
     # default to page 1, 10 items per page
@@ -326,6 +376,7 @@ def update_category(category_id):
     category = Category.query.get_or_404(category_id)
     
     new_name = request.form.get('name')
+    renamed = bool(new_name) and new_name != category.name
     if new_name:
         category.name = new_name
 
@@ -335,25 +386,29 @@ def update_category(category_id):
 
         # Delete old file if it exists (Cleanup logic from post.py)
         if category.image_path:
-            old_path = os.path.join(upload_dir, category.image_path)
-            if os.path.exists(old_path):
-                try:
-                    os.remove(old_path)
-                except Exception as e:
-                    current_app.logger.error(f"Error deleting old category image: {e}")
+            try:
+                remove_category_files(upload_dir, category)
+            except Exception as e:
+                current_app.logger.error(f"Error deleting old category image: {e}")
 
         # Save new file
-        filename = save_category_file(image)
+        filename, variants = save_category_file(image)
         category.image_path = filename
+        category.image_variants = variants
 
     try:
+        if renamed:
+            # Category names are part of each post's search document
+            db.session.flush()
+            Post.refresh_search_vectors([p.id for p in category.posts])
         db.session.commit()
         return jsonify({
             "msg": "Category updated successfully",
             "category": {
                 "id": category.id,
                 "name": category.name,
-                "image_url": get_file_url(category.image_path)
+                "image_url": get_file_url(category.image_path),
+                "image_variants": get_variant_urls(category.image_variants)
             }
         }), 200
     except Exception as e:
@@ -373,43 +428,47 @@ def search_posts():
     if not query:
         return jsonify({"msg": "Search query 'q' is required."}), 400
 
-    # Search across title, content, author username, and category names
-    search_filter = or_(
-        Post.title.ilike(f"%{query}%"),
-        Post.content.ilike(f"%{query}%"),
-        User.username.ilike(f"%{query}%"),
-        Category.name.ilike(f"%{query}%")
+    # Ranked full-text search over title, content, author username and
+    # category names (all folded into Post.search_vector, GIN indexed)
+    rank = post_search.rank(query)
+    matched = (
+        db.session.query(Post, rank.label("rank"))
+        .options(joinedload(Post.author))
+        .filter(post_search.matches(query), Post.is_published == True)
     )
+    posts_query = matched.order_by(rank.desc(), Post.created_at.desc(), Post.id.desc())
 
-    posts_query = (
-        db.session.query(Post)
-        .join(User, Post.author_id == User.id)
-        .outerjoin(post_categories)
-        .outerjoin(Category)
-        .filter(search_filter, Post.is_published == True)
-        .order_by(Post.created_at.desc())
-        .distinct()
+    paginated = paginate_with_count(
+        posts_query, page, per_page, "posts:search", ("post", "users", "category", "post_categories"),
+        filters={"q": query}
     )
-
-    paginated = posts_query.paginate(page=page, per_page=per_page, error_out=False)
+    snippets = post_search.snippets([post.id for post, _ in paginated.items], query)
 
     results = [
         {
             "id": post.id,
             "title": post.title,
             "content": post.content[:300] + ("..." if len(post.content) > 300 else ""),
+            "snippet": snippets.get(post.id),
+            "rank": round(float(score), 4),
             "created_at": post.created_at.isoformat(),
             "author": post.author.username,
             "author_id": post.author.id,
             "image_url": post.image_url
         }
-        for post in paginated.items
+        for post, score in paginated.items
     ]
 
-    return jsonify({
+    response = {
         "total": paginated.total,
+        "total_exact": paginated.total_exact,
         "pages": paginated.pages,
         "current_page": paginated.page,
         "per_page": paginated.per_page,
         "results": results
-    }), 200
\ No newline at end of file
+    }
+    # Category/author counts for every match, not just this page
+    if wants_facets(request.args):
+        response["facets"] = facet_counts(matched)
+
+    return jsonify(response), 200
\ No newline at end of file
@@ -2,8 +2,9 @@
 
 import bleach
 from flask import Blueprint, request, jsonify, current_app
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from sqlalchemy import func
+from flask_jwt_extended import jwt_required
+from sqlalchemy import func, and_
+from sqlalchemy.orm import aliased
 
 from app.models.comment import Comment
 from app.models.user import User
@@ -11,6 +12,11 @@ from app.models.post import Post
 from app.models.rating import CommentRating
 from app.extensions import db
 from app.utils.decorators import role_required
+from app.utils.identity import get_current_user
+from app.utils.ratings import parse_rating_value, parse_bulk_ratings, rating_result
+from app.utils.pagination import keyset_paginate, InvalidCursor
+from app.utils.response_cache import invalidate_on_commit
+from app.utils.conditional import conditional_get, latest
 
 bp = Blueprint("comment", __name__, url_prefix="/api/comments")
 
@@ -44,6 +50,71 @@ def sanitize_html(content: str) -> str:
     )
 
 
+def comment_page_query(post_id, viewer_id=None):
+    """
+    Build the query for a post's comments with everything a page needs.
+
+    Each row carries the comment columns, the author's username, the
+    average rating and (when `viewer_id` is given) the viewer's own rating,
+    so a page costs one SELECT (plus the pagination COUNT) whatever its size.
+    """
+    avg_ratings = (
+        db.session.query(
+            CommentRating.comment_id.label("comment_id"),
+            func.avg(CommentRating.value).label("avg_rating")
+        )
+        .join(Comment, Comment.id == CommentRating.comment_id)
+        .filter(Comment.post_id == post_id)
+        .group_by(CommentRating.comment_id)
+        .subquery()
+    )
+
+    columns = [
+        Comment.id,
+        Comment.content,
+        Comment.user_id,
+        Comment.created_at,
+        User.username.label("author"),
+        avg_ratings.c.avg_rating,
+    ]
+
+    query = (
+        db.session.query(*columns)
+        .outerjoin(User, User.id == Comment.user_id)
+        .outerjoin(avg_ratings, avg_ratings.c.comment_id == Comment.id)
+    )
+
+    if viewer_id is not None:
+        viewer_rating = aliased(CommentRating)
+        query = query.add_columns(viewer_rating.value.label("user_rating")).outerjoin(
+            viewer_rating,
+            and_(viewer_rating.comment_id == Comment.id, viewer_rating.user_id == viewer_id)
+        )
+
+    return query.filter(Comment.post_id == post_id).order_by(
+        Comment.created_at.desc(), Comment.id.desc()
+    )
+
+
+def serialize_comment_row(row, viewer=None):
+    """Serialize a row from comment_page_query() for the given viewer (User or None)."""
+    data = {
+        "id": row.id,
+        "content": row.content,
+        "author": row.author if row.author else "Deleted User",
+        "author_id": row.user_id,
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+        "rating": round(float(row.avg_rating), 2) if row.avg_rating is not None else None,
+    }
+    if viewer is not None:
+        is_owner = row.user_id == viewer.id
+        is_admin = viewer.role in ["admin", "superadmin"]
+        data["user_rating"] = row.user_rating
+        data["can_delete"] = is_owner or is_admin
+        data["can_edit"] = is_owner or is_admin
+    return data
+
+
 # ---------------------------------------------------------------------------
 # Add Comment
 # ---------------------------------------------------------------------------
@@ -54,8 +125,7 @@ def add_comment(post_id):
     if not post:
         return jsonify({"msg": "Post not found"}), 404
 
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    user = get_current_user()
 
     if not user or user.is_blocked:
         return jsonify({"msg": "Account disabled"}), 403
@@ -79,40 +149,57 @@ def add_comment(post_id):
     return jsonify({"msg": "Comment added", "comment_id": comment.id}), 201
 
 
+def post_comments_version(post_id):
+    """Validator for a post's comment pages: comment count and last change."""
+    row = (
+        db.session.query(func.count(Comment.id), func.max(Comment.updated_at))
+        .select_from(Post)
+        .outerjoin(Comment, Comment.post_id == Post.id)
+        .filter(Post.id == post_id)
+        .group_by(Post.id)
+        .first()
+    )
+    if row is None:
+        return None
+    return tuple(row), latest(row[1])
+
+
 # ---------------------------------------------------------------------------
 # 1. GET COMMENTS FOR POST
 # ---------------------------------------------------------------------------
 @bp.route("/posts/<int:post_id>", methods=["GET"])
+@conditional_get(post_comments_version)
 def get_comments_for_post(post_id):
     if not Post.query.get(post_id):
         return jsonify({"msg": "Post not found"}), 404
 
     page = max(1, request.args.get("page", 1, type=int))
-    per_page = min(50, request.args.get("per_page", 10, type=int))
-
-    # Single query to get comments and their average ratings
-    query = (
-        db.session.query(
-            Comment, 
-            func.avg(CommentRating.value).label("avg_rating")
-        )
-        .outerjoin(CommentRating, Comment.id == CommentRating.comment_id)
-        .filter(Comment.post_id == post_id)
-        .group_by(Comment.id)
-        .order_by(Comment.created_at.desc())
+    per_page = max(1, min(50, request.args.get("per_page", 10, type=int)))
+    cursor = request.args.get("cursor")
+
+    # Keyset mode (?cursor=) for infinite scroll: seeks past the last
+    # (created_at, id) seen and never counts the comments
+    if cursor is not None:
+        try:
+            rows, next_cursor = keyset_paginate(
+                comment_page_query(post_id), Comment.created_at, Comment.id, cursor, per_page
+            )
+        except InvalidCursor:
+            return jsonify({"msg": "Invalid cursor"}), 400
+
+        return jsonify({
+            "per_page": per_page,
+            "next_cursor": next_cursor,
+            "has_next": next_cursor is not None,
+            "comments": [serialize_comment_row(row) for row in rows],
+        }), 200
+
+    # Single query to get comments, their authors and average ratings
+    pagination = comment_page_query(post_id).paginate(
+        page=page, per_page=per_page, error_out=False
     )
 
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-
-    results = []
-    for c, avg_rating in pagination.items:
-        results.append({
-            "id": c.id,
-            "content": c.content,
-            "author": c.commenter.username if c.commenter else "Deleted User",
-            "created_at": c.created_at.isoformat(),
-            "rating": round(float(avg_rating), 2) if avg_rating else None
-        })
+    results = [serialize_comment_row(row) for row in pagination.items]
 
     return jsonify({
         "total": pagination.total,
@@ -127,18 +214,17 @@ def get_comments_for_post(post_id):
 @bp.route("/delete_comment/<int:comment_id>", methods=["DELETE"])
 @jwt_required()
 def delete_comment(comment_id):
-    user_id = get_jwt_identity()
     comment = Comment.query.get(comment_id)
 
     if not comment:
         return jsonify({"msg": "Comment not found"}), 404
 
-    user = User.query.get(user_id)
+    user = get_current_user()
 
     if user.is_blocked:
         return jsonify({"msg": "Account blocked"}), 403
 
-    is_owner = comment.user_id == user_id
+    is_owner = comment.user_id == user.id
     is_admin = user.role in ["admin", "superadmin"]
 
     if not (is_owner or is_admin):
@@ -156,40 +242,59 @@ def delete_comment(comment_id):
 @bp.route("/rate/<int:comment_id>", methods=["POST"])
 @jwt_required()
 def rate_comment(comment_id):
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    comment = Comment.query.get(comment_id)
+    user = get_current_user()
 
-    if not user or not comment:
+    if not user:
         return jsonify({"msg": "Invalid user or comment"}), 404
 
     if user.is_blocked:
         return jsonify({"msg": "Account blocked"}), 403
 
     data = request.get_json() or {}
-    value = data.get("value")
+    value = parse_rating_value(data.get("value"))
 
-    if value is None or not (1 <= value <= 5):
+    if value is None:
         return jsonify({"msg": "Rating must be between 1 and 5"}), 400
 
-    rating = CommentRating.query.filter_by(
-        user_id=user.id, comment_id=comment_id
-    ).first()
-
-    if rating:
-        rating.value = value
-        msg = "Rating updated"
-    else:
-        rating = CommentRating(
-            user_id=user.id,
-            comment_id=comment_id,
-            value=value,
-        )
-        db.session.add(rating)
-        msg = "Rating submitted"
+    # One statement: upsert the rating and return the new comment aggregate
+    row = CommentRating.upsert_many(user.id, {comment_id: value}).get(comment_id)
+    if row is None:
+        db.session.rollback()
+        return jsonify({"msg": "Invalid user or comment"}), 404
+    invalidate_on_commit(f"post:{row['post_id']}")
+    db.session.commit()
+
+    result = rating_result("comment_id", comment_id, row)
+    msg = "Rating updated" if row["old_value"] is not None else "Rating submitted"
+    return jsonify({"msg": msg, "user_rating": value,
+                    "rating": result["rating"], "rating_count": result["rating_count"]}), 200
+
 
+@bp.route("/rate", methods=["POST"])
+@jwt_required()
+def rate_comments_bulk():
+    """Rate several comments at once: {"ratings": [{"comment_id": 1, "value": 4}, ...]}."""
+    user = get_current_user()
+
+    if not user:
+        return jsonify({"msg": "User not found"}), 404
+
+    if user.is_blocked:
+        return jsonify({"msg": "Account blocked"}), 403
+
+    ratings, error = parse_bulk_ratings(request.get_json() or {}, "comment_id")
+    if error:
+        return jsonify({"msg": error}), 400
+
+    rows = CommentRating.upsert_many(user.id, ratings)
+    invalidate_on_commit(*{f"post:{row['post_id']}" for row in rows.values()})
     db.session.commit()
-    return jsonify({"msg": msg}), 200
+
+    return jsonify({
+        "msg": "Ratings saved",
+        "results": [rating_result("comment_id", cid, row) for cid, row in rows.items()],
+        "not_found": [cid for cid in ratings if cid not in rows]
+    }), 200
 
 
 # ---------------------------------------------------------------------------
@@ -198,8 +303,7 @@ def rate_comment(comment_id):
 @bp.route("/edit_comment/<int:comment_id>", methods=["PUT"])
 @jwt_required()
 def edit_comment(comment_id):
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    user = get_current_user()
 
     if not user:
         return jsonify({"msg": "User not found"}), 404
@@ -209,7 +313,7 @@ def edit_comment(comment_id):
 
     comment = Comment.query.get_or_404(comment_id)
 
-    if comment.user_id != user_id and user.role not in ["admin", "superadmin"]:
+    if comment.user_id != user.id and user.role not in ["admin", "superadmin"]:
         return jsonify({"msg": "Forbidden"}), 403
 
     data = request.get_json() or {}
@@ -3,17 +3,20 @@
 import re
 from math import ceil
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from sqlalchemy import func, or_
 from sqlalchemy.orm import joinedload, subqueryload
 
 from app.extensions import db
 from app.models.contact import ContactMessage
+from app.models.user import User
 from app.models.post import Post
 from app.models.category import Category
-from app.models.user import User
 from app.models.rating import PostRating as Rating   # rating model
 from app.utils.decorators import role_required
+from app.utils.rate_limit import json_field, rate_limited
+from app.utils.identity import get_current_user
+from app.utils.counts import paginate_with_count
 
 bp = Blueprint("contact", __name__, url_prefix="/api/contact")
 
@@ -49,6 +52,7 @@ def paginated_response(pagination):
     return {
         "messages": [serialize_message(m) for m in pagination.items],
         "total": pagination.total,
+        "total_exact": getattr(pagination, "total_exact", True),
         "page": pagination.page,
         "per_page": pagination.per_page,
         "pages": pagination.pages,
@@ -56,18 +60,15 @@ def paginated_response(pagination):
 
 
 # Serialize
-def serialize_post(post, user):
-    avg = None
-    if post.ratings:
-        vals = [r.value for r in post.ratings]
-        avg = round(sum(vals) / len(vals), 2) if vals else None
-
-    watched_ids = {p.id for p in user.watched} if user else set()
+def serialize_post(post, user, watched_ids=None):
+    """`watched_ids`: the user's watched ids among a page of posts, if known."""
+    if watched_ids is None:
+        watched_ids = User.watched_ids(user.id, [post.id]) if user else set()
 
     return {
         "id": post.id,
         "title": post.title,
-        "average_rating": avg,
+        "average_rating": post.average_rating,
         "author": {
             "id": post.author.id,
             "username": post.author.username,
@@ -86,16 +87,19 @@ def serialize_post(post, user):
 @jwt_required()
 @role_required("admin", "superadmin")
 def list_messages():
-    user = User.query.get(get_jwt_identity())
+    user = get_current_user()
     if user.is_blocked:
         return jsonify({"msg": "Account blocked"}), 403
 
     page = request.args.get("page", 1, type=int)
     per_page = min(50, request.args.get("per_page", 10, type=int))
 
-    pagination = ContactMessage.query \
-        .order_by(ContactMessage.created_at.desc()) \
-        .paginate(page=page, per_page=per_page, error_out=False)
+    # Whole-inbox listing: eligible for the planner's row estimate
+    pagination = paginate_with_count(
+        ContactMessage.query.order_by(ContactMessage.created_at.desc()),
+        page, per_page, "messages:all", ("contact_message",),
+        estimate_table="contact_message"
+    )
 
     return jsonify(paginated_response(pagination)), 200
 
@@ -107,7 +111,7 @@ def list_messages():
 @jwt_required()
 @role_required("admin", "superadmin")
 def list_unread_messages():
-    user = User.query.get(get_jwt_identity())
+    user = get_current_user()
     if user.is_blocked:
         return jsonify({"msg": "Account blocked"}), 403
 
@@ -128,7 +132,7 @@ def list_unread_messages():
 @jwt_required()
 @role_required("admin", "superadmin")
 def list_unactioned_messages():
-    user = User.query.get(get_jwt_identity())
+    user = get_current_user()
     if user.is_blocked:
         return jsonify({"msg": "Account blocked"}), 403
 
@@ -147,7 +151,7 @@ def list_unactioned_messages():
 @jwt_required()
 @role_required("admin", "superadmin")
 def list_actioned_messages():
-    user = User.query.get(get_jwt_identity())
+    user = get_current_user()
     if user.is_blocked:
         return jsonify({"msg": "Account blocked"}), 403
 
@@ -209,6 +213,7 @@ def mark_message_as_unactioned(msg_id):
 # Public: Send a Contact Message
 # -----------------------------------------------------------
 @bp.route("/send_message", methods=["POST"])
+@rate_limited("contact", account=json_field("email"))
 def send_message():
     data = request.get_json() or {}
 
@@ -2,22 +2,26 @@
 
 import os
 import re
-import requests
 import secrets
 import io
-from datetime import timedelta, datetime, timezone
+from datetime import timedelta
 from urllib.parse import urlencode
 
 from flask import Blueprint, request, jsonify, redirect, current_app
 from flask_jwt_extended import (
     create_access_token,
     jwt_required,
-    get_jwt_identity
 )
 from cryptography.fernet import Fernet
 
 from app.extensions import db
 from app.models.user import User, RefreshToken
+from app.utils.identity import get_current_user
+from app.utils import session_cache
+from app.utils.google_oidc import IdTokenError, get_oidc
+from app.utils.google_revoke import queue_revocation
+from app.utils import outbound
+from app.utils.outbound import CircuitOpenError
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -36,7 +40,6 @@ GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
 
 GOOGLE_AUTH_URL = os.getenv("GOOGLE_AUTH_URL", "https://accounts.google.com/o/oauth2/v2/auth")
 GOOGLE_TOKEN_URL = os.getenv("GOOGLE_TOKEN_URL", "https://oauth2.googleapis.com/token")
-GOOGLE_USERINFO_URL = os.getenv("GOOGLE_USERINFO_URL", "https://www.googleapis.com/oauth2/v3/userinfo")
 
 # Encryption for Google Refresh Tokens
 ENCRYPTION_KEY = os.getenv("ENCRYPTION_KEY", "").encode()
@@ -98,10 +101,12 @@ def google_callback():
     if not code:
         return jsonify({"msg": "Missing authorization code"}), 400
 
-    # 1. Exchange Code for Tokens
+    oidc = get_oidc()
+
+    # 1. Exchange Code for Tokens (pooled session, kept-alive connection)
     try:
-        token_response = requests.post(
-            GOOGLE_TOKEN_URL,
+        token_response = outbound.request(
+            "google_token", oidc.session, "POST", GOOGLE_TOKEN_URL,
             data={
                 "code": code,
                 "client_id": GOOGLE_CLIENT_ID,
@@ -109,24 +114,27 @@ def google_callback():
                 "redirect_uri": REDIRECT_URI,
                 "grant_type": "authorization_code",
             },
-            timeout=10
         )
         token_json = token_response.json()
+    except CircuitOpenError:
+        return jsonify({"msg": "Google sign-in is temporarily unavailable"}), 503
     except Exception as e:
         return jsonify({"msg": "Google token exchange failed", "error": str(e)}), 500
 
-    access_token = token_json.get("access_token")
     google_refresh = token_json.get("refresh_token")
-    
-    if not access_token:
-        return jsonify({"msg": "Failed to obtain Google access token"}), 400
 
-    # 2. Fetch User Profile
-    userinfo = requests.get(
-        GOOGLE_USERINFO_URL,
-        headers={"Authorization": f"Bearer {access_token}"},
-        timeout=10
-    ).json()
+    if not token_json.get("id_token"):
+        return jsonify({"msg": "Failed to obtain Google ID token"}), 400
+
+    # 2. Read the profile from the id_token, verified locally against
+    # Google's cached signing keys (no userinfo round trip)
+    try:
+        userinfo = oidc.verify_id_token(token_json["id_token"], GOOGLE_CLIENT_ID)
+    except CircuitOpenError:
+        return jsonify({"msg": "Google sign-in is temporarily unavailable"}), 503
+    except IdTokenError as e:
+        current_app.logger.warning(f"Rejected Google id_token: {e}")
+        return jsonify({"msg": "Invalid Google ID token"}), 401
 
     email = userinfo.get("email")
     if not email:
@@ -149,6 +157,7 @@ def google_callback():
         # ENSURE session_token exists (Fix for 401 errors)
         if not user.session_token:
             user.session_token = secrets.token_hex(16)
+            session_cache.invalidate_on_commit(user.id)
             
         user.auth_provider = "google"
     else:
@@ -169,14 +178,9 @@ def google_callback():
     db.session.commit()
 
     # 5. Handle App-Level Refresh Token
-    app_raw_refresh = secrets.token_urlsafe(64)
-    new_refresh_record = RefreshToken(
-        user_id=user.id,
-        expires_at=datetime.now(timezone.utc) + timedelta(days=30)
+    _, app_raw_refresh = RefreshToken.issue(
+        user.id, timedelta(days=current_app.config.get("REFRESH_TOKEN_DAYS", 30))
     )
-    new_refresh_record.set_token(app_raw_refresh)
-    
-    db.session.add(new_refresh_record)
     db.session.commit()
 
     # 6. Generate Short-lived Access JWT (MATCHING auth.py claims)
@@ -201,9 +205,7 @@ def google_callback():
 @bp.route("/user/me", methods=["GET"])
 @jwt_required()
 def user_profile():
-    # Identity is stored as a string, cast to int for DB query
-    user_id = get_jwt_identity()
-    user = User.query.get(int(user_id))
+    user = get_current_user()
 
     if not user:
         return jsonify({"msg": "User not found"}), 404
@@ -225,21 +227,19 @@ def user_profile():
 @bp.route("/logout", methods=["POST"])
 @jwt_required()
 def logout():
-    user = User.query.get(int(get_jwt_identity()))
-    
-    if user and user.google_refresh_token:
-        raw_token = decrypt_token(user.google_refresh_token)
-        requests.post(
-            "https://oauth2.googleapis.com/revoke",
-            params={"token": raw_token},
-            timeout=5
-        )
-        user.google_refresh_token = None
+    user = get_current_user()
 
     # Revoke session_token to invalidate current JWTs
     if user:
         user.session_token = secrets.token_hex(16)
-        RefreshToken.query.filter_by(user_id=user.id).update({"revoked": True})
-    
+        session_cache.invalidate_on_commit(user.id)
+        RefreshToken.revoke_all(user.id)
+
+        # Google's revoke endpoint is called after the commit by the
+        # background worker (app/utils/google_revoke.py), with retries
+        if user.google_refresh_token:
+            queue_revocation(user.google_refresh_token, user_id=user.id)
+            user.google_refresh_token = None
+
     db.session.commit()
     return jsonify({"msg": "Logged out successfully"}), 200
\ No newline at end of file
@@ -0,0 +1,115 @@
+# app/routes/images.py
+"""
+On-the-fly resizing of uploads: GET /api/images/<Folder>/<file>?w=&h=&fmt=
+
+For images uploaded before upload-time variants existed (utils/images.py)
+and for sizes those variants don't cover. `w` and `h` must come from
+IMAGE_RESIZE_SIZES, so the derivative cache can only ever hold a small,
+fixed number of copies per source. The image is fitted inside the w x h box
+(either may be omitted) and never upscaled.
+
+The output format is `fmt` when given, otherwise the best one the client
+Accepts (AVIF, then WebP, falling back to JPEG). Results are kept in the
+DerivativeCache (utils/derivatives.py), bounded by IMAGE_DERIVATIVE_MAX_BYTES.
+"""
+import os
+
+import cv2
+from flask import Blueprint, current_app, jsonify, request, send_file
+
+from app.routes.media import cache_control, resolve_media
+from app.utils.derivatives import DEFAULT_MAX_BYTES, DerivativeCache
+from app.utils.images import decode_image
+
+bp = Blueprint("images", __name__, url_prefix="/api/images")
+
+DEFAULT_SIZES = (160, 320, 480, 640, 960, 1280, 1600)
+
+FORMATS = {
+    # fmt: (mimetype, encode params)
+    "avif": ("image/avif", [cv2.IMWRITE_AVIF_QUALITY, 60]),
+    "webp": ("image/webp", [cv2.IMWRITE_WEBP_QUALITY, 80]),
+    "jpg": ("image/jpeg", [cv2.IMWRITE_JPEG_QUALITY, 82, cv2.IMWRITE_JPEG_PROGRESSIVE, 1]),
+}
+# Preference order when negotiating from the Accept header
+NEGOTIATED = ("avif", "webp")
+
+
+def get_derivative_cache():
+    cache = current_app.extensions.get("image_derivatives")
+    if cache is None:
+        root = current_app.config.get("IMAGE_DERIVATIVE_DIR") or os.path.join(
+            current_app.instance_path, "derivatives"
+        )
+        cache = DerivativeCache(
+            root, current_app.config.get("IMAGE_DERIVATIVE_MAX_BYTES", DEFAULT_MAX_BYTES)
+        )
+        current_app.extensions["image_derivatives"] = cache
+    return cache
+
+
+def supported_formats():
+    return [fmt for fmt in FORMATS if cv2.haveImageWriter(f".{fmt}")]
+
+
+def negotiate_format():
+    """Explicit ?fmt= wins; otherwise the best format the client accepts."""
+    available = supported_formats()
+    fmt = request.args.get("fmt", "").lower().replace("jpeg", "jpg")
+    if fmt:
+        return fmt if fmt in available else None
+    # Only formats the client names explicitly: browsers that can't decode
+    # AVIF/WebP still send "*/*"
+    accepted = {value for value, quality in request.accept_mimetypes if quality > 0}
+    for candidate in NEGOTIATED:
+        if candidate in available and FORMATS[candidate][0] in accepted:
+            return candidate
+    return "jpg"
+
+
+def fit_inside(img, width, height):
+    """Scale `img` down to fit the box (0 = unbounded); never upscales."""
+    h, w = img.shape[:2]
+    scale = min(width / w if width else 1, height / h if height else 1, 1)
+    if scale >= 1:
+        return img
+    size = (max(1, round(w * scale)), max(1, round(h * scale)))
+    return cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+
+
+def render(path, width, height, fmt):
+    img = decode_image(path)
+    if img is None:
+        return None
+    ok, buffer = cv2.imencode(f".{fmt}", fit_inside(img, width, height), FORMATS[fmt][1])
+    return buffer.tobytes() if ok else None
+
+
+@bp.route("/<folder>/<path:filename>", methods=["GET"])
+def resized_image(folder, filename):
+    sizes = current_app.config.get("IMAGE_RESIZE_SIZES", DEFAULT_SIZES)
+    width = request.args.get("w", 0, type=int)
+    height = request.args.get("h", 0, type=int)
+    if not (width or height):
+        return jsonify({"msg": "w or h is required"}), 400
+    if any(v and v not in sizes for v in (width, height)):
+        return jsonify({"msg": "Unsupported size", "allowed": list(sizes)}), 400
+
+    fmt = negotiate_format()
+    if fmt is None:
+        return jsonify({"msg": "Unsupported format", "allowed": supported_formats()}), 400
+
+    path = resolve_media(folder, filename)
+    if path is None:
+        return jsonify({"msg": "File not found"}), 404
+
+    cached = get_derivative_cache().get_or_create(
+        path, width, height, fmt, lambda: render(path, width, height, fmt)
+    )
+    if cached is None:
+        return jsonify({"msg": "Image could not be processed"}), 415
+
+    response = send_file(cached, mimetype=FORMATS[fmt][0], conditional=True, etag=True)
+    response.headers["Cache-Control"] = cache_control()
+    response.vary.add("Accept")
+    return response
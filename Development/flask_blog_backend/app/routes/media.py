@@ -0,0 +1,63 @@
+# app/routes/media.py
+"""
+Image serving for uploads under UPLOAD_FOLDER/{PostPics,CategoryPics,ProfilePics}.
+
+Flask only checks the request and resolves the file; the bytes are sent by
+nginx when MEDIA_ACCEL_REDIRECT_PREFIX is set (X-Accel-Redirect to an
+`internal` location, see Development/nginx.conf), so slow clients never hold
+a gunicorn worker. nginx adds ETag/Last-Modified and handles Range itself;
+Content-Type and Cache-Control set here are passed through.
+
+Without the prefix (local dev) the file is streamed by Flask with the same
+Cache-Control plus ETag, Last-Modified, 304s and Range support.
+"""
+import mimetypes
+import os
+from urllib.parse import quote
+
+from flask import Blueprint, current_app, jsonify, send_file
+from werkzeug.security import safe_join
+
+bp = Blueprint("media", __name__, url_prefix="/media")
+
+MEDIA_FOLDERS = ("PostPics", "CategoryPics", "ProfilePics")
+
+
+def media_root():
+    base_folder = current_app.config.get("UPLOAD_FOLDER", "static/uploads")
+    return os.path.abspath(os.path.join(current_app.root_path, base_folder))
+
+
+def resolve_media(folder, filename):
+    """Absolute path of an upload, or None if it is not a servable file."""
+    if folder not in MEDIA_FOLDERS:
+        return None
+    path = safe_join(media_root(), folder, filename)
+    if path is None or not os.path.isfile(path):
+        return None
+    return path
+
+
+def cache_control():
+    max_age = current_app.config.get("MEDIA_CACHE_MAX_AGE", 604800)
+    return f"public, max-age={max_age}"
+
+
+@bp.route("/<folder>/<path:filename>", methods=["GET", "HEAD"])
+def serve_media(folder, filename):
+    path = resolve_media(folder, filename)
+    if path is None:
+        return jsonify({"msg": "File not found"}), 404
+
+    mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    accel_prefix = current_app.config.get("MEDIA_ACCEL_REDIRECT_PREFIX")
+
+    if accel_prefix:
+        target = quote(f"{folder}/{filename}")
+        response = current_app.response_class(mimetype=mimetype)
+        response.headers["X-Accel-Redirect"] = f"{accel_prefix.rstrip('/')}/{target}"
+    else:
+        response = send_file(path, mimetype=mimetype, conditional=True, etag=True)
+
+    response.headers["Cache-Control"] = cache_control()
+    return response
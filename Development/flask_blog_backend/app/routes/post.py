@@ -8,7 +8,7 @@ from flask_jwt_extended import (
     jwt_required, get_jwt_identity, get_jwt, verify_jwt_in_request
 )
 from werkzeug.utils import secure_filename
-from sqlalchemy import func, or_
+from sqlalchemy import func, select
 from sqlalchemy.orm import joinedload, subqueryload
 
 from app.extensions import db
@@ -16,10 +16,23 @@ from app.models.user import User
 from app.models.post import Post
 from app.models.image import Image
 from app.models.category import Category
+from app.models.associations import post_categories
 from app.models.comment import Comment
-from app.models.rating import PostRating, CommentRating
+from app.models.contact import ContactMessage
+from app.models.rating import PostRating, PostRatingSummary
 from app.models.rejections import RejectedRequest
 from app.utils.decorators import role_required
+from app.utils.identity import get_current_user
+from app.utils.ratings import parse_rating_value, parse_bulk_ratings, rating_result
+from app.utils.pagination import keyset_paginate, InvalidCursor
+from app.utils.counts import paginate_with_count, count_total
+from app.utils.facets import wants_facets, facet_counts, empty_facets
+from app.utils.response_cache import cache_anonymous, add_tags, invalidate_on_commit
+from app.utils.conditional import conditional_get, latest
+from app.utils.images import generate_variants, variant_filename, variant_urls
+from app.utils import search as post_search
+from app.routes.contact import serialize_post, sanitize_text, paginated_response
+from app.routes.comment import comment_page_query, serialize_comment_row
 
 bp = Blueprint("post", __name__, url_prefix="/api/posts")
 
@@ -94,29 +107,30 @@ def get_allowed_extensions():
 
 
 def save_file(file_storage):
+    """Save an upload plus its responsive variants; returns (filename, variants)."""
     UPLOAD_DIR = get_upload_dir()
     filename = "post_"+secure_filename(file_storage.filename)
     target = os.path.join(UPLOAD_DIR, filename)
     file_storage.save(target)
-    return filename
+    return filename, generate_variants(target)
 
 
-def file_url(filename: str) -> str:
+def file_url(filename: str, variant: str = None, fmt: str = "jpg") -> str:
+    """URL of a post image, or of one of its variants ("thumb", "card", "full")."""
     if not filename:
         return None
     if filename.startswith("http://") or filename.startswith("https://"):
         return filename
+    if variant:
+        filename = variant_filename(filename, variant, fmt)
     return f"{get_image_base_url()}PostPics/{filename}"
 
 
-def avg_rating_for_post(post_id):
-    avg = db.session.query(func.avg(PostRating.value)).filter_by(post_id=post_id).scalar()
-    return round(avg, 2) if avg is not None else None
-
-
-def avg_rating_for_comment(comment_id):
-    avg = db.session.query(func.avg(CommentRating.value)).filter_by(comment_id=comment_id).scalar()
-    return round(avg, 2) if avg is not None else None
+def image_variant_urls(image):
+    """Per-variant URLs recorded for an Image ({} if it has none)."""
+    if image is None:
+        return {}
+    return variant_urls(f"{get_image_base_url()}PostPics/", image.variants)
 
 
 def paginate_query(query, page, per_page):
@@ -126,6 +140,44 @@ def paginate_query(query, page, per_page):
     return pagination
 
 
+# ---------------------------
+# Validators (ETag / Last-Modified, see utils/conditional.py)
+# ---------------------------
+def post_version(post_id, *columns):
+    """(parts, last_modified) of a post and its images/categories, or None.
+
+    One query; `columns` are extra correlated scalar subqueries (on Post)
+    appended to the parts.
+    """
+    def scalar(stmt):
+        return stmt.scalar_subquery()
+
+    row = db.session.query(
+        Post.updated_at,
+        scalar(select(func.count(Image.id)).where(Image.post_id == Post.id)),
+        scalar(select(func.max(Image.id)).where(Image.post_id == Post.id)),
+        scalar(
+            select(func.max(Category.updated_at))
+            .join(post_categories, post_categories.c.category_id == Category.id)
+            .where(post_categories.c.post_id == Post.id)
+        ),
+        *[scalar(column) for column in columns]
+    ).filter(Post.id == post_id).first()
+    if row is None:
+        return None
+    return tuple(row), latest(*[v for v in row if isinstance(v, datetime)])
+
+
+def post_detail_version(post_id):
+    """post_version() plus the rating summary and the post's comments."""
+    return post_version(
+        post_id,
+        select(PostRatingSummary.updated_at).where(PostRatingSummary.post_id == Post.id),
+        select(func.count(Comment.id)).where(Comment.post_id == Post.id),
+        select(func.max(Comment.updated_at)).where(Comment.post_id == Post.id),
+    )
+
+
 # ---------------------------
 # Routes
 # ---------------------------
@@ -143,11 +195,10 @@ def check_title():
 @bp.route("/<int:post_id>/publish", methods=["PUT"])
 @jwt_required()
 def publish_post(post_id):
-    user_id = get_jwt_identity()
     claims = get_jwt()
     role = claims.get("role")
 
-    user = User.query.get(user_id)
+    user = get_current_user()
     if not user or not user.is_approved or user.is_blocked:
         return jsonify({"msg": "Unauthorized"}), 403
 
@@ -206,10 +257,9 @@ def unpublish_post(post_id):
 @bp.route("/create_post", methods=["POST"])
 @jwt_required()
 def create_post():
-    user_id = get_jwt_identity()
     claims = get_jwt()
     role = claims.get("role")
-    user = User.query.get(user_id)
+    user = get_current_user()
 
     if not user or not user.is_approved or user.is_blocked:
         return jsonify({"msg": "Unauthorized"}), 403
@@ -256,7 +306,7 @@ def create_post():
     categories = Category.query.filter(Category.id.in_(category_ids)).all() if category_ids else []
 
     # Save post (flush to get id)
-    post = Post(title=title, content=content, author_id=user_id)
+    post = Post(title=title, content=content, author_id=user.id)
     if categories:
         post.categories = categories
 
@@ -268,17 +318,19 @@ def create_post():
         db.session.rollback()
         return jsonify({"msg": "Invalid main image file type"}), 400
 
-    filename = save_file(main_image)
-    img = Image(file_path=filename, post_id=post.id)
+    filename, variants = save_file(main_image)
+    img = Image(file_path=filename, variants=variants, post_id=post.id)
     db.session.add(img)
 
+    Post.refresh_search_vectors([post.id])
     db.session.commit()
 
     return jsonify({
         "msg": "Post created",
         "post_id": post.id,
         "categories": [c.name for c in post.categories],
-        "main_image": file_url(filename)
+        "main_image": file_url(filename),
+        "main_image_variants": image_variant_urls(img)
     }), 201
 
 
@@ -304,19 +356,31 @@ def delete_post(post_id):
     return jsonify({"msg": "Post deleted"}), 200
 
 
+def cursor_page_response(query, cursor, per_page, serialize, items_key):
+    """Keyset mode shared by the feed endpoints: no OFFSET and no COUNT(*)."""
+    try:
+        items, next_cursor = keyset_paginate(query, Post.created_at, Post.id, cursor, per_page)
+    except InvalidCursor:
+        return jsonify({"msg": "Invalid cursor"}), 400
+
+    return jsonify({
+        "per_page": per_page,
+        "next_cursor": next_cursor,
+        "has_next": next_cursor is not None,
+        items_key: [serialize(p) for p in items]
+    }), 200
+
+
 @bp.route("", methods=["GET"])
+@cache_anonymous(["feed"])
 def list_posts():
     page = request.args.get("page", 1, type=int)
     per_page = request.args.get("per_page", 10, type=int)
     per_page = max(1, min(per_page, MAX_PER_PAGE))
+    cursor = request.args.get("cursor")
 
-    query = Post.query.filter_by(is_published=True).order_by(Post.created_at.desc())
-    pagination = paginate_query(query, page, per_page)
-
-    posts = []
-    for p in pagination.items:
-        first_img = p.images[0].file_path if p.images else None
-        posts.append({
+    def serialize(p):
+        return {
             "id": p.id,
             "title": p.title,
             "content": (p.content[:300] + ("..." if len(p.content) > 300 else "")),
@@ -324,11 +388,24 @@ def list_posts():
             "author": p.author.username if p.author else None,
             "categories": [{"id": c.id, "name": c.name} for c in p.categories],
             "images": [file_url(img.file_path) for img in p.images],
-            "rating": avg_rating_for_post(p.id)
-        })
+            "image_variants": image_variant_urls(p.images[0] if p.images else None),
+            "rating": p.average_rating
+        }
+
+    query = Post.query.filter_by(is_published=True).order_by(Post.created_at.desc())
+
+    # ?cursor= (even empty) switches to keyset mode for infinite scroll
+    if cursor is not None:
+        return cursor_page_response(query, cursor, per_page, serialize, "posts")
+
+    pagination = paginate_with_count(
+        query, max(1, page), per_page, "posts:feed", ("post",)
+    )
+    posts = [serialize(p) for p in pagination.items]
 
     return jsonify({
         "total": pagination.total,
+        "total_exact": pagination.total_exact,
         "pages": pagination.pages,
         "current_page": pagination.page,
         "per_page": pagination.per_page,
@@ -337,6 +414,7 @@ def list_posts():
 
 
 @bp.route("/posts_by_category", methods=["GET"])
+@cache_anonymous(["feed"])
 def list_posts_by_category():
     page = request.args.get("page", 1, type=int)
     per_page = request.args.get("per_page", 10, type=int)
@@ -344,6 +422,19 @@ def list_posts_by_category():
 
     search_query = request.args.get("q", "").strip()
     category_id = request.args.get("category_id", type=int)
+    cursor = request.args.get("cursor")
+
+    def serialize(p):
+        return {
+            "id": p.id,
+            "title": p.title,
+            "content": p.content,
+            "created_at": p.created_at.isoformat() if p.created_at else None,
+            "image_url": file_url(p.image_url),            # ✅ NEW FIELD
+            "images": [file_url(img.file_path) for img in p.images],
+            "image_variants": image_variant_urls(p.images[0] if p.images else None),
+            "rating": p.average_rating
+        }
 
     query = Post.query.filter(Post.is_published.is_(True)).order_by(Post.created_at.desc())
 
@@ -351,27 +442,21 @@ def list_posts_by_category():
         query = query.filter(Post.categories.any(Category.id == category_id))
 
     if search_query:
-        pat = f"%{search_query}%"
-        query = query.filter(or_(Post.title.ilike(pat), Post.content.ilike(pat)))
+        query = query.filter(post_search.matches(search_query))
 
-    pagination = paginate_query(query, page, per_page)
+    if cursor is not None:
+        return cursor_page_response(query, cursor, per_page, serialize, "posts")
 
-    result = []
-    for p in pagination.items:
-        # Get first image file path or None
-        first_image = p.images[0].file_path if p.images else None
-        result.append({
-            "id": p.id,
-            "title": p.title,
-            "content": p.content,
-            "created_at": p.created_at.isoformat() if p.created_at else None,
-            "image_url": file_url(p.image_url),            # ✅ NEW FIELD
-            "images": [file_url(img.file_path) for img in p.images],
-            "rating": avg_rating_for_post(p.id)
-        })
+    pagination = paginate_with_count(
+        query, max(1, page), per_page, "posts:by_category",
+        ("post", "post_categories"),
+        filters={"category_id": category_id, "q": search_query}
+    )
+    result = [serialize(p) for p in pagination.items]
 
     return jsonify({
         "total": pagination.total,
+        "total_exact": pagination.total_exact,
         "page": pagination.page,
         "per_page": pagination.per_page,
         "pages": pagination.pages,
@@ -381,8 +466,7 @@ def list_posts_by_category():
 @bp.route("/by_category/<int:category_id>", methods=["GET"])
 @jwt_required()
 def get_posts_by_category(category_id):
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    user = get_current_user()
     if not user:
         return jsonify({'message': 'User not found'}), 404
 
@@ -395,22 +479,17 @@ def get_posts_by_category(category_id):
         .order_by(Post.created_at.desc())
         .options(
             joinedload(Post.author),
-            subqueryload(Post.categories),
-            subqueryload(Post.ratings)
+            subqueryload(Post.categories)
         )
     )
 
     pagination = paginate_query(query, page, per_page)
-    watched_ids = {p.id for p in user.watched}
+    # Only the posts on this page need their watched state
+    watched_ids = User.watched_ids(user.id, (p.id for p in pagination.items))
 
     watched_data, unwatched_data = [], []
 
     for p in pagination.items:
-        avg_rating = (
-            round(sum([r.value for r in p.ratings]) / len(p.ratings), 2)
-            if p.ratings else None
-        )
-
         data = {
             "id": p.id,
             "title": p.title,
@@ -423,7 +502,7 @@ def get_posts_by_category(category_id):
             "categories": [
                 {"id": c.id, "name": c.name} for c in p.categories
             ],
-            "average_rating": avg_rating,
+            "average_rating": p.average_rating,
             "created_at": p.created_at.isoformat(),  # optional helpful field
             "isWatched": p.id in watched_ids          # optional for frontend
         }
@@ -449,89 +528,87 @@ def get_posts_by_category(category_id):
 @jwt_required()
 def rate_post(post_id):
     user_id = get_jwt_identity()
-    post = Post.query.get(post_id)
-    if not post:
-        return jsonify({"msg": "Post not found"}), 404
 
     data = request.get_json() or {}
-    value = data.get("value")
-    try:
-        value_int = int(value)
-    except Exception:
+    value_int = parse_rating_value(data.get("value"))
+    if value_int is None:
         return jsonify({"msg": "Rating must be an integer between 1 and 5"}), 400
 
-    if not (1 <= value_int <= 5):
-        return jsonify({"msg": "Rating must be between 1 and 5"}), 400
+    # One statement: upsert the rating and fold it into the post summary
+    row = PostRating.upsert_many(user_id, {post_id: value_int}).get(post_id)
+    if row is None:
+        db.session.rollback()
+        return jsonify({"msg": "Post not found"}), 404
+    invalidate_on_commit("feed", f"post:{post_id}")
+    db.session.commit()
+
+    result = rating_result("post_id", post_id, row)
+    msg = "Rating updated" if row["old_value"] is not None else "Rating added"
+    return jsonify({"msg": msg, "user_rating": value_int,
+                    "rating": result["rating"], "rating_count": result["rating_count"]}), 200
 
-    existing = PostRating.query.filter_by(post_id=post_id, user_id=user_id).first()
-    if existing:
-        existing.value = value_int
-        msg = "Rating updated"
-    else:
-        db.session.add(PostRating(post_id=post_id, user_id=user_id, value=value_int))
-        msg = "Rating added"
 
+@bp.route("/rate", methods=["POST"])
+@jwt_required()
+def rate_posts_bulk():
+    """Rate several posts at once: {"ratings": [{"post_id": 1, "value": 4}, ...]}."""
+    user_id = get_jwt_identity()
+
+    ratings, error = parse_bulk_ratings(request.get_json() or {}, "post_id")
+    if error:
+        return jsonify({"msg": error}), 400
+
+    rows = PostRating.upsert_many(user_id, ratings)
+    invalidate_on_commit("feed", *[f"post:{pid}" for pid in rows])
     db.session.commit()
 
-    avg = avg_rating_for_post(post_id)
-    return jsonify({"msg": msg, "user_rating": value_int, "rating": avg}), 200
+    return jsonify({
+        "msg": "Ratings saved",
+        "results": [rating_result("post_id", pid, row) for pid, row in rows.items()],
+        "not_found": [pid for pid in ratings if pid not in rows]
+    }), 200
 
 
 @bp.route("/<int:post_id>", methods=["GET"])
+@conditional_get(post_detail_version, per_viewer=True)
+@cache_anonymous(lambda post_id: [f"post:{post_id}"])
 def get_post_detail(post_id):
     # Allow optional JWT
     verify_jwt_in_request(optional=True)
-    user_id = get_jwt_identity()
+    viewer = get_current_user()
 
     page = request.args.get("page", 1, type=int)
     per_page = request.args.get("per_page", 5, type=int)
     per_page = max(1, min(per_page, MAX_PER_PAGE))
 
-    post = Post.query.options(subqueryload(Post.images),
-                                 subqueryload(Post.categories),
-                                 subqueryload(Post.ratings)).get(post_id)
+    post = Post.query.options(joinedload(Post.author),
+                              subqueryload(Post.images),
+                              subqueryload(Post.categories)).get(post_id)
     if not post:
         return jsonify({"msg": "Post not found"}), 404
+    add_tags(*[f"category:{c.id}" for c in post.categories])
 
     images = [file_url(img.file_path) for img in post.images]
-    avg_post_rating = avg_rating_for_post(post.id)
+    avg_post_rating = post.average_rating
 
     user_post_rating = None
-    if user_id:
-        r = PostRating.query.filter_by(post_id=post.id, user_id=user_id).first()
-        user_post_rating = r.value if r else None
+    if viewer:
+        user_post_rating = db.session.query(PostRating.value).filter_by(
+            post_id=post.id, user_id=viewer.id
+        ).scalar()
 
+    # The whole comment page (authors, averages, viewer ratings) is one query
     comment_pagination = paginate_query(
-        Comment.query.filter_by(post_id=post.id).order_by(Comment.created_at.desc()),
+        comment_page_query(post.id, viewer.id if viewer else None),
         page, per_page
     )
 
     comments_data = []
-    for c in comment_pagination.items:
-        avg_comment_rating = avg_rating_for_comment(c.id)
-        user_comment_rating = None
-        can_delete = False
-        can_edit = False
-        if user_id:
-            user = User.query.get(user_id)
-            cr = CommentRating.query.filter_by(comment_id=c.id, user_id=user_id).first()
-            user_comment_rating = cr.value if cr else None
-            is_owner = (c.user_id == user_id)
-            is_admin = (user.role in ["admin", "superadmin"])
-            can_delete = is_owner or is_admin
-            can_edit = is_owner or is_admin
-
-        comments_data.append({
-            "id": c.id,
-            "content": c.content,
-            "author": c.commenter.username if c.commenter else "Deleted User",
-            "author_id": c.user_id,
-            "created_at": c.created_at.isoformat() if c.created_at else None,
-            "rating": avg_comment_rating,
-            "user_rating": user_comment_rating,
-            "can_delete": can_delete,
-            "can_edit": can_edit
-        })
+    for row in comment_pagination.items:
+        data = serialize_comment_row(row, viewer)
+        if viewer is None:
+            data.update({"user_rating": None, "can_delete": False, "can_edit": False})
+        comments_data.append(data)
 
     return jsonify({
         "id": post.id,
@@ -542,9 +619,10 @@ def get_post_detail(post_id):
         "categories": [{"id": c.id, "name": c.name} for c in post.categories],
         "created_at": post.created_at.isoformat() if post.created_at else None,
         "images": images,
+        "image_variants": [image_variant_urls(img) for img in post.images],
         "rating": avg_post_rating,
         "user_rating": user_post_rating,
-        "can_delete": bool(user_id and User.query.get(user_id).role == "superadmin"),
+        "can_delete": bool(viewer and viewer.role == "superadmin"),
         "comments": {
             "total": comment_pagination.total,
             "page": comment_pagination.page,
@@ -569,8 +647,7 @@ def get_posts_by_author():
     sort_by = request.args.get("sort_by", "created_at")
     order = request.args.get("order", "desc")
 
-    user_id = get_jwt_identity()
-    author = User.query.get(user_id)
+    author = get_current_user()
     if not author:
         return jsonify({"msg": "Author not found"}), 404
 
@@ -628,9 +705,8 @@ def get_posts_by_author():
 @bp.route("edit_post/<int:post_id>", methods=["PUT"])
 @jwt_required()
 def edit_post(post_id):
-    user_id = get_jwt_identity()
     post = Post.query.get(post_id)
-    user = User.query.get(user_id)
+    user = get_current_user()
 
     if not post:
         return jsonify({"msg": "Post not found"}), 404
@@ -638,7 +714,7 @@ def edit_post(post_id):
         return jsonify({"msg": "User not found"}), 404
 
     # 1. Permissions Check
-    is_owner = int(post.author_id) == int(user_id)
+    is_owner = post.author_id == user.id
     is_admin = user.role in ["admin", "superadmin"]
 
     if not (is_owner or is_admin):
@@ -686,13 +762,15 @@ def edit_post(post_id):
 
         # Save new image
         try:
-            filename = save_file(new_file)
-            new_image_obj = Image(file_path=filename, post=post)
+            filename, variants = save_file(new_file)
+            new_image_obj = Image(file_path=filename, variants=variants, post=post)
             db.session.add(new_image_obj)
         except Exception as e:
             return jsonify({"msg": f"Failed to save image: {str(e)}"}), 500
 
     try:
+        db.session.flush()
+        Post.refresh_search_vectors([post.id])
         db.session.commit()
     except Exception as e:
         db.session.rollback()
@@ -704,7 +782,8 @@ def edit_post(post_id):
         img = post.images[0]
         main_image = {
             "id": img.id,
-            "file_url": file_url(img.file_path)
+            "file_url": file_url(img.file_path),
+            "variants": image_variant_urls(img)
         }
 
     return jsonify({
@@ -802,12 +881,11 @@ def search_by_author():
 
     posts = []
     for post in pagination.items:
-        avg = avg_rating_for_post(post.id)
         posts.append({
             "id": post.id,
             "title": post.title,
             "content": post.content,
-            "average_rating": avg,
+            "average_rating": post.average_rating,
             "timestamp": post.created_at.strftime("%Y-%m-%d %H:%M:%S") if post.created_at else None,
             "author": {"id": author.id, "username": author.username},
             "categories": [{"id": cat.id, "name": cat.name} for cat in post.categories],
@@ -898,9 +976,13 @@ def admin_list_posts():
     if category_id:
         query = query.filter(Post.categories.any(id=category_id))
 
-    # 3. Paginate
-    pagination = query.order_by(Post.created_at.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
+    # 3. Paginate (an unfiltered listing may use the planner's row estimate)
+    filters = {"search": search, "author": author_search,
+               "category_id": category_id, "status": status}
+    pagination = paginate_with_count(
+        query.order_by(Post.created_at.desc()), page, per_page, "posts:admin",
+        ("post", "users", "post_categories"), filters=filters,
+        estimate_table=None if any(filters.values()) else "post"
     )
 
     return jsonify({
@@ -908,18 +990,20 @@ def admin_list_posts():
             "id": p.id,
             "title": p.title,
             "is_published": p.is_published,
-            "average_rating": avg_rating_for_post(p.id),
+            "average_rating": p.average_rating,
             "created_at": p.created_at.isoformat(),
             "author": {"username": p.author.username},
             "categories": [{"id": c.id, "name": c.name} for c in p.categories]
         } for p in pagination.items],
         "total": pagination.total,
+        "total_exact": pagination.total_exact,
         "pages": pagination.pages,
         "current_page": pagination.page
     }), 200
 
 
 @bp.route('/get_post/<int:post_id>', methods=['GET'])
+@conditional_get(post_version)
 def get_post(post_id):
     # joinedload categories AND images
     post = Post.query.options(
@@ -947,8 +1031,7 @@ def get_post(post_id):
 @bp.route('/user_dashboard', methods=['GET'])
 @jwt_required()
 def user_dashboard_list():
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    user = get_current_user()
     
     if not user:
         return jsonify({"msg": "User not found"}), 404
@@ -972,7 +1055,7 @@ def user_dashboard_list():
 
     # 3. Apply Filters
     if search:
-        query = query.filter(Post.title.ilike(f"%{search}%"))
+        query = query.filter(post_search.matches(search))
     
     if author_name:
         query = query.filter(User.username.ilike(f"%{author_name}%"))
@@ -980,31 +1063,36 @@ def user_dashboard_list():
     if category_text:
         query = query.filter(Post.categories.any(Category.name.ilike(f"%{category_text}%")))
 
-    # 4. Handle Watch Status Filtering
-    # We get the IDs of posts the user has watched to filter the main query
-    watched_ids = [p.id for p in user.watched]
-
+    # 4. Handle Watch Status Filtering (EXISTS on watched_posts, no id list)
     if watch_status == 'watched':
-        query = query.filter(Post.id.in_(watched_ids)) if watched_ids else query.filter(False)
+        query = query.filter(User.watched_clause(user.id))
     elif watch_status == 'unwatched':
-        if watched_ids:
-            query = query.filter(~Post.id.in_(watched_ids))
+        query = query.filter(~User.watched_clause(user.id))
 
     # 5. Sorting Logic
     if sort_by == 'rating':
-        # Outer join with PostRating to calculate average without excluding unrated posts
-        query = query.outerjoin(PostRating).group_by(Post.id)
-        avg_col = func.avg(PostRating.value)
+        # Outer join the rating summary so unrated posts are kept (as 0)
+        query = query.outerjoin(PostRatingSummary, PostRatingSummary.post_id == Post.id)
+        avg_col = func.coalesce(PostRatingSummary.average, 0)
         query = query.order_by(avg_col.desc() if order == 'desc' else avg_col.asc())
     elif sort_by == 'created_at':
         query = query.order_by(Post.created_at.desc() if order == 'desc' else Post.created_at.asc())
     elif sort_by == 'title':
         query = query.order_by(Post.title.desc() if order == 'desc' else Post.title.asc())
 
-    # 6. Pagination
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    # 6. Pagination (totals cached per filter set; watch filters are per user)
+    pagination = paginate_with_count(
+        query, page, per_page, "posts:dashboard",
+        ("post", "users", "category", "post_categories", "watched_posts"),
+        filters={
+            "search": search, "author": author_name, "category": category_text,
+            "watch_status": watch_status,
+            "user": user.id if watch_status in ("watched", "unwatched") else None,
+        }
+    )
 
     # 7. Serialize Response
+    watched_ids = User.watched_ids(user.id, (p.id for p in pagination.items))
     results = []
     for p in pagination.items:
         # Check if this specific post ID is in the user's watched list
@@ -1018,7 +1106,7 @@ def user_dashboard_list():
                 "username": p.author.username
             },
             "created_at": p.created_at.isoformat(),
-            "average_rating": avg_rating_for_post(p.id), # Uses your existing helper
+            "average_rating": p.average_rating,
             "categories": [{"id": c.id, "name": c.name} for c in p.categories],
             "isWatched": is_watched
         })
@@ -1026,6 +1114,7 @@ def user_dashboard_list():
     return jsonify({
         "results": results,
         "total": pagination.total,
+        "total_exact": pagination.total_exact,
         "pages": pagination.pages,
         "current_page": pagination.page,
         "per_page": pagination.per_page
@@ -1039,7 +1128,7 @@ def user_dashboard_list():
 @jwt_required()
 @role_required("admin", "superadmin")
 def search_messages():
-    user = User.query.get(get_jwt_identity())
+    user = get_current_user()
     if user.is_blocked:
         return jsonify({"msg": "Account blocked"}), 403
 
@@ -1051,10 +1140,11 @@ def search_messages():
     per_page = min(50, request.args.get("per_page", default=10, type=int))
 
     pagination = ContactMessage.query.filter(
-        or_(
-            ContactMessage.email.ilike(f"%{query}%"),
-            ContactMessage.subject.ilike(f"%{query}%"),
-            ContactMessage.message.ilike(f"%{query}%")
+        post_search.contains(
+            query,
+            ContactMessage.email,
+            ContactMessage.subject,
+            ContactMessage.message
         )
     ).order_by(ContactMessage.created_at.desc()) \
         .paginate(page=page, per_page=per_page, error_out=False)
@@ -1065,6 +1155,17 @@ def search_messages():
 # -----------------------------------------------------------
 # Apply Filters to Posts on the commentors dashboard
 # -----------------------------------------------------------
+def empty_filter_response(page, per_page, include_facets=False):
+    response = {
+        "posts": [],
+        "count": 0,
+        "pagination": {"page": page, "per_page": per_page, "pages": 0, "total_items": 0}
+    }
+    if include_facets:
+        response["facets"] = empty_facets()
+    return response
+
+
 @bp.route("/filter", methods=["GET"])
 @jwt_required(optional=True)
 def filter_posts():
@@ -1076,6 +1177,7 @@ def filter_posts():
     category_name = request.args.get("category_name", type=str)
     category_id = request.args.get("category_id", type=int)
     watched_param = request.args.get("watched", type=str)  # "true" / "false" or None
+    include_facets = wants_facets(request.args)
 
     # Sorting: support either `sort` OR `sort_by` + `sort_dir` (the latter takes precedence)
     sort = request.args.get("sort", type=str)
@@ -1086,8 +1188,7 @@ def filter_posts():
     page = max(1, request.args.get("page", default=1, type=int))
     per_page = min(50, request.args.get("per_page", default=10, type=int))  # HARD LIMIT = 50
 
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id) if user_id else None
+    user = get_current_user()
 
     # ----------------------------
     # Base filtered query (no ordering yet)
@@ -1096,7 +1197,6 @@ def filter_posts():
     base_q = Post.query.options(
         joinedload(Post.author),
         subqueryload(Post.categories),
-        subqueryload(Post.ratings),
     )
 
     # --- author filters
@@ -1110,11 +1210,7 @@ def filter_posts():
     if category_name:
         category = Category.query.filter(func.lower(Category.name) == category_name.lower()).first()
         if not category:
-            return jsonify({
-                "posts": [],
-                "count": 0,
-                "pagination": {"page": page, "per_page": per_page, "pages": 0, "total_items": 0}
-            }), 200
+            return jsonify(empty_filter_response(page, per_page, include_facets)), 200
         base_q = base_q.filter(Post.categories.any(Category.id == category.id))
 
     if category_id:
@@ -1125,30 +1221,25 @@ def filter_posts():
         if not user:
             return jsonify({"message": "Login required for watched filter"}), 401
 
-        watched_ids = {p.id for p in user.watched} if user.watched else set()
-
         if watched_param.lower() == "true":
-            if not watched_ids:
-                return jsonify({
-                    "posts": [],
-                    "count": 0,
-                    "pagination": {"page": page, "per_page": per_page, "pages": 0, "total_items": 0}
-                }), 200
-            base_q = base_q.filter(Post.id.in_(watched_ids))
+            base_q = base_q.filter(User.watched_clause(user.id))
 
         elif watched_param.lower() == "false":
-            if watched_ids:
-                base_q = base_q.filter(~Post.id.in_(watched_ids))
-            # else: all posts are unwatched for this user → no extra filter
+            base_q = base_q.filter(~User.watched_clause(user.id))
 
     # ----------------------------
-    # Compute totals BEFORE ordering/pagination
+    # Compute totals BEFORE ordering/pagination (cached per filter set)
     # ----------------------------
-    try:
-        total = base_q.order_by(None).count()
-    except Exception:
-        # fallback if DB refuses count on joined query
-        total = len(base_q.all())
+    total, total_exact = count_total(
+        base_q, "posts:filter",
+        ("post", "users", "category", "post_categories", "watched_posts"),
+        filters={
+            "author_name": author_name, "author_id": author_id,
+            "category_name": category_name, "category_id": category_id,
+            "watched": watched_param,
+            "user": user.id if (user and watched_param is not None) else None,
+        }
+    )
 
     pages = ceil(total / per_page) if per_page else 1
 
@@ -1194,22 +1285,13 @@ def filter_posts():
         ordered_q = base_q.order_by(Post.title.desc() if final_sort_dir == "desc" else Post.title.asc())
 
     elif final_sort_by in ("rating", "avg_rating"):
-        # aggregate average rating per post in subquery
-        rating_subq = (
-            db.session.query(
-                Rating.post_id.label("post_id"),
-                func.avg(Rating.value).label("avg_rating")
-            )
-            .group_by(Rating.post_id)
-            .subquery()
-        )
-        # left outer join so posts without ratings are included; use coalesce to treat NULL as 0
+        # left outer join the rating summary so posts without ratings are included; coalesce NULL to 0
+        rated_q = base_q.outerjoin(PostRatingSummary, Post.id == PostRatingSummary.post_id)
+        avg_col = func.coalesce(PostRatingSummary.average, 0)
         if final_sort_dir == "desc":
-            ordered_q = base_q.outerjoin(rating_subq, Post.id == rating_subq.c.post_id) \
-                .order_by(func.coalesce(rating_subq.c.avg_rating, 0).desc(), Post.created_at.desc())
+            ordered_q = rated_q.order_by(avg_col.desc(), Post.created_at.desc())
         else:
-            ordered_q = base_q.outerjoin(rating_subq, Post.id == rating_subq.c.post_id) \
-                .order_by(func.coalesce(rating_subq.c.avg_rating, 0).asc(), Post.created_at.desc())
+            ordered_q = rated_q.order_by(avg_col.asc(), Post.created_at.desc())
 
     else:
         # fallback
@@ -1220,23 +1302,30 @@ def filter_posts():
     # ----------------------------
     offset = (page - 1) * per_page
     posts = ordered_q.offset(offset).limit(per_page).all()
+    watched_ids = User.watched_ids(user.id, (p.id for p in posts)) if user else set()
     # print(serialize_post(posts[0], user) if posts else "No posts found")
 
     # ----------------------------
     # Response: include pagination object
     # ----------------------------
-    return jsonify({
-        "posts": [serialize_post(p, user) for p in posts],
+    response = {
+        "posts": [serialize_post(p, user, watched_ids) for p in posts],
         "count": total,
         "pagination": {
             "page": page,
             "per_page": per_page,
             "pages": pages,
             "total_items": total,
+            "total_exact": total_exact,
             "has_next": page < pages,
             "has_prev": page > 1,
         }
-    }), 200
+    }
+    # Category/author counts over the same filtered set (one grouped query)
+    if include_facets:
+        response["facets"] = facet_counts(base_q)
+
+    return jsonify(response), 200
 
 
 
@@ -1255,7 +1344,7 @@ def is_check_title_rejected():
         return jsonify({"msg": "Title is required", "exists": False}), 400
 
     # Search for the title
-    exists = RejectedRequest.query.filter(RejectedRequest.title.ilike(title)).first()
+    exists = RejectedRequest.query.filter(post_search.iequals(RejectedRequest.title, title)).first()
 
     if exists:
         return jsonify({
@@ -1283,7 +1372,7 @@ def add_rejected_request():
         return jsonify({"msg": "Title is required"}), 400
 
     # 1. Check if this title is already in the rejection list
-    already_rejected = RejectedRequest.query.filter(RejectedRequest.title.ilike(title)).first()
+    already_rejected = RejectedRequest.query.filter(post_search.iequals(RejectedRequest.title, title)).first()
     
     if already_rejected:
         return jsonify({
@@ -1,15 +1,22 @@
 # app/routes/user.py
 
-from flask import Blueprint, jsonify, request
-from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
-from sqlalchemy import func, or_
+from flask import Blueprint, current_app, jsonify, request
+from flask_jwt_extended import jwt_required, get_jwt
+from sqlalchemy import func
 
+import os
 from datetime import datetime, timedelta
 
 from app.extensions import db
 from app.models.user import User  
 from app.models.post import Post  
+from app.models.comment import Comment
+from app.models.rating import PostRating, PostRatingSummary
 from app.utils.decorators import role_required
+from app.utils.identity import get_current_user
+from app.utils.search import contains
+from app.utils.response_cache import invalidate_on_commit
+from app.utils import session_cache
 
 bp = Blueprint("user", __name__, url_prefix="/api/users")
 
@@ -29,10 +36,6 @@ def serialize_user(user):
     }
 
 
-def get_current_user():
-    return User.query.get(get_jwt_identity())
-
-
 def get_user_or_404(user_id):
     user = User.query.get(user_id)
     if not user:
@@ -111,6 +114,7 @@ def block_user(user_id):
         return jsonify({"msg": "Permission denied"}), 403
 
     user.is_blocked = True
+    session_cache.invalidate_on_commit(user.id)
     db.session.commit()
     return jsonify({"msg": f"{user.username} blocked successfully"}), 200
 
@@ -139,6 +143,7 @@ def unblock_user(user_id):
         return jsonify({"msg": "Permission denied"}), 403
 
     user.is_blocked = False
+    session_cache.invalidate_on_commit(user.id)
     db.session.commit()
     return jsonify({"msg": f"{user.username} unblocked successfully"}), 200
 
@@ -161,11 +166,7 @@ def list_commentators():
 
     # 3. Apply search if provided 🔎
     if search_query:
-        search_pattern = f"%{search_query}%"
-        q = q.filter(
-            (User.username.ilike(search_pattern)) | 
-            (User.email.ilike(search_pattern))
-        )
+        q = q.filter(contains(search_query, User.username, User.email))
 
     # 4. Sort and Paginate 📊
     q = q.order_by(User.created_at.desc())
@@ -192,11 +193,7 @@ def list_authors():
 
     # 2. Add Search functionality (Email or Username)
     if search_query:
-        search_filter = f"%{search_query}%"
-        query = query.filter(
-            (User.username.ilike(search_filter)) | 
-            (User.email.ilike(search_filter))
-        )
+        query = query.filter(contains(search_query, User.username, User.email))
 
     # 3. Order and Paginate
     pagination = query.order_by(User.created_at.desc()).paginate(
@@ -261,13 +258,7 @@ def list_all_users():
 
     # SEARCH LOGIC: This must use OR to check both columns
     if search_query:
-        search_pattern = f"%{search_query}%"
-        q = q.filter(
-            or_(
-                User.username.ilike(search_pattern),
-                User.email.ilike(search_pattern)
-            )
-        )
+        q = q.filter(contains(search_query, User.username, User.email))
 
     q = q.order_by(User.created_at.desc())
     pagination = q.paginate(page=page, per_page=per_page, error_out=False)
@@ -293,11 +284,7 @@ def list_superadmins():
 
     # 3. Apply Search Filter (Username or Email)
     if search_query:
-        search_pattern = f"%{search_query}%"
-        query = query.filter(
-            (User.username.ilike(search_pattern)) | 
-            (User.email.ilike(search_pattern))
-        )
+        query = query.filter(contains(search_query, User.username, User.email))
 
     # 4. Paginate and Sort (Newest first)
     pagination = query.order_by(User.created_at.desc()).paginate(
@@ -400,11 +387,7 @@ def list_blocked():
 
     # 3. Apply Search Filter (Username or Email)
     if search_query:
-        search_pattern = f"%{search_query}%"
-        query = query.filter(
-            (User.username.ilike(search_pattern)) | 
-            (User.email.ilike(search_pattern))
-        )
+        query = query.filter(contains(search_query, User.username, User.email))
 
     # 4. Paginate and Sort
     pagination = query.order_by(User.created_at.desc()).paginate(
@@ -466,6 +449,7 @@ def update_role(user_id):
         return jsonify({"msg": "Invalid role"}), 400
         
     user.role = new_role
+    session_cache.invalidate_on_commit(user.id)
     db.session.commit()
     return jsonify({"msg": f"User is now {new_role}"}), 200
 
@@ -476,8 +460,25 @@ def delete_user(user_id):
     user = get_user_or_404(user_id)
     if not user: return jsonify({"msg": "Not found"}), 404
     
+    # The user's ratings disappear via ON DELETE CASCADE, so the summaries of
+    # the posts they rated have to be recomputed in the same transaction.
+    rated_post_ids = [
+        pid for (pid,) in db.session.query(PostRating.post_id).filter_by(user_id=user.id)
+    ]
+    # Their posts, comments and ratings also go through ON DELETE CASCADE,
+    # outside the ORM flush, so the cached pages showing them are dropped here
+    touched_post_ids = set(rated_post_ids)
+    touched_post_ids.update(pid for (pid,) in db.session.query(Post.id).filter_by(author_id=user.id))
+    touched_post_ids.update(
+        pid for (pid,) in db.session.query(Comment.post_id).filter_by(user_id=user.id).distinct()
+    )
+
     # Optional: Logic to handle user's posts (delete them or set author to Null)
     db.session.delete(user)
+    db.session.flush()
+    PostRatingSummary.rebuild(rated_post_ids)
+    invalidate_on_commit("feed", *[f"post:{pid}" for pid in touched_post_ids])
+    session_cache.invalidate_on_commit(user_id)
     db.session.commit()
     return jsonify({"msg": "User permanently deleted"}), 200
 
@@ -541,4 +542,18 @@ def get_dashboard_summary():
         }), 200
 
     except Exception as e:
-        return jsonify({"msg": "Error generating dashboard data", "error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"msg": "Error generating dashboard data", "error": str(e)}), 500
+
+
+@bp.route("/outbound-health", methods=["GET"])
+@role_required("admin", "superadmin")
+def outbound_health():
+    """
+    Circuit state, latency and error counts of the outbound dependencies
+    (SMTP, Google). Breakers and metrics are per process, so this is the
+    view of the worker that served the request.
+    """
+    return jsonify({
+        "pid": os.getpid(),
+        "dependencies": current_app.extensions["outbound"].stats(),
+    }), 200
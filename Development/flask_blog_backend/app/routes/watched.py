@@ -1,27 +1,36 @@
 # app/routes/watched.py
 
 from flask import Blueprint, jsonify, request
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from sqlalchemy.orm import subqueryload, joinedload
 
 from app.extensions import db
 from app.models.user import User
 from app.models.post import Post
 from app.models.category import Category
+from app.utils.identity import get_session_state
 
 bp = Blueprint("watched", __name__, url_prefix="/api/watched")
 
+MAX_BULK_IDS = 500
+
 
 # ============================================================
 # HELPERS
 # ============================================================
 
-def compute_average(ratings):
-    """Compute average rating from rating objects."""
-    if not ratings:
+def parse_post_ids(data):
+    """The `post_ids` list of a bulk request, or None if it isn't one."""
+    post_ids = (data or {}).get("post_ids") if isinstance(data, dict) else None
+    if not isinstance(post_ids, list) or len(post_ids) > MAX_BULK_IDS:
+        return None
+    if not all(isinstance(i, int) and not isinstance(i, bool) for i in post_ids):
         return None
-    values = [r.value for r in ratings]
-    return round(sum(values) / len(values), 2)
+    return post_ids
+
+
+def post_exists(post_id):
+    return db.session.query(Post.query.filter_by(id=post_id).exists()).scalar()
 
 
 def serialize_post(post):
@@ -33,16 +42,12 @@ def serialize_post(post):
             "username": post.author.username
         } if post.author else None,
         "categories": [{"id": c.id, "name": c.name} for c in post.categories],
-        "average_rating": compute_average(post.ratings),
+        "average_rating": post.average_rating,
         "created_at": post.created_at.isoformat() if post.created_at else None,
         "is_published": post.is_published,
     }
 
 
-def get_current_user():
-    return User.query.get(get_jwt_identity())
-
-
 # ============================================================
 # WATCH / UNWATCH POST
 # ============================================================
@@ -50,37 +55,59 @@ def get_current_user():
 @bp.route("/posts/<int:post_id>/watch", methods=["POST"])
 @jwt_required()
 def mark_post_as_watched(post_id):
-    user = get_current_user()
-    post = Post.query.get(post_id)
+    user_id = get_session_state().user_id
 
-    if not post:
-        return jsonify({"message": "Post not found"}), 404
+    if User.watch_posts(user_id, [post_id]):
+        db.session.commit()
+        return jsonify({"message": "Post marked as watched"}), 200
 
-    if post in user.watched:
-        return jsonify({"message": "Post already marked as watched"}), 200
-
-    user.watched.append(post)
-    db.session.commit()
-
-    return jsonify({"message": "Post marked as watched"}), 200
+    if not post_exists(post_id):
+        return jsonify({"message": "Post not found"}), 404
+    return jsonify({"message": "Post already marked as watched"}), 200
 
 
 @bp.route("/posts/<int:post_id>/unwatch", methods=["DELETE"])
 @jwt_required()
 def unmark_post_as_watched(post_id):
-    user = get_current_user()
-    post = Post.query.get(post_id)
+    user_id = get_session_state().user_id
+
+    if User.unwatch_posts(user_id, [post_id]):
+        db.session.commit()
+        return jsonify({"message": "Post unmarked as watched"}), 200
 
-    if not post:
+    if not post_exists(post_id):
         return jsonify({"message": "Post not found"}), 404
+    return jsonify({"message": "Post was not marked as watched"}), 200
 
-    if post not in user.watched:
-        return jsonify({"message": "Post was not marked as watched"}), 200
 
-    user.watched.remove(post)
+# ============================================================
+# BULK WATCH / UNWATCH
+# ============================================================
+
+@bp.route("/posts", methods=["POST"])
+@jwt_required()
+def mark_posts_as_watched():
+    post_ids = parse_post_ids(request.get_json(silent=True))
+    if post_ids is None:
+        return jsonify({"message": f"post_ids must be a list of at most {MAX_BULK_IDS} post ids"}), 400
+
+    added = User.watch_posts(get_session_state().user_id, post_ids)
     db.session.commit()
+    return jsonify({"message": f"{len(added)} posts marked as watched",
+                    "added": sorted(added)}), 200
+
+
+@bp.route("/posts", methods=["DELETE"])
+@jwt_required()
+def unmark_posts_as_watched():
+    post_ids = parse_post_ids(request.get_json(silent=True))
+    if post_ids is None:
+        return jsonify({"message": f"post_ids must be a list of at most {MAX_BULK_IDS} post ids"}), 400
 
-    return jsonify({"message": "Post unmarked as watched"}), 200
+    removed = User.unwatch_posts(get_session_state().user_id, post_ids)
+    db.session.commit()
+    return jsonify({"message": f"{len(removed)} posts unmarked as watched",
+                    "removed": sorted(removed)}), 200
 
 
 # ============================================================
@@ -90,16 +117,12 @@ def unmark_post_as_watched(post_id):
 @bp.route("/dashboard/watched", methods=["GET"])
 @jwt_required()
 def get_watched_posts():
-    user = get_current_user()
-    if not user:
-        return jsonify({"message": "User not found"}), 404
-
+    user_id = get_session_state().user_id
     category_id = request.args.get("category_id", type=int)
 
-    watched_query = user.watched.options(
+    watched_query = Post.query.filter(User.watched_clause(user_id)).options(
         joinedload(Post.author),
         subqueryload(Post.categories),
-        subqueryload(Post.ratings),
     )
 
     if category_id:
@@ -121,22 +144,14 @@ def get_watched_posts():
 @bp.route("/dashboard/unwatched", methods=["GET"])
 @jwt_required()
 def get_unwatched_posts():
-    user = get_current_user()
-    if not user:
-        return jsonify({"message": "User not found"}), 404
-
+    user_id = get_session_state().user_id
     category_id = request.args.get("category_id", type=int)
-    watched_ids = {p.id for p in user.watched}
 
-    query = Post.query.options(
+    query = Post.query.filter(~User.watched_clause(user_id)).options(
         joinedload(Post.author),
         subqueryload(Post.categories),
-        subqueryload(Post.ratings),
     )
 
-    if watched_ids:
-        query = query.filter(~Post.id.in_(watched_ids))
-
     if category_id:
         query = query.filter(Post.categories.any(Category.id == category_id))
 
@@ -154,16 +169,11 @@ def get_unwatched_posts():
 @bp.route("/dashboard/all", methods=["GET"])
 @jwt_required()
 def get_all_posts_with_watch_status():
-    user = get_current_user()
-    if not user:
-        return jsonify({"message": "User not found"}), 404
-
-    watched_ids = {p.id for p in user.watched}
+    watched_ids = User.watched_ids(get_session_state().user_id)
 
     posts = Post.query.options(
         joinedload(Post.author),
         subqueryload(Post.categories),
-        subqueryload(Post.ratings),
     ).all()
 
     watched, unwatched = [], []
@@ -0,0 +1,94 @@
+# app/utils/conditional.py
+"""
+Conditional GET (ETag / Last-Modified) for read endpoints.
+
+A view opts in with `@conditional_get(validator)`. The validator runs one
+small query over the updated_at columns (and counts) the response is built
+from and returns `(parts, last_modified)`, or None when the resource does
+not exist. The strong ETag is a hash of the request path, the normalized
+query args, the viewer (for per-viewer responses) and `parts`, so it is
+known before the view runs:
+
+- If-None-Match matching the ETag -> 304 without running the view;
+- otherwise the view runs and its 200 response gets ETag, Last-Modified
+  and `Cache-Control: no-cache` (clients must revalidate, which is cheap).
+
+If-Modified-Since alone is not answered with 304: deleting a comment or
+unlinking a post changes the counts in `parts` but moves no timestamp
+forward, so Last-Modified is informational only.
+
+Place it between @bp.route and @cache_anonymous so 304s skip the cache too;
+the ETag is handed down (g.conditional_etag) and the cache only serves an
+entry stored under the same one.
+"""
+import hashlib
+from datetime import timezone
+from functools import wraps
+
+from flask import current_app, g, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+
+
+def latest(*timestamps):
+    """Most recent of the given timestamps (naive values are taken as UTC)."""
+    values = [
+        ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+        for ts in timestamps if ts is not None
+    ]
+    return max(values) if values else None
+
+
+def make_etag(path, args, viewer, parts):
+    items = sorted(args.items(multi=True))
+    raw = repr((path, items, viewer, tuple(
+        p.isoformat() if hasattr(p, "isoformat") else p for p in parts
+    )))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _not_modified(etag, last_modified, per_viewer):
+    response = current_app.response_class(status=304)
+    _set_validators(response, etag, last_modified, per_viewer)
+    return response
+
+
+def _set_validators(response, etag, last_modified, per_viewer):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers["Cache-Control"] = "private, no-cache" if per_viewer else "no-cache"
+    if per_viewer:
+        response.vary.add("Authorization")
+
+
+def conditional_get(validator, per_viewer=False):
+    """
+    validator:  callable taking the view kwargs, returning (parts, last_modified)
+                or None when the resource is missing (the view then answers).
+    per_viewer: the body depends on the JWT identity, which is folded into
+                the ETag.
+    """
+    def wrapper(fn):
+        @wraps(fn)
+        def decorator(*args, **kwargs):
+            version = validator(**kwargs)
+            if version is None:
+                return fn(*args, **kwargs)
+            parts, last_modified = version
+
+            viewer = None
+            if per_viewer:
+                verify_jwt_in_request(optional=True)
+                viewer = get_jwt_identity()
+
+            etag = make_etag(request.path, request.args, viewer, parts)
+            if request.if_none_match.contains(etag):
+                return _not_modified(etag, last_modified, per_viewer)
+
+            g.conditional_etag = etag
+            response = current_app.make_response(fn(*args, **kwargs))
+            if response.status_code == 200:
+                _set_validators(response, etag, last_modified, per_viewer)
+            return response
+        return decorator
+    return wrapper
@@ -0,0 +1,189 @@
+# app/utils/counts.py
+"""
+Count strategies for paginated listings.
+
+An exact COUNT(*) over a filtered query (ILIKE, NOT IN watched ids, ...)
+often costs more than fetching the page itself. Listings therefore ask for
+their total through `paginate_with_count()`, which:
+
+- serves totals from a small per-process cache keyed on the listing scope
+  plus its normalized filters, with a short TTL;
+- drops cached totals as soon as this process commits a write to any table
+  the total depends on (tracked from the ORM flush, or declared with
+  `invalidate_on_commit()` for Core statements);
+- can answer unfiltered whole-table totals from the planner's estimate
+  (pg_class.reltuples) when COUNT_USE_ESTIMATES is enabled.
+
+Every result carries `exact`: True only when the total was counted for this
+request. Cached totals (which another worker may have made stale) and planner
+estimates are reported as not exact.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from sqlalchemy import event, func, inspect, select, text
+from sqlalchemy.orm import Session, attributes
+
+from app.extensions import db
+
+DEFAULT_TTL = 30
+DEFAULT_ESTIMATE_MIN_ROWS = 10000
+MAX_ENTRIES = 1024
+
+_lock = threading.Lock()
+_entries = OrderedDict()     # key -> (total, expires_at, generations)
+_generations = {}            # table name -> write generation
+
+
+def normalize_filters(filters):
+    """Turn a filter dict into a hashable key; empty values are ignored."""
+    if not filters:
+        return ()
+    return tuple(sorted(
+        (key, str(value).strip().lower())
+        for key, value in filters.items()
+        if value not in (None, "", [], ())
+    ))
+
+
+def _snapshot(tables):
+    return tuple(_generations.get(t, 0) for t in tables)
+
+
+def invalidate_tables(*tables):
+    """Forget every cached total that depends on one of `tables`."""
+    with _lock:
+        for table in tables:
+            _generations[table] = _generations.get(table, 0) + 1
+
+
+def clear():
+    with _lock:
+        _entries.clear()
+
+
+def _cached(key, tables):
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            return None
+        total, expires_at, generations = entry
+        if expires_at < time.monotonic() or generations != _snapshot(tables):
+            del _entries[key]
+            return None
+        _entries.move_to_end(key)
+        return total
+
+
+def _store(key, tables, total, generations, ttl):
+    with _lock:
+        # Skip the store if a write landed while we were counting
+        if generations != _snapshot(tables):
+            return
+        _entries[key] = (total, time.monotonic() + ttl, generations)
+        _entries.move_to_end(key)
+        while len(_entries) > MAX_ENTRIES:
+            _entries.popitem(last=False)
+
+
+def exact_count(query):
+    """Same COUNT(*) Flask-SQLAlchemy's paginate() would issue."""
+    stmt = select(func.count()).select_from(query.order_by(None).subquery())
+    return db.session.execute(stmt).scalar()
+
+
+def estimated_count(table):
+    """Planner row estimate for a whole table, or None if it has never been analyzed."""
+    estimate = db.session.execute(
+        text("SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:table AS regclass)"),
+        {"table": table}
+    ).scalar()
+    if estimate is None or estimate < 0:
+        return None
+    return int(estimate)
+
+
+def count_total(query, scope, tables, filters=None, estimate_table=None):
+    """
+    Return (total, exact) for `query`.
+
+    scope:          name of the listing, e.g. "posts:dashboard".
+    tables:         tables whose writes invalidate the total.
+    filters:        the request filters that shaped `query`.
+    estimate_table: set only when `query` is an unfiltered scan of that
+                    table; enables the reltuples estimate when configured.
+    """
+    config = current_app.config
+    tables = tuple(sorted(tables))
+
+    if estimate_table and config.get("COUNT_USE_ESTIMATES", False):
+        estimate = estimated_count(estimate_table)
+        if estimate is not None and estimate >= config.get(
+            "COUNT_ESTIMATE_MIN_ROWS", DEFAULT_ESTIMATE_MIN_ROWS
+        ):
+            return estimate, False
+
+    key = (scope, normalize_filters(filters))
+    total = _cached(key, tables)
+    if total is not None:
+        return total, False
+
+    with _lock:
+        generations = _snapshot(tables)
+    total = exact_count(query)
+    _store(key, tables, total, generations, config.get("COUNT_CACHE_TTL", DEFAULT_TTL))
+    return total, True
+
+
+def paginate_with_count(query, page, per_page, scope, tables, filters=None, estimate_table=None):
+    """
+    query.paginate() with the total supplied by count_total().
+
+    The returned Pagination has `total`/`pages` set as usual plus a
+    `total_exact` attribute for the response.
+    """
+    pagination = query.paginate(page=page, per_page=per_page, error_out=False, count=False)
+    pagination.total, pagination.total_exact = count_total(
+        query, scope, tables, filters=filters, estimate_table=estimate_table
+    )
+    return pagination
+
+
+# ---------------------------------------------------------------------------
+# Write tracking: remember which tables a transaction flushed to and
+# invalidate them once it commits.
+# ---------------------------------------------------------------------------
+def _written_tables(obj):
+    state = inspect(obj)
+    tables = {state.mapper.local_table.name}
+    for rel in state.mapper.relationships:
+        if rel.secondary is not None and attributes.get_history(obj, rel.key).has_changes():
+            tables.add(rel.secondary.name)
+    return tables
+
+
+def invalidate_on_commit(*tables, session=None):
+    """Record writes the flush can't see (Core statements) to `tables`."""
+    session = session or db.session()
+    session.info.setdefault("count_written_tables", set()).update(tables)
+
+
+@event.listens_for(Session, "before_flush")
+def _track_writes(session, flush_context, instances):
+    written = session.info.setdefault("count_written_tables", set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        written.update(_written_tables(obj))
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    written = session.info.pop("count_written_tables", None)
+    if written:
+        invalidate_tables(*written)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_after_rollback(session, previous_transaction):
+    session.info.pop("count_written_tables", None)
@@ -1,15 +1,17 @@
 # app/utils/decorators.py
-from flask_jwt_extended import verify_jwt_in_request, get_jwt
+from flask_jwt_extended import verify_jwt_in_request
 from functools import wraps
 from flask import jsonify
+from app.utils.identity import get_session_state
 
 def role_required(*roles):
     def wrapper(fn):
         @wraps(fn)
         def decorator(*args, **kwargs):
             verify_jwt_in_request()
-            claims = get_jwt()
-            if claims.get("role") not in roles:
+            # The current role, not the one baked into the token at login,
+            # so a role change applies to sessions that are already open
+            if get_session_state().role not in roles:
                 return jsonify({"msg": "Unauthorized"}), 403
             return fn(*args, **kwargs)
         return decorator
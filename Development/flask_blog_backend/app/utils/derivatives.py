@@ -0,0 +1,119 @@
+# app/utils/derivatives.py
+"""
+Disk-backed cache of resized images for /api/images (app/routes/images.py).
+
+Each derivative is one file named after a hash of (source path, source
+mtime/size, box, format), so replacing a source file simply stops matching
+its old derivatives, which then age out.
+
+- Bounded by total bytes: after every write the oldest files (by mtime) are
+  removed until the directory is back under `max_bytes`. Hits refresh the
+  mtime, which makes the eviction LRU.
+- Concurrent requests for the same derivative are de-duplicated with an
+  exclusive flock on a per-key lock file, which works across gunicorn
+  workers as well as threads: the first request renders, the others wait
+  for the lock and then find the file on disk.
+"""
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows dev machines
+    fcntl = None
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class DerivativeCache:
+    def __init__(self, root, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._locks = {}                     # fallback when fcntl is missing
+        self._locks_guard = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def key(self, source, width, height, fmt):
+        st = os.stat(source)
+        raw = f"{os.path.abspath(source)}|{st.st_mtime_ns}|{st.st_size}|{width}|{height}|{fmt}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def path_for(self, key, fmt):
+        return os.path.join(self.root, f"{key}.{fmt}")
+
+    def get_or_create(self, source, width, height, fmt, render):
+        """
+        Path of the cached derivative, calling `render()` -> bytes (or None
+        when the source can't be processed) at most once per key.
+        Returns None if rendering failed.
+        """
+        key = self.key(source, width, height, fmt)
+        path = self.path_for(key, fmt)
+        if self._touch(path):
+            return path
+
+        with self._lock(key):
+            # Another worker may have rendered it while we waited
+            if self._touch(path):
+                return path
+            data = render()
+            if data is None:
+                return None
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as fh:
+                fh.write(data)
+            os.replace(tmp, path)
+
+        self.evict()
+        return path
+
+    def evict(self):
+        """Remove least recently used derivatives until under max_bytes."""
+        entries = []
+        total = 0
+        with os.scandir(self.root) as it:
+            for entry in it:
+                if entry.name.endswith((".lock", ".tmp")) or not entry.is_file():
+                    continue
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+
+        for _mtime, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            # Lock files are left in place while a key is cached (removing
+            # one a waiter already holds open would let two renders race)
+            for stale in (path, os.path.splitext(path)[0] + ".lock"):
+                try:
+                    os.remove(stale)
+                except FileNotFoundError:
+                    pass
+            total -= size
+        return total
+
+    def _touch(self, path):
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    @contextmanager
+    def _lock(self, key):
+        if fcntl is None:
+            with self._locks_guard:
+                lock = self._locks.setdefault(key, threading.Lock())
+            with lock:
+                yield
+            return
+
+        lock_path = os.path.join(self.root, f"{key}.lock")
+        with open(lock_path, "w") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
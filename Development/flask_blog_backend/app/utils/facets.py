@@ -0,0 +1,71 @@
+# app/utils/facets.py
+"""
+Category and author facet counts for post search/filter results.
+
+The counts are taken over the same filtered query that produces the page,
+so they always describe the current result set. Both facets come from one
+statement: the matching posts are grouped by GROUPING SETS
+((category), (author)) and GROUPING() tells the two kinds of rows apart.
+"""
+from sqlalchemy import distinct, func, select, tuple_
+
+from app.extensions import db
+from app.models.associations import post_categories
+from app.models.category import Category
+from app.models.post import Post
+from app.models.user import User
+
+FACET_LIMIT = 20
+
+
+def wants_facets(args):
+    """True when the request asked for facets (?facets=true/1/yes)."""
+    return (args.get("facets", "") or "").strip().lower() in ("1", "true", "yes")
+
+
+def empty_facets():
+    return {"categories": [], "authors": []}
+
+
+def facet_counts(query, limit=FACET_LIMIT):
+    """
+    Count the posts matched by `query` per category and per author.
+
+    `query` is the filtered Post query before ordering and pagination; any
+    extra selected columns (e.g. a search rank) are ignored. Each facet is
+    sorted by count and trimmed to `limit` entries. Posts without a category
+    only count towards their author.
+    """
+    matching = query.order_by(None).with_entities(Post.id, Post.author_id).subquery()
+
+    stmt = (
+        select(
+            Category.id.label("category_id"),
+            Category.name.label("category_name"),
+            User.id.label("author_id"),
+            User.username.label("author_name"),
+            func.count(distinct(matching.c.id)).label("post_count"),
+            func.grouping(Category.id).label("by_author"),
+        )
+        .select_from(matching)
+        .join(User, User.id == matching.c.author_id)
+        .outerjoin(post_categories, post_categories.c.post_id == matching.c.id)
+        .outerjoin(Category, Category.id == post_categories.c.category_id)
+        .group_by(func.grouping_sets(
+            tuple_(Category.id, Category.name),
+            tuple_(User.id, User.username),
+        ))
+    )
+
+    categories, authors = [], []
+    for row in db.session.execute(stmt):
+        if row.by_author:
+            authors.append({"id": row.author_id, "username": row.author_name, "count": row.post_count})
+        elif row.category_id is not None:
+            categories.append({"id": row.category_id, "name": row.category_name, "count": row.post_count})
+
+    def top(entries, label):
+        entries.sort(key=lambda e: (-e["count"], e[label].lower()))
+        return entries[:limit]
+
+    return {"categories": top(categories, "name"), "authors": top(authors, "username")}
@@ -4,10 +4,13 @@ import uuid
 from werkzeug.utils import secure_filename
 from flask import current_app
 
+from app.utils.images import generate_variants
+
 def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in current_app.config["ALLOWED_EXTENSIONS"]
 
 def save_image(file, username):
+    """Save an upload plus its responsive variants; returns (filename, variants)."""
     if file and allowed_file(file.filename):
         # 1. Clean the original filename and extract extension
         ext = file.filename.rsplit(".", 1)[1].lower()
@@ -23,6 +26,7 @@ def save_image(file, username):
         upload_folder = current_app.config["UPLOAD_FOLDER"]
         path = os.path.join(upload_folder, new_filename)
         file.save(path)
-        
-        return new_filename  # Return only the filename to store in the DB
-    return None
\ No newline at end of file
+
+        # 5. Write the thumb/card/full variants next to it, like post images
+        return new_filename, generate_variants(path)  # Only file names, to store in the DB
+    return None, {}
@@ -0,0 +1,139 @@
+# app/utils/google_oidc.py
+"""
+Google sign-in without the userinfo round trip.
+
+The authorization-code exchange (scope "openid email profile") already
+returns an `id_token`: a JWT signed by Google carrying email, name and
+picture. `GoogleOIDC.verify_id_token()` checks it locally (RS256 signature
+against Google's JWKS, issuer, audience = GOOGLE_CLIENT_ID, expiry), so a
+login costs one HTTPS call instead of two.
+
+- The JWKS is cached in memory for the max-age of its Cache-Control header
+  (Google rotates keys with hours of overlap). A token signed with an
+  unknown `kid` forces one early refetch, at most every
+  JWKS_MIN_REFETCH_INTERVAL seconds.
+- All Google HTTP traffic goes through one pooled `requests.Session` per
+  process, so the exchange reuses a kept-alive TLS connection, and through
+  the outbound dependencies (app/utils/outbound.py) for timeouts and
+  circuit breaking. An open circuit surfaces as CircuitOpenError.
+
+GOOGLE_JWKS_URL (and the token URL in routes/google_auth.py) can point at
+a local stand-in (tests/google_standin.py) to run the flow offline.
+"""
+import re
+import threading
+import time
+
+import jwt
+import requests
+from flask import current_app
+from requests.adapters import HTTPAdapter
+
+from app.utils import outbound
+
+DEFAULT_JWKS_URL = "https://www.googleapis.com/oauth2/v3/certs"
+GOOGLE_ISSUERS = ("https://accounts.google.com", "accounts.google.com")
+DEFAULT_MAX_AGE = 3600          # seconds, when Cache-Control has no max-age
+JWKS_MIN_REFETCH_INTERVAL = 60  # seconds between refetches for unknown kids
+CLOCK_SKEW = 60                 # seconds of leeway on exp/iat
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+class IdTokenError(Exception):
+    """The id_token is malformed, not signed by Google, or not for us."""
+
+
+class JWKSCache:
+    """Google's signing keys by `kid`, refetched when Cache-Control says so."""
+
+    def __init__(self, url, session):
+        self.url = url
+        self.session = session
+        self._lock = threading.Lock()
+        self._keys = {}
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+
+    def _fetch(self):
+        response = outbound.request("google_jwks", self.session, "GET", self.url)
+        response.raise_for_status()
+        keys = {}
+        for jwk in response.json().get("keys", []):
+            try:
+                keys[jwk["kid"]] = jwt.PyJWK(jwk).key
+            except (KeyError, jwt.PyJWKError):
+                continue
+        match = _MAX_AGE.search(response.headers.get("Cache-Control", ""))
+        max_age = int(match.group(1)) if match else DEFAULT_MAX_AGE
+        now = time.monotonic()
+        self._keys = keys
+        self._fetched_at = now
+        self._expires_at = now + max_age
+
+    def get_key(self, kid):
+        with self._lock:
+            now = time.monotonic()
+            if now >= self._expires_at:
+                self._fetch()
+            elif kid not in self._keys and now - self._fetched_at >= JWKS_MIN_REFETCH_INTERVAL:
+                # Signed with a key published after our copy was fetched
+                self._fetch()
+            return self._keys.get(kid)
+
+
+class GoogleOIDC:
+    def __init__(self, jwks_url=DEFAULT_JWKS_URL, pool_size=4):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.jwks = JWKSCache(jwks_url, self.session)
+
+    def verify_id_token(self, id_token, audience):
+        """The verified claims of a Google id_token; raises IdTokenError."""
+        if not id_token:
+            raise IdTokenError("Missing id_token")
+        try:
+            header = jwt.get_unverified_header(id_token)
+        except jwt.InvalidTokenError as e:
+            raise IdTokenError(f"Malformed id_token: {e}") from e
+
+        if header.get("alg") != "RS256":
+            raise IdTokenError("Unexpected id_token algorithm")
+        try:
+            key = self.jwks.get_key(header.get("kid"))
+        except (requests.RequestException, ValueError) as e:
+            raise IdTokenError(f"Could not fetch Google signing keys: {e}") from e
+        if key is None:
+            raise IdTokenError("Unknown id_token signing key")
+
+        try:
+            claims = jwt.decode(
+                id_token,
+                key,
+                algorithms=["RS256"],
+                audience=audience,
+                issuer=GOOGLE_ISSUERS,
+                leeway=CLOCK_SKEW,
+                options={"require": ["exp", "iat", "iss", "aud", "sub"]},
+            )
+        except jwt.InvalidTokenError as e:
+            raise IdTokenError(f"Invalid id_token: {e}") from e
+
+        if claims.get("email") and claims.get("email_verified") is False:
+            raise IdTokenError("Google email address is not verified")
+        return claims
+
+
+def init_app(app):
+    oidc = GoogleOIDC(
+        jwks_url=app.config.get("GOOGLE_JWKS_URL", DEFAULT_JWKS_URL),
+        pool_size=app.config.get("GOOGLE_HTTP_POOL_SIZE", 4),
+    )
+    app.extensions["google_oidc"] = oidc
+    return oidc
+
+
+def get_oidc():
+    return current_app.extensions["google_oidc"]
@@ -0,0 +1,160 @@
+# app/utils/google_revoke.py
+"""
+Deferred revocation of Google refresh tokens.
+
+Logout must not wait on oauth2.googleapis.com. It rotates the session and
+revokes our own refresh tokens, then `queue_revocation()` adds a
+GoogleRevocation row to the same transaction and the request returns. Once
+the commit lands, the revocation worker is woken; it posts due rows to
+GOOGLE_REVOKE_URL over the pooled Google session (app/utils/google_oidc.py):
+
+- 200, or 400 "invalid_token" (already revoked or expired): done;
+- timeouts, connection errors and other statuses are retried with
+  exponential backoff (GOOGLE_REVOKE_BACKOFF * 2**attempts, capped at
+  GOOGLE_REVOKE_MAX_BACKOFF) and marked "failed" after
+  GOOGLE_REVOKE_MAX_ATTEMPTS;
+- while the "google_revoke" outbound circuit is open, due rows are left
+  untouched (no attempt spent) until a later round.
+
+GOOGLE_REVOKE_WORKER selects where this runs, like the email outbox:
+"thread" (each web process, started by its first request so revocations
+queued before a restart still go out) or "off" (`flask
+revoke-google-tokens`).
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+
+import requests
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.utils import outbound
+from app.utils.google_oidc import get_oidc
+from app.utils.outbound import CircuitOpenError
+from app.utils.polling_worker import PollingWorker, backoff_delay
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REVOKE_URL = "https://oauth2.googleapis.com/revoke"
+DEFAULT_BATCH_SIZE = 20
+DEFAULT_MAX_ATTEMPTS = 8
+DEFAULT_BACKOFF = 30            # seconds, doubled per attempt
+DEFAULT_MAX_BACKOFF = 6 * 60 * 60
+
+
+def queue_revocation(encrypted_token, user_id=None, session=None):
+    """Revoke `encrypted_token` at Google once the transaction commits."""
+    from app.extensions import db
+    from app.models.google_revocation import GoogleRevocation
+
+    session = session or db.session()
+    row = GoogleRevocation(user_id=user_id, token=encrypted_token)
+    session.add(row)
+    session.info["google_revocation_queued"] = True
+    return row
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_after_commit(session):
+    if session.info.pop("google_revocation_queued", False):
+        worker = current_app.extensions.get("google_revoke") if has_app_context() else None
+        if worker is not None:
+            worker.wake()
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_after_rollback(session, previous_transaction):
+    session.info.pop("google_revocation_queued", None)
+
+
+class RevocationWorker(PollingWorker):
+    name = "google-revoke"
+    mode_key = "GOOGLE_REVOKE_WORKER"
+    interval_key = "GOOGLE_REVOKE_POLL_INTERVAL"
+    log = logger
+
+    def deliver_batch(self):
+        """Revoke one batch of due tokens. Returns (done, failed) counts."""
+        from app.extensions import db
+        from app.models.google_revocation import GoogleRevocation
+        from app.routes.google_auth import decrypt_token
+
+        config = self.app.config
+        rows = (
+            GoogleRevocation.query
+            .filter(GoogleRevocation.status == GoogleRevocation.PENDING,
+                    GoogleRevocation.next_attempt_at <= datetime.now(timezone.utc))
+            .order_by(GoogleRevocation.id)
+            .limit(config.get("GOOGLE_REVOKE_BATCH_SIZE", DEFAULT_BATCH_SIZE))
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        if not rows:
+            db.session.commit()
+            return 0, 0
+
+        session = get_oidc().session
+        url = config.get("GOOGLE_REVOKE_URL", DEFAULT_REVOKE_URL)
+        done = failed = 0
+        for row in rows:
+            try:
+                token = decrypt_token(row.token)
+            except Exception as e:
+                # Encrypted under another ENCRYPTION_KEY; retrying won't help
+                row.attempts += 1
+                row.status = GoogleRevocation.FAILED
+                row.last_error = f"Cannot decrypt token: {e.__class__.__name__}"
+                failed += 1
+                continue
+
+            try:
+                response = outbound.request("google_revoke", session, "POST", url, data={"token": token})
+            except CircuitOpenError as e:
+                logger.warning(f"Google revocations paused: {e}")
+                break
+            except requests.RequestException as e:
+                response, error = None, str(e) or e.__class__.__name__
+            else:
+                error = f"HTTP {response.status_code}: {response.text[:200]}"
+
+            row.attempts += 1
+            if response is not None and (response.status_code == 200 or (
+                response.status_code == 400 and "invalid_token" in response.text
+            )):
+                row.status = GoogleRevocation.DONE
+                row.revoked_at = datetime.now(timezone.utc)
+                row.last_error = None
+                done += 1
+            else:
+                self._record_failure(row, error)
+                failed += 1
+
+        db.session.commit()
+        if done:
+            logger.info(f"Revoked {done} Google tokens")
+        return done, failed
+
+    def _record_failure(self, row, error):
+        from app.models.google_revocation import GoogleRevocation
+
+        config = self.app.config
+        row.last_error = error
+        if row.attempts >= config.get("GOOGLE_REVOKE_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS):
+            row.status = GoogleRevocation.FAILED
+            logger.error(f"Google revocation {row.id} failed permanently: {error}")
+            return
+        delay = backoff_delay(
+            row.attempts,
+            config.get("GOOGLE_REVOKE_BACKOFF", DEFAULT_BACKOFF),
+            config.get("GOOGLE_REVOKE_MAX_BACKOFF", DEFAULT_MAX_BACKOFF),
+        )
+        row.next_attempt_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+        logger.warning(f"Google revocation {row.id} failed, retrying in {delay}s: {error}")
+
+
+def init_app(app):
+    worker = RevocationWorker(app)
+    app.extensions["google_revoke"] = worker
+    app.before_request(worker.start)
+    return worker
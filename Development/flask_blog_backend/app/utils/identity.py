@@ -0,0 +1,119 @@
+# app/utils/identity.py
+"""
+Request-scoped identity.
+
+flask_jwt_extended calls two loaders while verifying a token: the
+blocklist check (session_token must still match) and the user lookup
+(blocked users are rejected). Both only need the user's SessionState
+(session_token, is_blocked, role), which comes from the shared session
+cache (app/utils/session_cache.py) when enabled, and otherwise from the
+user row. `load_session_state()` keeps it in `g`, so the pair costs at
+most one primary-key query.
+
+Handlers read the full row with `get_current_user()`. It is loaded lazily
+through `load_user()`, which keeps the row in `g` as well, so a request
+that missed the session cache still queries `users` only once.
+"""
+from flask import g, has_request_context
+from flask_jwt_extended import get_current_user as _jwt_current_user
+
+from app.utils import session_cache
+from app.utils.session_cache import SessionState
+
+
+def _user_id(identity):
+    try:
+        return int(identity)
+    except (TypeError, ValueError):
+        return None
+
+
+def load_user(identity):
+    """The User for a JWT identity, fetched at most once per request."""
+    from app.extensions import db
+    from app.models.user import User
+
+    user_id = _user_id(identity)
+    if user_id is None:
+        return None
+
+    if not has_request_context():
+        return db.session.get(User, user_id)
+
+    cache = g.setdefault("identity_users", {})
+    if user_id not in cache:
+        cache[user_id] = db.session.get(User, user_id)
+    return cache[user_id]
+
+
+def load_session_state(identity):
+    """The SessionState for a JWT identity: session cache first, then the row."""
+    user_id = _user_id(identity)
+    if user_id is None:
+        return None
+
+    states = g.setdefault("identity_states", {}) if has_request_context() else {}
+    if user_id in states:
+        return states[user_id]
+
+    cache = session_cache.get_cache()
+    state = cache.lookup(user_id) if cache is not None else None
+    if state is None:
+        # Read the version before the row, so an invalidation committed in
+        # between leaves an entry that is never served
+        version = cache.version(user_id) if cache is not None else None
+        user = load_user(user_id)
+        if user is not None:
+            state = SessionState.from_user(user)
+            if cache is not None:
+                cache.store(state, version)
+
+    states[user_id] = state
+    return state
+
+
+def get_session_state():
+    """
+    The SessionState of this request's authenticated, non-blocked user, or
+    None without a (valid) JWT. Call after @jwt_required() or
+    verify_jwt_in_request().
+    """
+    try:
+        return _jwt_current_user()
+    except RuntimeError:
+        return None
+
+
+def get_current_user():
+    """
+    The authenticated, non-blocked User of this request, or None when the
+    request carries no (valid) JWT. Call after @jwt_required() or
+    verify_jwt_in_request().
+    """
+    state = get_session_state()
+    return load_user(state.user_id) if state is not None else None
+
+
+def init_app(app):
+    from app.extensions import jwt
+
+    @app.teardown_request
+    def forget_identity(_exc):
+        # g outlives the request when an app context was already pushed
+        # (CLI, tests), so drop the cached rows explicitly
+        g.pop("identity_users", None)
+        g.pop("identity_states", None)
+
+    @jwt.token_in_blocklist_loader
+    def check_if_token_revoked(jwt_header, jwt_payload):
+        state = load_session_state(jwt_payload["sub"])
+        # Unknown user, or the session was rotated (password reset / logout)
+        return state is None or state.session_token != jwt_payload.get("session_token")
+
+    @jwt.user_lookup_loader
+    def user_lookup_callback(_jwt_header, jwt_data):
+        state = load_session_state(jwt_data["sub"])
+        # Returning None for a blocked user makes flask_jwt_extended reject the request
+        if state is None or state.is_blocked:
+            return None
+        return state
@@ -0,0 +1,201 @@
+# app/utils/image_worker.py
+"""
+Profile-picture cartoonization off the request path.
+
+Registration stores the original upload, points User.profile_picture at it
+and records an ImageJob. `submit(job_id)` hands the job to a bounded
+process pool (the bilateral filter is CPU bound, so threads would just
+contend for the GIL); a dispatcher thread in the web process waits for the
+result and, on success, swaps User.profile_picture to the cartoon and
+removes the original.
+
+Failures never affect the user beyond keeping the original picture:
+- more than IMAGE_WORKER_MAX_PENDING jobs in flight: the job waits in
+  this process's backlog and starts as soon as a running one finishes
+  (if the process exits first it stays "pending" for
+  `flask process-image-jobs`);
+- no result within IMAGE_WORKER_TIMEOUT seconds, or a processing error:
+  the job is marked "failed" and can be retried with
+  `flask process-image-jobs --retry-failed`.
+
+IMAGE_WORKER_PROCESSES = 0 runs jobs inline (tests, CLI).
+
+The pool runs `cartoonize.cartoonize_file`, which lives outside the `app`
+package: a spawned child unpickling a function from app.utils would import
+app/__init__.py and with it the whole Flask app (~60 MB per process).
+"""
+import logging
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+import multiprocessing
+
+from cartoonize import cartoonize_file
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROCESSES = 2
+DEFAULT_MAX_PENDING = 8
+DEFAULT_TIMEOUT = 30  # seconds
+
+
+def cartoon_path(source_path):
+    """"ProfilePics/x.png" -> "ProfilePics/x_cartoon.jpg"."""
+    return f"{os.path.splitext(source_path)[0]}_cartoon.jpg"
+
+
+# ---------------------------------------------------------------------------
+# Worker
+# ---------------------------------------------------------------------------
+class ImageWorker:
+    def __init__(self, app):
+        self.app = app
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(
+            app.config.get("IMAGE_WORKER_MAX_PENDING", DEFAULT_MAX_PENDING)
+        )
+        self._backlog = deque()  # job ids waiting for a slot
+
+    @property
+    def processes(self):
+        return self.app.config.get("IMAGE_WORKER_PROCESSES", DEFAULT_PROCESSES)
+
+    @property
+    def timeout(self):
+        return self.app.config.get("IMAGE_WORKER_TIMEOUT", DEFAULT_TIMEOUT)
+
+    def _get_pool(self):
+        # Created on first use, i.e. after gunicorn has forked its workers;
+        # "spawn" keeps the children clear of this process's threads and DB
+        # connections
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._pool
+
+    def submit(self, job_id):
+        """
+        Start `job_id` in the background (or inline when the pool is
+        disabled). Returns False if the queue is full; the job then waits
+        in the backlog for the next free slot.
+        """
+        if not self.processes:
+            self.run(job_id)
+            return True
+        self._backlog.append(job_id)
+        if not self._start_dispatcher():
+            logger.warning("Image worker queue full; job %s waits for a free slot", job_id)
+            return False
+        return True
+
+    def _start_dispatcher(self):
+        if not self._slots.acquire(blocking=False):
+            return False
+        thread = threading.Thread(target=self._dispatch, daemon=True)
+        thread.start()
+        return True
+
+    def _dispatch(self):
+        # Holds one slot and runs backlog jobs until none are left
+        try:
+            with self.app.app_context():
+                while self._backlog:
+                    try:
+                        job_id = self._backlog.popleft()
+                    except IndexError:
+                        break
+                    try:
+                        self.run(job_id, executor=self._get_pool())
+                    except Exception:
+                        logger.exception("Image job %s crashed", job_id)
+        finally:
+            self._slots.release()
+        # A job queued after the loop ended but before the release found no
+        # free slot; start it now
+        if self._backlog:
+            self._start_dispatcher()
+
+    def run(self, job_id, executor=None):
+        """Run one job to completion in the current thread; returns its status."""
+        from app.extensions import db
+        from app.models.image_job import ImageJob
+        from app.models.user import User
+
+        try:
+            job = db.session.get(ImageJob, job_id)
+            if job is None or job.status == ImageJob.DONE:
+                return job.status if job else None
+
+            job.status = ImageJob.RUNNING
+            job.attempts += 1
+            db.session.commit()
+
+            root = os.path.join(self.app.root_path, self.app.config.get("UPLOAD_FOLDER", "static/uploads"))
+            source = os.path.join(root, job.source_path)
+            target_path = cartoon_path(job.source_path)
+            target = os.path.join(root, target_path)
+
+            try:
+                if executor is None:
+                    ok = cartoonize_file(source, target)
+                else:
+                    future = executor.submit(cartoonize_file, source, target)
+                    ok = future.result(timeout=self.timeout)
+                error = None if ok else "could not decode image"
+            except FutureTimeout:
+                # The pool process can't be interrupted; it finishes on its
+                # own and its output is simply never used
+                future.cancel()
+                ok, error = False, "timeout"
+            except Exception as e:
+                ok, error = False, str(e)
+
+            if not ok:
+                job.status = ImageJob.FAILED
+                job.error = error
+                db.session.commit()
+                logger.warning("Image job %s failed: %s", job_id, error)
+                return job.status
+
+            user = db.session.get(User, job.user_id)
+            # Only swap if the user still shows the picture this job was for
+            if user is not None and user.profile_picture == job.source_path:
+                user.profile_picture = target_path
+                stale = source
+            else:
+                stale = target
+            job.status = ImageJob.DONE
+            job.error = None
+            db.session.commit()
+
+            if source != target and os.path.exists(stale):
+                os.remove(stale)
+            return job.status
+        except Exception:
+            db.session.rollback()
+            raise
+        finally:
+            if executor is not None:
+                db.session.remove()
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+def init_app(app):
+    worker = ImageWorker(app)
+    app.extensions["image_worker"] = worker
+    return worker
+
+
+def get_worker():
+    from flask import current_app
+    return current_app.extensions["image_worker"]
@@ -0,0 +1,113 @@
+# app/utils/images.py
+"""
+Responsive variants of uploaded images.
+
+Every upload gets a fixed set of downscaled copies next to the original,
+each in WebP and JPEG:
+
+    <stem>_thumb.webp / .jpg    160px wide
+    <stem>_card.webp  / .jpg    480px wide
+    <stem>_full.webp  / .jpg    1600px wide
+
+Images are decoded with cv2.IMREAD_COLOR, which applies the EXIF
+orientation, and re-encoded from raw pixels, so no EXIF/ICC metadata
+survives. Images are never upscaled: a variant wider than the original is
+encoded at the original size. The returned dict is what Image.variants
+(and Category.image_variants) store.
+"""
+import os
+
+import cv2
+import numpy as np
+
+VARIANT_WIDTHS = {"thumb": 160, "card": 480, "full": 1600}
+VARIANT_FORMATS = ("webp", "jpg")
+
+_ENCODE_PARAMS = {
+    "webp": [cv2.IMWRITE_WEBP_QUALITY, 80],
+    "jpg": [cv2.IMWRITE_JPEG_QUALITY, 82, cv2.IMWRITE_JPEG_PROGRESSIVE, 1,
+            cv2.IMWRITE_JPEG_OPTIMIZE, 1],
+}
+
+
+def variant_filename(filename, variant, fmt):
+    stem = os.path.splitext(filename)[0]
+    return f"{stem}_{variant}.{fmt}"
+
+
+def decode_image(path):
+    """Decode an image file to a BGR array (EXIF orientation applied), or None."""
+    data = np.fromfile(path, dtype=np.uint8)
+    if data.size == 0:
+        return None
+    return cv2.imdecode(data, cv2.IMREAD_COLOR)
+
+
+def resize_to_width(img, width):
+    height, current = img.shape[:2]
+    if current <= width:
+        return img
+    new_height = max(1, round(height * width / current))
+    return cv2.resize(img, (width, new_height), interpolation=cv2.INTER_AREA)
+
+
+def _write_atomic(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(data)
+    os.replace(tmp, path)
+
+
+def generate_variants(path):
+    """
+    Write every variant of the image at `path` into the same directory.
+
+    Returns {variant: {"width", "height", "webp", "jpg"}} with file names
+    relative to that directory, or {} if the file cannot be decoded (e.g.
+    GIF), in which case callers keep serving the original.
+    """
+    img = decode_image(path)
+    if img is None:
+        return {}
+
+    directory, filename = os.path.split(path)
+    variants = {}
+    # Largest first, so each smaller variant is resized from the previous one
+    for variant, width in sorted(VARIANT_WIDTHS.items(), key=lambda kv: -kv[1]):
+        img = resize_to_width(img, width)
+        entry = {"width": int(img.shape[1]), "height": int(img.shape[0])}
+        for fmt in VARIANT_FORMATS:
+            ok, buffer = cv2.imencode(f".{fmt}", img, _ENCODE_PARAMS[fmt])
+            if not ok:
+                continue
+            name = variant_filename(filename, variant, fmt)
+            _write_atomic(os.path.join(directory, name), buffer.tobytes())
+            entry[fmt] = name
+        variants[variant] = entry
+    return variants
+
+
+def variant_files(variants):
+    """Every file name recorded in a variants dict (for cleanup)."""
+    return [
+        entry[fmt]
+        for entry in (variants or {}).values()
+        for fmt in VARIANT_FORMATS
+        if entry.get(fmt)
+    ]
+
+
+def variant_urls(base_url, variants):
+    """
+    Public URLs for a recorded variants dict, e.g.
+    {"card": {"width": 480, "height": 720, "webp": ".../x_card.webp", "jpg": ...}}.
+    `base_url` is the folder URL ending in "/".
+    """
+    return {
+        name: {
+            "width": entry.get("width"),
+            "height": entry.get("height"),
+            **{fmt: f"{base_url}{entry[fmt]}" for fmt in VARIANT_FORMATS if entry.get(fmt)},
+        }
+        for name, entry in (variants or {}).items()
+    }
@@ -0,0 +1,237 @@
+# app/utils/outbound.py
+"""
+Outbound calls to third-party services: per-dependency timeouts, circuit
+breakers and latency/error metrics.
+
+Every call to an external service goes through its Dependency
+("smtp", "google_token", "google_jwks", "google_revoke"):
+
+    with get_dependency("smtp").call(ignore=(SMTPRecipientsRefused,)) as call:
+        conn.send(message)          # call.timeout is the budget to apply
+
+    response = request("google_token", session, "POST", url, data=...)
+
+- The timeout comes from OUTBOUND_TIMEOUTS[name].
+- After OUTBOUND_FAILURE_THRESHOLD consecutive failures the breaker opens
+  and calls fail fast with CircuitOpenError instead of waiting out the
+  timeout. After OUTBOUND_RESET_TIMEOUT seconds one half-open probe is let
+  through: success closes the breaker, failure re-opens it.
+- Exceptions raised in the block count as failures, except `ignore`
+  (the service answered, e.g. a refused recipient). `call.fail()` marks a
+  returned-but-bad result (HTTP 5xx/429) as one.
+- Calls, failures, short-circuited calls and a latency histogram are kept
+  per dependency; `flask outbound-stats` and GET /api/users/outbound-health
+  show them.
+
+Breakers and metrics live in each process (gunicorn worker, CLI worker).
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 10  # seconds
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 30  # seconds the breaker stays open before a probe
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class CircuitOpenError(Exception):
+    """The dependency's breaker is open; the call was not attempted."""
+
+    def __init__(self, name, retry_in):
+        super().__init__(f"{name} unavailable (circuit open, retry in {retry_in:.0f}s)")
+        self.name = name
+        self.retry_in = retry_in
+
+
+# ---------------------------------------------------------------------------
+# Circuit breaker
+# ---------------------------------------------------------------------------
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout=DEFAULT_RESET_TIMEOUT, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def retry_in(self):
+        return max(0.0, self.opened_at + self.reset_timeout - self.clock())
+
+    def allow(self):
+        """Whether a call may go out now; claims the probe when half-open."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            # Open, or half-open with the probe still in flight
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        """Count a failure; returns True when this opened the breaker."""
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                was_open = self.state == self.OPEN
+                self.state = self.OPEN
+                self.opened_at = self.clock()
+                return not was_open
+            return False
+
+
+# ---------------------------------------------------------------------------
+# Dependencies
+# ---------------------------------------------------------------------------
+class Call:
+    """Handed to the `with` block: the timeout to apply and a way to fail."""
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.error = None
+
+    def fail(self, error):
+        self.error = error
+
+
+class Dependency:
+    def __init__(self, name, timeout=DEFAULT_TIMEOUT, breaker=None):
+        self.name = name
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+        self.latency_total_ms = 0.0
+        self.latency_max_ms = 0.0
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.last_error = None
+
+    @contextmanager
+    def call(self, ignore=()):
+        if not self.breaker.allow():
+            with self._lock:
+                self.rejected += 1
+            raise CircuitOpenError(self.name, self.breaker.retry_in())
+
+        call = Call(self.timeout)
+        started = time.perf_counter()
+        try:
+            yield call
+        except ignore:
+            self._record(started, None)
+            raise
+        except BaseException as e:
+            self._record(started, str(e) or e.__class__.__name__)
+            raise
+        else:
+            self._record(started, call.error)
+
+    def _record(self, started, error):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        bucket = next((i for i, edge in enumerate(LATENCY_BUCKETS_MS) if elapsed_ms <= edge),
+                      len(LATENCY_BUCKETS_MS))
+        with self._lock:
+            self.calls += 1
+            self.latency_total_ms += elapsed_ms
+            self.latency_max_ms = max(self.latency_max_ms, elapsed_ms)
+            self.latency_buckets[bucket] += 1
+            if error is not None:
+                self.failures += 1
+                self.last_error = error
+
+        if error is None:
+            self.breaker.record_success()
+        elif self.breaker.record_failure():
+            logger.warning(f"Circuit for {self.name} opened after {self.breaker.failures} "
+                           f"failures: {error}")
+
+    def stats(self):
+        with self._lock:
+            buckets = {f"le_{edge}ms": count
+                       for edge, count in zip(LATENCY_BUCKETS_MS, self.latency_buckets)}
+            buckets["gt_{}ms".format(LATENCY_BUCKETS_MS[-1])] = self.latency_buckets[-1]
+            return {
+                "state": self.breaker.state,
+                "timeout": self.timeout,
+                "calls": self.calls,
+                "failures": self.failures,
+                "rejected": self.rejected,
+                "error_rate": round(self.failures / self.calls, 4) if self.calls else 0.0,
+                "latency_avg_ms": round(self.latency_total_ms / self.calls, 1) if self.calls else 0.0,
+                "latency_max_ms": round(self.latency_max_ms, 1),
+                "latency_buckets": buckets,
+                "last_error": self.last_error,
+            }
+
+
+class Outbound:
+    """The app's dependencies, created on first use from the config."""
+
+    def __init__(self, app):
+        self.app = app
+        self._lock = threading.Lock()
+        self.dependencies = {}
+
+    def get(self, name):
+        with self._lock:
+            dependency = self.dependencies.get(name)
+            if dependency is None:
+                config = self.app.config
+                dependency = Dependency(
+                    name,
+                    timeout=config.get("OUTBOUND_TIMEOUTS", {}).get(name, DEFAULT_TIMEOUT),
+                    breaker=CircuitBreaker(
+                        config.get("OUTBOUND_FAILURE_THRESHOLD", DEFAULT_FAILURE_THRESHOLD),
+                        config.get("OUTBOUND_RESET_TIMEOUT", DEFAULT_RESET_TIMEOUT),
+                    ),
+                )
+                self.dependencies[name] = dependency
+            return dependency
+
+    def stats(self):
+        with self._lock:
+            dependencies = dict(self.dependencies)
+        return {name: dependency.stats() for name, dependency in sorted(dependencies.items())}
+
+
+def init_app(app):
+    outbound = Outbound(app)
+    app.extensions["outbound"] = outbound
+    return outbound
+
+
+def get_dependency(name):
+    return current_app.extensions["outbound"].get(name)
+
+
+def request(name, session, method, url, **kwargs):
+    """
+    An HTTP call through dependency `name`, with its timeout. 5xx and 429
+    responses count as failures but are returned to the caller; network
+    errors are raised as usual.
+    """
+    with get_dependency(name).call() as call:
+        response = session.request(method, url, timeout=call.timeout, **kwargs)
+        if response.status_code >= 500 or response.status_code == 429:
+            call.fail(f"HTTP {response.status_code}")
+    return response
@@ -0,0 +1,295 @@
+# app/utils/outbox.py
+"""
+Transactional email outbox.
+
+Request handlers never talk to the SMTP server. `queue_email()` adds an
+EmailOutbox row to the current session, so the message is committed (or
+rolled back) together with the user row or token that triggered it. After
+the commit the delivery worker is woken up; it drains due rows in batches
+over pooled, persistent SMTP connections:
+
+- each batch claims up to EMAIL_OUTBOX_BATCH_SIZE rows (FOR UPDATE SKIP
+  LOCKED, so several workers/processes never send the same row) and sends
+  them over one checked-out connection;
+- a failed message is rescheduled with exponential backoff
+  (EMAIL_OUTBOX_BACKOFF * 2**attempts, capped at EMAIL_OUTBOX_MAX_BACKOFF)
+  and marked "failed" after EMAIL_OUTBOX_MAX_ATTEMPTS;
+- a connection that breaks mid-batch is dropped from the pool and the rest
+  of the batch continues on a fresh one; if the server can't be reached at
+  all the whole batch backs off;
+- connecting and sending go through the "smtp" outbound dependency
+  (app/utils/outbound.py): its timeout applies, and while its circuit is
+  open due rows are left untouched for a later round.
+
+EMAIL_OUTBOX_WORKER selects where delivery runs: "thread" (a background
+thread in each web process, default) or "off" (only `flask deliver-emails`,
+e.g. as its own container/cron job). The thread is started by the process's
+first request and drains at once, so rows left pending or backing off by a
+restart go out without waiting for the next queued email. With MAIL_SUPPRESS_SEND the messages
+are only dispatched through flask_mail's signal, like mail.send().
+
+The thread/drain/wake plumbing lives in app/utils/polling_worker.py,
+shared with the deferred Google token revocation (app/utils/google_revoke.py).
+"""
+import logging
+import queue
+import smtplib
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app, has_app_context
+from flask_mail import Connection, Message
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.utils.outbound import CircuitOpenError
+from app.utils.polling_worker import PollingWorker, backoff_delay
+
+logger = logging.getLogger("email_logger")
+
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_MAX_ATTEMPTS = 6
+DEFAULT_BACKOFF = 30            # seconds, doubled per attempt
+DEFAULT_MAX_BACKOFF = 60 * 60
+
+# The server answered and refused this message; the connection is fine
+MESSAGE_REJECTIONS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError, smtplib.SMTPSenderRefused)
+
+
+# ---------------------------------------------------------------------------
+# SMTP connection pool
+# ---------------------------------------------------------------------------
+class PooledConnection(Connection):
+    """flask_mail Connection with a socket timeout, kept open across batches."""
+
+    def __init__(self, mail, timeout):
+        super().__init__(mail)
+        self.timeout = timeout
+        self.last_used = 0.0
+
+    def configure_host(self):
+        if self.mail.use_ssl:
+            host = smtplib.SMTP_SSL(self.mail.server, self.mail.port, timeout=self.timeout)
+        else:
+            host = smtplib.SMTP(self.mail.server, self.mail.port, timeout=self.timeout)
+        host.set_debuglevel(int(self.mail.debug))
+        if self.mail.use_tls:
+            host.starttls()
+        if self.mail.username and self.mail.password:
+            host.login(self.mail.username, self.mail.password)
+        return host
+
+    def alive(self):
+        if self.host is None:
+            return True  # suppressed sending
+        try:
+            return self.host.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def close(self):
+        try:
+            self.__exit__(None, None, None)
+        except (smtplib.SMTPException, OSError):
+            pass
+
+
+class SMTPPool:
+    """
+    Up to `size` open SMTP connections, opened through the outbound
+    `dependency` (timeout, circuit breaker). Connections idle for longer than
+    `idle_check` seconds are probed with NOOP before reuse.
+    """
+
+    def __init__(self, mail, dependency, size=1, idle_check=30):
+        self.mail = mail
+        self.dependency = dependency
+        self.idle_check = idle_check
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def _open(self):
+        conn = PooledConnection(self.mail, self.dependency.timeout)
+        with self.dependency.call():
+            conn.__enter__()
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection; it is discarded if the block raises."""
+        try:
+            conn = self._idle.get_nowait()
+            if time.monotonic() - conn.last_used > self.idle_check and not conn.alive():
+                conn.close()
+                conn = self._open()
+        except queue.Empty:
+            conn = self._open()
+
+        try:
+            yield conn
+        except BaseException:
+            conn.close()
+            raise
+        conn.last_used = time.monotonic()
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+# ---------------------------------------------------------------------------
+# Queueing
+# ---------------------------------------------------------------------------
+def queue_email(subject, recipients, html, session=None):
+    """Add an email to the outbox; it is sent once the transaction commits."""
+    from app.extensions import db
+    from app.models.email_outbox import EmailOutbox
+
+    session = session or db.session()
+    row = EmailOutbox(subject=subject, recipients=list(recipients), html=html)
+    session.add(row)
+    session.info["email_outbox_queued"] = True
+    return row
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_after_commit(session):
+    if session.info.pop("email_outbox_queued", False):
+        worker = current_app.extensions.get("email_outbox") if has_app_context() else None
+        if worker is not None:
+            worker.wake()
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_after_rollback(session, previous_transaction):
+    session.info.pop("email_outbox_queued", None)
+
+
+# ---------------------------------------------------------------------------
+# Delivery
+# ---------------------------------------------------------------------------
+class OutboxWorker(PollingWorker):
+    name = "email-outbox"
+    mode_key = "EMAIL_OUTBOX_WORKER"
+    interval_key = "EMAIL_OUTBOX_POLL_INTERVAL"
+    log = logger
+
+    def __init__(self, app):
+        super().__init__(app)
+        self._pool = None
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            config = self.app.config
+            self._pool = SMTPPool(
+                self.app.extensions["mail"],
+                self.app.extensions["outbound"].get("smtp"),
+                size=config.get("EMAIL_SMTP_POOL_SIZE", 1),
+                idle_check=config.get("EMAIL_SMTP_IDLE_CHECK", 30),
+            )
+        return self._pool
+
+    def deliver_batch(self):
+        """
+        Send one batch of due messages. Returns (sent, failed) counts;
+        (0, 0) means nothing was due.
+        """
+        from app.extensions import db
+        from app.models.email_outbox import EmailOutbox
+
+        config = self.app.config
+        now = datetime.now(timezone.utc)
+        rows = (
+            EmailOutbox.query
+            .filter(EmailOutbox.status == EmailOutbox.PENDING, EmailOutbox.next_attempt_at <= now)
+            .order_by(EmailOutbox.id)
+            .limit(config.get("EMAIL_OUTBOX_BATCH_SIZE", DEFAULT_BATCH_SIZE))
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        if not rows:
+            db.session.commit()
+            return 0, 0
+
+        sent = failed = 0
+        remaining = list(rows)
+        while remaining:
+            progressed = False
+            try:
+                with self.pool.connection() as conn:
+                    while remaining:
+                        row = remaining[0]
+                        try:
+                            with self.pool.dependency.call(ignore=MESSAGE_REJECTIONS):
+                                conn.send(Message(subject=row.subject, recipients=row.recipients,
+                                                  html=row.html))
+                        except MESSAGE_REJECTIONS as e:
+                            self._record_failure(row, e)
+                            failed += 1
+                        else:
+                            row.status = EmailOutbox.SENT
+                            row.sent_at = datetime.now(timezone.utc)
+                            row.attempts += 1
+                            row.last_error = None
+                            sent += 1
+                        remaining.pop(0)
+                        progressed = True
+            except CircuitOpenError as e:
+                # The SMTP server is known to be down: don't spend attempts
+                # on it, the rows stay due for a later round
+                logger.warning(f"Outbox paused, {len(remaining)} emails left: {e}")
+                break
+            except (smtplib.SMTPException, OSError) as e:
+                if progressed:
+                    # Dropped mid-batch (idle timeout, per-connection limit):
+                    # carry on with the rest over a fresh connection
+                    continue
+                # Can't connect or the first message fails: back off the
+                # whole batch rather than hammering the server
+                for row in remaining:
+                    self._record_failure(row, e)
+                failed += len(remaining)
+                remaining = []
+
+        db.session.commit()
+        if sent:
+            logger.info(f"Outbox delivered {sent} emails")
+        return sent, failed
+
+    def _record_failure(self, row, error):
+        from app.models.email_outbox import EmailOutbox
+
+        config = self.app.config
+        row.attempts += 1
+        row.last_error = str(error) or error.__class__.__name__
+        if row.attempts >= config.get("EMAIL_OUTBOX_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS):
+            row.status = EmailOutbox.FAILED
+            logger.error(f"Email {row.id} to {row.recipients} failed permanently: {row.last_error}")
+            return
+        delay = backoff_delay(
+            row.attempts,
+            config.get("EMAIL_OUTBOX_BACKOFF", DEFAULT_BACKOFF),
+            config.get("EMAIL_OUTBOX_MAX_BACKOFF", DEFAULT_MAX_BACKOFF),
+        )
+        row.next_attempt_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+        logger.warning(f"Email {row.id} to {row.recipients} failed, retrying in {delay}s: {row.last_error}")
+
+    def stop(self):
+        super().stop()
+        if self._pool is not None:
+            self._pool.close()
+
+
+def init_app(app):
+    worker = OutboxWorker(app)
+    app.extensions["email_outbox"] = worker
+    app.before_request(worker.start)
+    return worker
@@ -0,0 +1,51 @@
+# app/utils/pagination.py
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor we did not issue."""
+
+
+def encode_cursor(created_at, row_id):
+    """Opaque cursor pointing just past the row (created_at, id)."""
+    payload = json.dumps({"t": created_at.isoformat() if created_at else None, "id": row_id})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Return (created_at, id) from a cursor built by encode_cursor()."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(payload["t"]), int(payload["id"])
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor(token)
+
+
+def keyset_paginate(query, created_col, id_col, cursor, per_page):
+    """
+    Seek-based pagination over (created_at DESC, id DESC).
+
+    Instead of OFFSET + COUNT(*), the page starts strictly after the row the
+    cursor points at, so an index on (…, created_at, id) serves every page at
+    the same cost. `cursor` is None/"" for the first page. Rows must expose
+    the created_at/id columns under the same names as `created_col`/`id_col`.
+
+    Returns (items, next_cursor); next_cursor is None on the last page.
+    """
+    query = query.order_by(None).order_by(created_col.desc(), id_col.desc())
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(tuple_(created_col, id_col) < tuple_(created_at, row_id))
+
+    rows = query.limit(per_page + 1).all()
+    items = rows[:per_page]
+    next_cursor = None
+    if len(rows) > per_page:
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, created_col.key), getattr(last, id_col.key))
+    return items, next_cursor
@@ -0,0 +1,196 @@
+# app/utils/passwords.py
+"""
+Password hashing off the request threads, with a bounded queue.
+
+scrypt costs tens to hundreds of milliseconds of CPU per hash. Run inline,
+a burst of logins occupies every request thread and cheap reads queue
+behind them. Instead `hash_password()` / `verify_password()` hand the work
+to a small per-process thread pool (hashlib.scrypt releases the GIL, so
+the other request threads keep serving):
+
+- PASSWORD_HASH_WORKERS threads hash at once (0 = inline: tests, CLI);
+- at most PASSWORD_HASH_MAX_PENDING hashes may be running or waiting;
+  beyond that, and for a hash still not started after
+  PASSWORD_HASH_QUEUE_TIMEOUT seconds, PasswordHasherBusy is raised and
+  the route answers 503 with a Retry-After estimated from recent latency.
+
+PASSWORD_HASH_METHOD is the werkzeug method string for new hashes (e.g.
+"scrypt:32768:8:1" = n:r:p). `flask calibrate-password-hash` picks the
+scrypt cost that takes about --target-ms on the machine it runs on.
+Stored hashes made with other parameters still verify; `needs_rehash()`
+tells login to re-hash them with the current ones.
+"""
+import logging
+import math
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_METHOD = "scrypt:32768:8:1"  # werkzeug's default
+DEFAULT_WORKERS = 1
+DEFAULT_MAX_PENDING = 4
+DEFAULT_QUEUE_TIMEOUT = 2  # seconds a hash may wait for a worker
+SCRYPT_R, SCRYPT_P = 8, 1
+SCRYPT_MIN_LOG2_N, SCRYPT_MAX_LOG2_N = 14, 20
+
+
+class PasswordHasherBusy(Exception):
+    """Too many hashes queued in this process; retry after `retry_after` s."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Password hashing saturated, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    def __init__(self, method=DEFAULT_METHOD, workers=DEFAULT_WORKERS,
+                 max_pending=DEFAULT_MAX_PENDING, queue_timeout=DEFAULT_QUEUE_TIMEOUT):
+        self.method = method
+        self.workers = workers
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.rejected = 0
+        self.avg_seconds = 0.1  # moving average of one hash, for Retry-After
+
+    def _get_executor(self):
+        # Created on first use, i.e. after gunicorn has forked its workers
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="password-hash"
+                )
+            return self._executor
+
+    def retry_after(self):
+        """Seconds until the current backlog should have drained."""
+        with self._lock:
+            backlog = self.pending * self.avg_seconds / max(self.workers, 1)
+        return max(1, math.ceil(backlog))
+
+    def _timed(self, fn, *args):
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.avg_seconds = 0.8 * self.avg_seconds + 0.2 * elapsed
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return self._timed(fn, *args)
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordHasherBusy(self.retry_after())
+        with self._lock:
+            self.pending += 1
+        try:
+            future = self._get_executor().submit(self._timed, fn, *args)
+            try:
+                return future.result(timeout=self.queue_timeout)
+            except FutureTimeout:
+                # Still queued: give the slot back. Already hashing: finish it
+                if future.cancel():
+                    with self._lock:
+                        self.rejected += 1
+                    raise PasswordHasherBusy(self.retry_after())
+                return future.result()
+        finally:
+            with self._lock:
+                self.pending -= 1
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """Whether `pwhash` was made with other parameters than `method`."""
+        return pwhash.split("$", 1)[0] != self.method
+
+    def stats(self):
+        with self._lock:
+            return {
+                "method": self.method,
+                "workers": self.workers,
+                "pending": self.pending,
+                "rejected": self.rejected,
+                "avg_ms": round(self.avg_seconds * 1000, 1),
+            }
+
+    def shutdown(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+def init_app(app):
+    hasher = PasswordHasher(
+        method=app.config.get("PASSWORD_HASH_METHOD", DEFAULT_METHOD),
+        workers=app.config.get("PASSWORD_HASH_WORKERS", DEFAULT_WORKERS),
+        max_pending=app.config.get("PASSWORD_HASH_MAX_PENDING", DEFAULT_MAX_PENDING),
+        queue_timeout=app.config.get("PASSWORD_HASH_QUEUE_TIMEOUT", DEFAULT_QUEUE_TIMEOUT),
+    )
+    app.extensions["password_hasher"] = hasher
+    return hasher
+
+
+def get_hasher():
+    return current_app.extensions["password_hasher"]
+
+
+def hash_password(password):
+    return get_hasher().hash(password)
+
+
+def verify_password(pwhash, password):
+    return get_hasher().verify(pwhash, password)
+
+
+def needs_rehash(pwhash):
+    return get_hasher().needs_rehash(pwhash)
+
+
+# ---------------------------------------------------------------------------
+# Calibration
+# ---------------------------------------------------------------------------
+def time_method(method, rounds=3):
+    """Median milliseconds werkzeug takes to hash with `method` here."""
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        generate_password_hash("calibration-password", method)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def calibrate_scrypt(target_ms, rounds=3):
+    """
+    The costliest scrypt method (n a power of two, r=8, p=1) whose median
+    hash time stays within `target_ms`, with the timings measured for each
+    n tried: (method, [(method, ms), ...]). Never goes below n=2**14.
+    """
+    chosen, timings = None, []
+    for log2_n in range(SCRYPT_MIN_LOG2_N, SCRYPT_MAX_LOG2_N + 1):
+        method = f"scrypt:{2 ** log2_n}:{SCRYPT_R}:{SCRYPT_P}"
+        ms = time_method(method, rounds)
+        timings.append((method, ms))
+        if ms > target_ms:
+            break
+        chosen = method
+    return chosen or timings[0][0], timings
@@ -0,0 +1,106 @@
+# app/utils/polling_worker.py
+"""
+Background delivery of rows queued in the database (the email outbox, the
+deferred Google token revocations).
+
+A `PollingWorker` subclass implements deliver_batch(); the worker drains
+due rows batch by batch, either from a daemon thread in each web process
+(config[mode_key] == "thread") or from a dedicated process through
+run_forever() (a `flask ... --loop` command). The thread is started by
+each process's first request (start() as a before_request hook) and then
+woken after commits that queue work, with a scan every `interval_key`
+seconds in between for rows whose backoff has expired.
+"""
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL = 30      # seconds between scans when nothing wakes the worker
+
+
+def backoff_delay(attempts, base, cap):
+    """Seconds before retry number `attempts`: base * 2**(attempts - 1), capped."""
+    return min(cap, base * 2 ** max(0, attempts - 1))
+
+
+class PollingWorker:
+    """
+    Drains due rows in batches, from a background thread in each web process
+    (config[mode_key] == "thread") or a dedicated process (run_forever).
+    Subclasses implement deliver_batch() returning (done, failed).
+    """
+
+    name = "worker"
+    mode_key = None             # config key: "thread" | "off"
+    interval_key = None         # config key: seconds between scans
+    default_interval = DEFAULT_POLL_INTERVAL
+    log = logger
+
+    def __init__(self, app):
+        self.app = app
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stopping = False
+
+    def deliver_batch(self):
+        raise NotImplementedError
+
+    def drain(self):
+        """Deliver batches until nothing is due. Returns total (done, failed)."""
+        total_done = total_failed = 0
+        while True:
+            done, failed = self.deliver_batch()
+            total_done += done
+            total_failed += failed
+            if not done:
+                # Nothing due, or everything failed and was pushed back
+                return total_done, total_failed
+
+    # -- background thread --------------------------------------------------
+    def start(self):
+        """
+        before_request hook: start the thread with the process's first
+        request (after gunicorn's fork, and never in CLI commands) and
+        drain whatever is already due.
+        """
+        if self._thread is None:
+            self.wake()
+
+    def wake(self):
+        if self.app.config.get(self.mode_key, "thread") != "thread":
+            return
+        self._ensure_thread()
+        self._wakeup.set()
+
+    def _ensure_thread(self):
+        with self._start_lock:
+            # Started lazily so each gunicorn worker gets its own thread
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        from app.extensions import db
+
+        interval = self.app.config.get(self.interval_key, self.default_interval)
+        while not self._stopping:
+            self._wakeup.wait(interval)
+            self._wakeup.clear()
+            with self.app.app_context():
+                try:
+                    self.drain()
+                except Exception:
+                    db.session.rollback()
+                    self.log.exception(f"{self.name} crashed")
+                finally:
+                    db.session.remove()
+
+    def run_forever(self):
+        """Blocking delivery loop for a dedicated worker process (CLI)."""
+        self._loop()
+
+    def stop(self):
+        self._stopping = True
+        self._wakeup.set()
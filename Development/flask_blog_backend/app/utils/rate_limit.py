@@ -0,0 +1,230 @@
+# app/utils/rate_limit.py
+"""
+Token-bucket rate limiting for the endpoints bots like to hammer: login,
+registration, password-reset requests and the contact form.
+
+    @bp.route("/login", methods=["POST"])
+    @rate_limited("login", account=json_field("email"))
+    def login(): ...
+
+Each limit in RATE_LIMITS has one bucket per client IP and, when the view
+names an `account` (e.g. the email in the body), one per account, so
+neither rotating addresses nor rotating victims gets around it. A bucket
+holds `burst` tokens and refills completely over `period` seconds; a
+request takes one token from each of its buckets and is answered 429
+with Retry-After when one is empty. Account values are hashed before
+they become keys, so the store holds no addresses.
+
+RATE_LIMIT_BACKEND selects the store:
+- "redis" (RATE_LIMIT_URL): shared by every gunicorn worker and replica;
+  each take is one atomic script run, on the Redis server's clock. Takes
+  any client exposing `eval`, so tests hand in a local stand-in.
+- "memory": per process; fine for a single-process server.
+- "off".
+
+If the shared store is unreachable, requests are let through (logged):
+the limiter must not become the outage. RATE_LIMIT_ENABLED = False turns
+checks off without touching the backend (tests).
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, has_app_context, jsonify, request
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BUCKETS = 50000
+
+# Refill `tokens` (taken at `updated`) at `rate` per second up to `burst`,
+# then take `cost`. Returns (allowed, tokens left, seconds until allowed).
+TOKEN_BUCKET_SCRIPT = """
+local burst = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((burst - tokens) / rate * 1000) + 1000)
+return {allowed, tostring(tokens), tostring(wait)}
+"""
+
+
+def take_token(tokens, updated, now, burst, rate, cost=1):
+    """
+    The bucket arithmetic of TOKEN_BUCKET_SCRIPT, for the memory backend:
+    (allowed, tokens left, seconds until `cost` tokens are available).
+    `tokens`/`updated` are None for a bucket seen for the first time.
+    """
+    if tokens is None:
+        tokens, updated = burst, now
+    tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+    if tokens >= cost:
+        return True, tokens - cost, 0.0
+    return False, tokens, (cost - tokens) / rate
+
+
+# ---------------------------------------------------------------------------
+# Backends
+# ---------------------------------------------------------------------------
+class MemoryBackend:
+    """Per-process buckets, least recently used dropped past `max_buckets`."""
+
+    def __init__(self, max_buckets=DEFAULT_MAX_BUCKETS, clock=time.monotonic):
+        self.max_buckets = max_buckets
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()  # key -> (tokens, updated)
+
+    def take(self, key, burst, rate, cost=1):
+        with self._lock:
+            now = self.clock()
+            tokens, updated = self._buckets.get(key, (None, None))
+            allowed, tokens, wait = take_token(tokens, updated, now, burst, rate, cost)
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+            return allowed, wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class RedisBackend:
+    """Buckets as Redis hashes, updated atomically by TOKEN_BUCKET_SCRIPT."""
+
+    def __init__(self, client, prefix="ratelimit:"):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("The redis rate-limit backend requires the 'redis' package") from e
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def take(self, key, burst, rate, cost=1):
+        allowed, _tokens, wait = self.client.eval(
+            TOKEN_BUCKET_SCRIPT, 1, self.prefix + key, burst, rate, cost
+        )
+        return bool(int(allowed)), float(wait)
+
+    def clear(self):
+        # Buckets expire once they would be full again
+        pass
+
+
+# ---------------------------------------------------------------------------
+# Limiter
+# ---------------------------------------------------------------------------
+class RateLimiter:
+    def __init__(self, backend, limits):
+        self.backend = backend
+        self.limits = limits
+
+    def check(self, name, ip, account=None):
+        """
+        Take a token from each bucket of limit `name`; returns None when the
+        request may go ahead, else the seconds to wait before retrying.
+        """
+        buckets = [("ip", ip)]
+        if account:
+            digest = hashlib.sha256(str(account).strip().lower().encode()).hexdigest()[:32]
+            buckets.append(("account", digest))
+
+        for kind, value in buckets:
+            rule = self.limits.get(name, {}).get(kind)
+            if rule is None:
+                continue
+            burst, period = rule
+            allowed, wait = self.backend.take(f"{name}:{kind}:{value}", burst, burst / period)
+            if not allowed:
+                return max(1, math.ceil(wait))
+        return None
+
+
+def init_app(app, backend=None):
+    """Attach a RateLimiter to `app` unless RATE_LIMIT_BACKEND is "off"."""
+    if backend is None:
+        name = app.config.get("RATE_LIMIT_BACKEND", "memory")
+        if name == "redis":
+            backend = RedisBackend.from_url(app.config["RATE_LIMIT_URL"])
+        elif name == "memory":
+            backend = MemoryBackend(app.config.get("RATE_LIMIT_MAX_BUCKETS", DEFAULT_MAX_BUCKETS))
+        else:
+            app.extensions.pop("rate_limiter", None)
+            return None
+    limiter = RateLimiter(backend, app.config.get("RATE_LIMITS", {}))
+    app.extensions["rate_limiter"] = limiter
+    return limiter
+
+
+def get_limiter():
+    if not has_app_context():
+        return None
+    return current_app.extensions.get("rate_limiter")
+
+
+# ---------------------------------------------------------------------------
+# Decorator and account extractors
+# ---------------------------------------------------------------------------
+def json_field(field):
+    """Account extractor: `field` of the JSON body."""
+    def extract():
+        data = request.get_json(silent=True)
+        return data.get(field) if isinstance(data, dict) else None
+    return extract
+
+
+def form_field(field):
+    """Account extractor: `field` of the form body."""
+    return lambda: request.form.get(field)
+
+
+def rate_limited(name, account=None):
+    """
+    Throttle the view with limit `name` from RATE_LIMITS, per client IP and
+    per `account()` when given. Stack it above `role_required` to count
+    rejected callers too, below it to count only authorized ones.
+    """
+    def wrapper(fn):
+        @wraps(fn)
+        def decorator(*args, **kwargs):
+            limiter = get_limiter()
+            if limiter is None or not current_app.config.get("RATE_LIMIT_ENABLED", True):
+                return fn(*args, **kwargs)
+
+            key = account() if account else None
+            try:
+                retry_after = limiter.check(name, request.remote_addr or "unknown", key)
+            except Exception as e:
+                logger.warning(f"Rate limiter unavailable, letting {request.path} through: {e}")
+                retry_after = None
+
+            if retry_after is not None:
+                return jsonify({"msg": "Too many requests, please try again later"}), 429, {
+                    "Retry-After": str(retry_after)
+                }
+            return fn(*args, **kwargs)
+        return decorator
+    return wrapper
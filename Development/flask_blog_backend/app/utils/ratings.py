@@ -0,0 +1,50 @@
+# app/utils/ratings.py
+
+MAX_BULK_RATINGS = 50
+
+
+def parse_rating_value(value):
+    """Return the rating as an int in 1-5, or None if it is not one."""
+    if isinstance(value, bool):
+        return None
+    try:
+        value_int = int(value)
+    except (TypeError, ValueError):
+        return None
+    return value_int if 1 <= value_int <= 5 else None
+
+
+def parse_bulk_ratings(data, id_key):
+    """Parse {"ratings": [{<id_key>: id, "value": v}, ...]} into {id: value}.
+
+    Returns (ratings, error_message). A later entry for the same id wins.
+    """
+    items = data.get("ratings")
+    if not isinstance(items, list) or not items:
+        return None, "ratings must be a non-empty list"
+    if len(items) > MAX_BULK_RATINGS:
+        return None, f"At most {MAX_BULK_RATINGS} ratings can be sent at once"
+
+    ratings = {}
+    for item in items:
+        if not isinstance(item, dict):
+            return None, f"Each rating needs {id_key} and value"
+        try:
+            item_id = int(item.get(id_key))
+        except (TypeError, ValueError):
+            return None, f"Invalid {id_key}"
+        value = parse_rating_value(item.get("value"))
+        if value is None:
+            return None, "Rating must be an integer between 1 and 5"
+        ratings[item_id] = value
+    return ratings, None
+
+
+def rating_result(item_key, item_id, row):
+    """Serialize one row returned by PostRating/CommentRating.upsert_many()."""
+    return {
+        item_key: item_id,
+        "user_rating": row["new_value"],
+        "rating": float(row["average"]) if row["average"] is not None else None,
+        "rating_count": row["rating_count"],
+    }
@@ -0,0 +1,297 @@
+# app/utils/response_cache.py
+"""
+Response cache for anonymous requests to public GET endpoints.
+
+Views opt in with `@cache_anonymous(tags)`. A request that carries no
+Authorization header is answered from the cache when possible; otherwise the
+view runs and a 200 response is stored under the request path plus its
+normalized query args.
+
+Invalidation is tag based. Every stored response remembers the version of
+each tag it depends on ("feed", "post:<id>", "category:<id>", "categories");
+a write bumps the versions of the tags it touches, which makes every
+dependent entry stale at once. Writes are picked up automatically from the
+ORM flush (posts, images, comments, categories) and explicitly through
+`invalidate_on_commit()` for statements that bypass the ORM (rating
+upserts). Tags are only bumped once the transaction commits.
+
+Under @conditional_get the entry also records the ETag computed for the
+request, and is only served while that ETag still matches: a change the
+tags miss (e.g. a Core UPDATE) then cannot go out under a fresh ETag.
+
+Backends (also used by utils/session_cache.py, where tag versions double
+as shared counters):
+- MemoryBackend: per-process LRU (default). Tag versions are per process
+  too, so a write only invalidates the worker that handled it; init_app
+  warns when WEB_CONCURRENCY says more than one worker runs.
+- RedisBackend: shared store, so every worker sees the same entries and
+  tag versions. Takes any client exposing get/set/mget/incr, which lets
+  tests hand in a local stand-in instead of a Redis server.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+DEFAULT_TTL = 60
+DEFAULT_MAX_ENTRIES = 2048
+
+
+# ---------------------------------------------------------------------------
+# Backends
+# ---------------------------------------------------------------------------
+class MemoryBackend:
+    """Per-process LRU with a TTL per entry; tag versions live in a dict."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()    # key -> (entry, expires_at)
+        self._versions = {}              # tag -> version
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            entry, expires_at = item
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry, ttl):
+        with self._lock:
+            self._entries[key] = (entry, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def versions(self, tags):
+        with self._lock:
+            return {tag: self._versions.get(tag, 0) for tag in tags}
+
+    def bump(self, tags, amount=1):
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + amount
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisBackend:
+    """
+    Shared backend over a Redis-compatible client.
+
+    Entries are stored as JSON with a Redis TTL; tag versions are plain
+    counters (INCR), read back with a single MGET. Takes any client exposing
+    get/set/delete/mget/incr.
+    """
+
+    def __init__(self, client, prefix="respcache:"):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("The redis cache backend requires the 'redis' package") from e
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + "entry:" + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, entry, ttl):
+        self.client.set(self.prefix + "entry:" + key, json.dumps(entry), ex=ttl)
+
+    def versions(self, tags):
+        tags = list(tags)
+        if not tags:
+            return {}
+        values = self.client.mget([self.prefix + "tag:" + tag for tag in tags])
+        return {tag: int(value or 0) for tag, value in zip(tags, values)}
+
+    def bump(self, tags, amount=1):
+        for tag in tags:
+            self.client.incr(self.prefix + "tag:" + tag, amount)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + "entry:" + key)
+
+    def clear(self):
+        # Entries expire on their own; bumping tags is the way to drop them early
+        pass
+
+
+# ---------------------------------------------------------------------------
+# Cache
+# ---------------------------------------------------------------------------
+class ResponseCache:
+    def __init__(self, backend, ttl=DEFAULT_TTL):
+        self.backend = backend
+        self.ttl = ttl
+
+    def lookup(self, key, etag=None):
+        """
+        The cached entry for `key`, or None when missing, invalidated or
+        stored under another ETag than `etag`.
+        """
+        entry = self.backend.get(key)
+        if entry is None or entry.get("etag") != etag:
+            return None
+        if self.backend.versions(entry["tags"]) != entry["tags"]:
+            return None
+        return entry
+
+    def store(self, key, response, versions, etag=None):
+        """
+        Store `response` with the tag versions read before the view ran, so
+        a write that commits while the view is running leaves a stale
+        snapshot behind and the entry is never served.
+        """
+        entry = {
+            "status": response.status_code,
+            "mimetype": response.mimetype,
+            "body": response.get_data(as_text=True),
+            "tags": versions,
+            "etag": etag,
+        }
+        self.backend.set(key, entry, self.ttl)
+
+    def invalidate(self, *tags):
+        if tags:
+            self.backend.bump(set(tags))
+
+
+def init_app(app, backend=None):
+    """Attach a ResponseCache to `app` (backend from config unless given)."""
+    if backend is None:
+        name = app.config.get("RESPONSE_CACHE_BACKEND", "memory")
+        if name == "redis":
+            backend = RedisBackend.from_url(app.config["RESPONSE_CACHE_URL"])
+        else:
+            backend = MemoryBackend(app.config.get("RESPONSE_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+            if app.config.get("WEB_CONCURRENCY", 1) > 1:
+                app.logger.warning(
+                    "RESPONSE_CACHE_BACKEND=memory with %s workers: each worker only sees its own "
+                    "invalidations and serves stale responses until the TTL; use redis",
+                    app.config["WEB_CONCURRENCY"],
+                )
+    cache = ResponseCache(backend, ttl=app.config.get("RESPONSE_CACHE_TTL", DEFAULT_TTL))
+    app.extensions["response_cache"] = cache
+    return cache
+
+
+def get_cache():
+    if not has_app_context():
+        return None
+    return current_app.extensions.get("response_cache")
+
+
+def cache_key(path, args):
+    """Path plus query args, sorted so ?a=1&b=2 and ?b=2&a=1 share an entry."""
+    items = sorted((k, v.strip()) for k, v in args.items(multi=True))
+    query = "&".join(f"{k}={v}" for k, v in items if v != "")
+    return f"{path}?{query}"
+
+
+def add_tags(*tags):
+    """Let a cached view declare tags that are only known once it has run."""
+    g.setdefault("response_cache_tags", set()).update(tags)
+
+
+def cache_anonymous(tags):
+    """
+    Cache the view's 200 responses for requests without a JWT.
+
+    tags: list of tags, or a callable taking the view kwargs and returning one.
+    """
+    def wrapper(fn):
+        @wraps(fn)
+        def decorator(*args, **kwargs):
+            cache = get_cache()
+            if (
+                cache is None
+                or not current_app.config.get("RESPONSE_CACHE_ENABLED", True)
+                or request.headers.get("Authorization")
+            ):
+                return fn(*args, **kwargs)
+
+            key = cache_key(request.path, request.args)
+            etag = g.pop("conditional_etag", None)
+            entry = cache.lookup(key, etag)
+            if entry is not None:
+                response = current_app.response_class(
+                    entry["body"], status=entry["status"], mimetype=entry["mimetype"]
+                )
+                response.headers["X-Cache"] = "HIT"
+                return response
+
+            base_tags = tags(**kwargs) if callable(tags) else tags
+            versions = cache.backend.versions(base_tags)
+            response = current_app.make_response(fn(*args, **kwargs))
+            if response.status_code == 200:
+                extra = g.pop("response_cache_tags", set()) - set(versions)
+                versions.update(cache.backend.versions(extra))
+                cache.store(key, response, versions, etag)
+            response.headers["X-Cache"] = "MISS"
+            return response
+        return decorator
+    return wrapper
+
+
+# ---------------------------------------------------------------------------
+# Write tracking: collect tags from the flushed objects (and explicit
+# invalidate_on_commit() calls) and bump them once the transaction commits.
+# ---------------------------------------------------------------------------
+def invalidate_on_commit(*tags, session=None):
+    """Bump `tags` when the current transaction commits."""
+    from app.extensions import db
+    session = session or db.session()
+    session.info.setdefault("response_cache_tags", set()).update(tags)
+
+
+def _tags_for(obj):
+    table = inspect(obj).mapper.local_table.name
+    if table == "post":
+        return {"feed", f"post:{obj.id}"}
+    if table in ("comment", "image"):
+        return {f"post:{obj.post_id}"} if obj.post_id else set()
+    if table == "category":
+        return {"feed", "categories", f"category:{obj.id}"}
+    return set()
+
+
+@event.listens_for(Session, "after_flush")
+def _track_writes(session, flush_context):
+    tags = session.info.setdefault("response_cache_tags", set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        tags.update(_tags_for(obj))
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    tags = session.info.pop("response_cache_tags", None)
+    cache = get_cache()
+    if tags and cache is not None:
+        cache.invalidate(*tags)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_after_rollback(session, previous_transaction):
+    session.info.pop("response_cache_tags", None)
@@ -0,0 +1,76 @@
+# app/utils/search.py
+from sqlalchemy import func, literal_column, or_
+
+from app.extensions import db
+from app.models.post import Post, SEARCH_CONFIG
+
+HEADLINE_OPTIONS = "MaxWords=35, MinWords=15, ShortWord=3, MaxFragments=2, FragmentDelimiter=\" … \""
+
+_config = literal_column(f"'{SEARCH_CONFIG}'::regconfig")
+
+
+def ts_query(q):
+    """Parse user input with web-search syntax ("quoted phrases", -exclude, or)."""
+    return func.websearch_to_tsquery(_config, q)
+
+
+def matches(q):
+    """Filter clause served by the GIN index on Post.search_vector."""
+    return Post.search_vector.bool_op("@@")(ts_query(q))
+
+
+def rank(q):
+    """Relevance of a post for `q`, honouring the A/B/C weights of the vector."""
+    return func.ts_rank_cd(Post.search_vector, ts_query(q))
+
+
+def snippets(post_ids, q):
+    """
+    Return {post_id: highlighted snippet} for one page of results.
+
+    ts_headline re-parses the document, so it runs only for the ids on the
+    page being returned, in one query.
+    """
+    if not post_ids:
+        return {}
+    plain_content = func.regexp_replace(Post.content, "<[^>]*>", " ", "g")
+    rows = (
+        db.session.query(
+            Post.id,
+            func.ts_headline(_config, plain_content, ts_query(q), HEADLINE_OPTIONS)
+        )
+        .filter(Post.id.in_(post_ids))
+        .all()
+    )
+    return dict(rows)
+
+
+# ---------------------------------------------------------------------------
+# Substring lookups (admin screens)
+#
+# username/email, contact message fields and rejected titles carry pg_trgm
+# GIN indexes (gin_trgm_ops), which serve ILIKE patterns directly. Going
+# through these helpers keeps every such lookup in a shape the planner can
+# answer from those indexes, and escapes LIKE wildcards typed by the user.
+# ---------------------------------------------------------------------------
+LIKE_ESCAPE = "\\"
+
+
+def escape_like(value):
+    """Escape %, _ and the escape character so user input matches literally."""
+    return (
+        value.replace(LIKE_ESCAPE, LIKE_ESCAPE * 2)
+        .replace("%", LIKE_ESCAPE + "%")
+        .replace("_", LIKE_ESCAPE + "_")
+    )
+
+
+def contains(term, *columns):
+    """Case-insensitive substring match of `term` in any of `columns`."""
+    pattern = f"%{escape_like(term)}%"
+    return or_(*[column.ilike(pattern, escape=LIKE_ESCAPE) for column in columns])
+
+
+def iequals(column, value):
+    """Case-insensitive equality that can still use the column's trigram index."""
+    return column.ilike(escape_like(value), escape=LIKE_ESCAPE)
@@ -0,0 +1,145 @@
+# app/utils/session_cache.py
+"""
+Shared cache of the session state the JWT loaders check on every request.
+
+The blocklist check and the user lookup (app/utils/identity.py) only need
+three columns of the user row: session_token (revocation), is_blocked and
+role. They are cached per user id for SESSION_CACHE_TTL seconds in a store
+shared by all gunicorn workers, so letting an authenticated request in no
+longer costs a PostgreSQL query. Handlers that need the full row still load
+it through identity.get_current_user().
+
+Revocation stays immediate: every write that changes one of these columns
+(password reset, logout, block/unblock, role change, deletion, a first
+session_token on Google login) calls `invalidate_on_commit(user_id)`. Once
+the transaction commits, the entry is deleted and the user's version bumped.
+Entries are stored with the version read before the row was loaded and are
+only served while it still matches, so a request that read the old row just
+before the commit can't put stale state back.
+
+SESSION_CACHE_BACKEND selects the store, using the response cache's backends
+(app/utils/response_cache.py): "redis" (SESSION_CACHE_URL, shared by every
+worker), "memory" (per process; only for a single-process server, since an
+invalidation doesn't reach other workers) or "off". Hits, misses and
+invalidations are counted in the store; `flask session-cache-stats` prints
+them.
+"""
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.utils.response_cache import MemoryBackend, RedisBackend
+
+DEFAULT_TTL = 30
+DEFAULT_MAX_ENTRIES = 10000
+COUNTERS = ("hits", "misses", "invalidations")
+
+
+class SessionState:
+    """The slice of a User row needed to authorize a request."""
+
+    __slots__ = ("user_id", "session_token", "is_blocked", "role")
+
+    def __init__(self, user_id, session_token, is_blocked, role):
+        self.user_id = user_id
+        self.session_token = session_token
+        self.is_blocked = is_blocked
+        self.role = role
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.session_token, bool(user.is_blocked), user.role)
+
+    def __repr__(self):
+        return f"<SessionState {self.user_id} {self.role}{' blocked' if self.is_blocked else ''}>"
+
+
+class SessionCache:
+    def __init__(self, backend, ttl=DEFAULT_TTL):
+        self.backend = backend
+        self.ttl = ttl
+
+    @staticmethod
+    def _key(user_id):
+        return f"user:{user_id}"
+
+    def version(self, user_id):
+        """Current version of the user's entry; read it before loading the row."""
+        key = self._key(user_id)
+        return self.backend.versions([key])[key]
+
+    def lookup(self, user_id):
+        """The cached SessionState, or None when missing, expired or invalidated."""
+        entry = self.backend.get(self._key(user_id))
+        if entry is not None and entry["version"] == self.version(user_id):
+            self.backend.bump(["stat:hits"])
+            return SessionState(user_id, entry["session_token"], entry["is_blocked"], entry["role"])
+        self.backend.bump(["stat:misses"])
+        return None
+
+    def store(self, state, version):
+        entry = {
+            "session_token": state.session_token,
+            "is_blocked": state.is_blocked,
+            "role": state.role,
+            "version": version,
+        }
+        self.backend.set(self._key(state.user_id), entry, self.ttl)
+
+    def invalidate(self, *user_ids):
+        keys = {self._key(user_id) for user_id in user_ids}
+        if not keys:
+            return
+        self.backend.bump(keys)
+        for key in keys:
+            self.backend.delete(key)
+        self.backend.bump(["stat:invalidations"], len(keys))
+
+    def stats(self):
+        versions = self.backend.versions([f"stat:{name}" for name in COUNTERS])
+        return {name: versions[f"stat:{name}"] for name in COUNTERS}
+
+
+def init_app(app, backend=None):
+    """Attach a SessionCache to `app` unless SESSION_CACHE_BACKEND is "off"."""
+    if backend is None:
+        name = app.config.get("SESSION_CACHE_BACKEND", "off")
+        if name == "redis":
+            backend = RedisBackend.from_url(app.config["SESSION_CACHE_URL"], prefix="sesscache:")
+        elif name == "memory":
+            backend = MemoryBackend(app.config.get("SESSION_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+        else:
+            app.extensions.pop("session_cache", None)
+            return None
+    cache = SessionCache(backend, ttl=app.config.get("SESSION_CACHE_TTL", DEFAULT_TTL))
+    app.extensions["session_cache"] = cache
+    return cache
+
+
+def get_cache():
+    if not has_app_context():
+        return None
+    return current_app.extensions.get("session_cache")
+
+
+# ---------------------------------------------------------------------------
+# Invalidation: collected on the session, pushed once the transaction commits
+# ---------------------------------------------------------------------------
+def invalidate_on_commit(*user_ids, session=None):
+    """Drop the cached session state of `user_ids` when the transaction commits."""
+    from app.extensions import db
+    session = session or db.session()
+    session.info.setdefault("session_cache_users", set()).update(user_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    user_ids = session.info.pop("session_cache_users", None)
+    cache = get_cache()
+    if user_ids and cache is not None:
+        cache.invalidate(*user_ids)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_after_rollback(session, previous_transaction):
+    session.info.pop("session_cache_users", None)
@@ -0,0 +1,107 @@
+# benchmark_cartoonize.py
+"""
+Benchmark of the profile-picture cartoonize pipeline.
+
+    python benchmark_cartoonize.py [--repeat 5] [images...]
+
+Runs the previous pipeline (temp file + cv2.imread, bilateral filter on
+full-resolution pixels) and the current one (cv2.imdecode on the buffer,
+downscale to the avatar size first, encode once) over the sample uploads
+in app/static/uploads by default, and prints ms/image and peak RSS for each.
+Each pipeline runs in its own child process so the peak RSS figures don't
+bleed into each other.
+"""
+import argparse
+import glob
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+import uuid
+
+import cv2
+
+from cartoonize import cartoonize_image
+
+SAMPLE_GLOB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app", "static", "uploads", "*", "*.jpg")
+
+
+def legacy_cartoonize(data):
+    """The pipeline as it ran inside /api/auth/register before."""
+    temp_path = os.path.join(tempfile.gettempdir(), f"raw_{uuid.uuid4().hex}.jpg")
+    with open(temp_path, "wb") as fh:
+        fh.write(data)
+    try:
+        img = cv2.imread(temp_path)
+        if img is None:
+            return None
+        smooth = cv2.bilateralFilter(img, 9, 75, 75)
+        gray = cv2.cvtColor(smooth, cv2.COLOR_BGR2GRAY)
+        edges = cv2.adaptiveThreshold(
+            gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C,
+            cv2.THRESH_BINARY, 9, 9
+        )
+        cartoon = cv2.bitwise_and(smooth, smooth, mask=edges)
+        success, buffer = cv2.imencode(".jpg", cartoon)
+        return buffer.tobytes() if success else None
+    finally:
+        os.remove(temp_path)
+
+
+PIPELINES = {
+    "before": legacy_cartoonize,
+    "after": cartoonize_image,
+}
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_pipeline(name, paths, repeat, results):
+    fn = PIPELINES[name]
+    blobs = []
+    for path in paths:
+        with open(path, "rb") as fh:
+            blobs.append(fh.read())
+
+    fn(blobs[0])  # warm up codecs / thread pools
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for data in blobs:
+            fn(data)
+    elapsed = time.perf_counter() - start
+    results[name] = (elapsed * 1000 / (repeat * len(blobs)), peak_rss_mb())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images", nargs="*", help="images to process (default: sample uploads)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    paths = args.images or sorted(glob.glob(SAMPLE_GLOB))
+    if not paths:
+        parser.error("no images found")
+
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Manager() as manager:
+        results = manager.dict()
+        for name in PIPELINES:
+            proc = ctx.Process(target=run_pipeline, args=(name, paths, args.repeat, results))
+            proc.start()
+            proc.join()
+
+        print(f"{len(paths)} images x {args.repeat} runs")
+        print(f"{'pipeline':<10}{'ms/image':>12}{'peak RSS MB':>14}")
+        for name in PIPELINES:
+            ms, rss = results[name]
+            print(f"{name:<10}{ms:>12.1f}{rss:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# cartoonize.py
+"""
+Profile-picture cartoonization, the CPU-bound step of the image worker
+(app/utils/image_worker.py).
+
+Kept outside the `app` package on purpose: the worker's pool processes are
+spawned and import only this module (cv2/numpy), not the Flask app.
+"""
+import os
+
+import cv2
+import numpy as np
+
+# Avatars are displayed at ~200px; keep a little headroom for HiDPI crops
+AVATAR_SIZE = 256
+
+
+def fit_avatar(img, size=AVATAR_SIZE):
+    """Downscale so the longer side is at most `size` px (never upscales)."""
+    height, width = img.shape[:2]
+    scale = size / max(height, width)
+    if scale >= 1:
+        return img
+    new_size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return cv2.resize(img, new_size, interpolation=cv2.INTER_AREA)
+
+
+def cartoonize_image(data, size=AVATAR_SIZE):
+    """
+    Cartoonize an encoded image (bytes, bytearray or memoryview) and return
+    JPEG bytes, or None if it can't be decoded.
+
+    The buffer is decoded in place (np.frombuffer, no copy) and shrunk to
+    the avatar size first, so the bilateral filter - the expensive step -
+    only ever sees ~size x size pixels; the result is encoded once.
+    """
+    buf = np.frombuffer(memoryview(data), dtype=np.uint8)
+    if buf.size == 0:
+        return None
+    img = cv2.imdecode(buf, cv2.IMREAD_COLOR)
+    if img is None:
+        return None
+
+    img = fit_avatar(img, size)
+    smooth = cv2.bilateralFilter(img, 9, 75, 75)
+    gray = cv2.cvtColor(smooth, cv2.COLOR_BGR2GRAY)
+    edges = cv2.adaptiveThreshold(
+        gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C,
+        cv2.THRESH_BINARY, 9, 9
+    )
+    cartoon = cv2.bitwise_and(smooth, smooth, mask=edges)
+
+    success, buffer = cv2.imencode(".jpg", cartoon, [cv2.IMWRITE_JPEG_QUALITY, 85])
+    if not success:
+        return None
+    return buffer.tobytes()
+
+
+def cartoonize_file(source, target, size=AVATAR_SIZE):
+    """Write the cartoon of `source` to `target`; False if it can't be decoded."""
+    with open(source, "rb") as fh:
+        data = fh.read()
+    cartoon = cartoonize_image(data, size)
+    if cartoon is None:
+        return False
+    tmp = f"{target}.tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(cartoon)
+    os.replace(tmp, target)
+    return True
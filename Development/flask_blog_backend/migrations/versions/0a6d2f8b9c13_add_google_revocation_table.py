@@ -0,0 +1,38 @@
+"""add google_revocation table
+
+Revision ID: 0a6d2f8b9c13
+Revises: f5a8c3e1d742
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0a6d2f8b9c13'
+down_revision = 'f5a8c3e1d742'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'google_revocation',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('token', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('revoked_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_google_revocation_due', 'google_revocation', ['status', 'next_attempt_at'])
+
+
+def downgrade():
+    op.drop_index('ix_google_revocation_due', table_name='google_revocation')
+    op.drop_table('google_revocation')
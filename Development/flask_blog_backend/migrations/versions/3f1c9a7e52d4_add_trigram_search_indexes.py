@@ -0,0 +1,56 @@
+"""add trigram search indexes
+
+Revision ID: 3f1c9a7e52d4
+Revises: 9e4c1b7a2d38
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c9a7e52d4'
+down_revision = '9e4c1b7a2d38'
+branch_labels = None
+depends_on = None
+
+
+# (index name, table, column) - gin_trgm_ops indexes serving ILIKE '%term%'
+TRGM_INDEXES = [
+    ('ix_users_username_trgm', 'users', 'username'),
+    ('ix_users_email_trgm', 'users', 'email'),
+    ('ix_contact_message_email_trgm', 'contact_message', 'email'),
+    ('ix_contact_message_subject_trgm', 'contact_message', 'subject'),
+    ('ix_contact_message_message_trgm', 'contact_message', 'message'),
+    ('ix_rejected_requests_title_trgm', 'rejected_requests', 'title'),
+]
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+    # CONCURRENTLY cannot run inside a transaction; build the indexes without
+    # holding a write lock on users/contact_message while they fill.
+    with op.get_context().autocommit_block():
+        for name, table, column in TRGM_INDEXES:
+            op.create_index(
+                name,
+                table,
+                [column],
+                unique=False,
+                postgresql_using='gin',
+                postgresql_ops={column: 'gin_trgm_ops'},
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _column in reversed(TRGM_INDEXES):
+            op.drop_index(
+                name,
+                table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
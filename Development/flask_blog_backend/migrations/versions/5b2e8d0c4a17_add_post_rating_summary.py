@@ -0,0 +1,57 @@
+"""add post_rating_summary and backfill it from post_rating
+
+Revision ID: 5b2e8d0c4a17
+Revises: 
+Create Date: 2026-10-17 08:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b2e8d0c4a17'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+# Same aggregate as PostRatingSummary.rebuild()
+BACKFILL_SQL = """
+INSERT INTO post_rating_summary
+    (post_id, rating_count, rating_sum,
+     count_1, count_2, count_3, count_4, count_5, average)
+SELECT post_id, count(*), sum(value),
+       count(*) FILTER (WHERE value = 1),
+       count(*) FILTER (WHERE value = 2),
+       count(*) FILTER (WHERE value = 3),
+       count(*) FILTER (WHERE value = 4),
+       count(*) FILTER (WHERE value = 5),
+       round(avg(value), 2)
+FROM post_rating
+GROUP BY post_id
+"""
+
+
+def upgrade():
+    op.create_table(
+        'post_rating_summary',
+        sa.Column('post_id', sa.Integer(), nullable=False),
+        sa.Column('rating_count', sa.Integer(), nullable=False),
+        sa.Column('rating_sum', sa.Integer(), nullable=False),
+        sa.Column('count_1', sa.Integer(), nullable=False),
+        sa.Column('count_2', sa.Integer(), nullable=False),
+        sa.Column('count_3', sa.Integer(), nullable=False),
+        sa.Column('count_4', sa.Integer(), nullable=False),
+        sa.Column('count_5', sa.Integer(), nullable=False),
+        sa.Column('average', sa.Numeric(precision=4, scale=2), nullable=True),
+        sa.ForeignKeyConstraint(['post_id'], ['post.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('post_id'),
+    )
+    op.create_index('ix_post_rating_summary_average', 'post_rating_summary', ['average'])
+    op.execute(BACKFILL_SQL)
+
+
+def downgrade():
+    op.drop_index('ix_post_rating_summary_average', table_name='post_rating_summary')
+    op.drop_table('post_rating_summary')
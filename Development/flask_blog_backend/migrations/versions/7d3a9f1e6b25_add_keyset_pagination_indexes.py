@@ -0,0 +1,49 @@
+"""add keyset pagination indexes for the feed and comment lists
+
+Revision ID: 7d3a9f1e6b25
+Revises: 5b2e8d0c4a17
+Create Date: 2026-10-17 08:30:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '7d3a9f1e6b25'
+down_revision = '5b2e8d0c4a17'
+branch_labels = None
+depends_on = None
+
+
+# (index name, table, columns) - match the (created_at, id) cursors of
+# utils/pagination.py
+KEYSET_INDEXES = [
+    ('ix_post_published_created_id', 'post', ['is_published', 'created_at', 'id']),
+    ('ix_comment_post_created_id', 'comment', ['post_id', 'created_at', 'id']),
+]
+
+
+def upgrade():
+    # CONCURRENTLY cannot run inside a transaction; build the indexes without
+    # blocking writes to post/comment while they fill.
+    with op.get_context().autocommit_block():
+        for name, table, columns in KEYSET_INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=False,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _columns in reversed(KEYSET_INDEXES):
+            op.drop_index(
+                name,
+                table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
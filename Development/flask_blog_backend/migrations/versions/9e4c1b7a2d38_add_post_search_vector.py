@@ -0,0 +1,64 @@
+"""add post.search_vector with its GIN index and backfill it
+
+Revision ID: 9e4c1b7a2d38
+Revises: 7d3a9f1e6b25
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '9e4c1b7a2d38'
+down_revision = '7d3a9f1e6b25'
+branch_labels = None
+depends_on = None
+
+# The document as defined when this revision was written (title A, content
+# B, author and categories C); kept here so later model edits leave the
+# history replayable.
+BACKFILL_SQL = """
+UPDATE post p SET search_vector =
+    setweight(to_tsvector('english', coalesce(p.title, '')), 'A') ||
+    setweight(to_tsvector('english',
+        regexp_replace(coalesce(p.content, ''), '<[^>]*>', ' ', 'g')), 'B') ||
+    setweight(to_tsvector('simple', coalesce(u.username, '')), 'C') ||
+    setweight(to_tsvector('english', coalesce((
+        SELECT string_agg(c.name, ' ')
+        FROM post_categories pc
+        JOIN category c ON c.id = pc.category_id
+        WHERE pc.post_id = p.id
+    ), '')), 'C')
+FROM users u
+WHERE u.id = p.author_id
+"""
+
+
+def upgrade():
+    op.add_column('post', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+    # Fill before indexing: one GIN build instead of per-row index updates
+    op.execute(BACKFILL_SQL)
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_post_search_vector',
+            'post',
+            ['search_vector'],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_post_search_vector',
+            table_name='post',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+    op.drop_column('post', 'search_vector')
@@ -0,0 +1,40 @@
+"""add updated_at columns for conditional GET
+
+Revision ID: b7d2e4c81a90
+Revises: 3f1c9a7e52d4
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d2e4c81a90'
+down_revision = '3f1c9a7e52d4'
+branch_labels = None
+depends_on = None
+
+
+# (table, timezone-aware) - matches each table's created_at column
+UPDATED_AT_TABLES = [
+    ('post', False),
+    ('comment', False),
+    ('category', True),
+    ('post_rating_summary', True),
+]
+
+
+def upgrade():
+    for table, with_tz in UPDATED_AT_TABLES:
+        op.add_column(table, sa.Column(
+            'updated_at',
+            sa.DateTime(timezone=with_tz),
+            nullable=False,
+            server_default=sa.func.now(),
+        ))
+
+
+def downgrade():
+    for table, _with_tz in reversed(UPDATED_AT_TABLES):
+        op.drop_column(table, 'updated_at')
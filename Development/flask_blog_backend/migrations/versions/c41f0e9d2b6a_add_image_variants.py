@@ -0,0 +1,33 @@
+"""add responsive image variant columns
+
+Revision ID: c41f0e9d2b6a
+Revises: b7d2e4c81a90
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41f0e9d2b6a'
+down_revision = 'b7d2e4c81a90'
+branch_labels = None
+depends_on = None
+
+
+# Existing uploads are backfilled with `flask generate-image-variants`
+VARIANT_COLUMNS = [
+    ('image', 'variants'),
+    ('category', 'image_variants'),
+]
+
+
+def upgrade():
+    for table, column in VARIANT_COLUMNS:
+        op.add_column(table, sa.Column(column, sa.JSON(), nullable=True))
+
+
+def downgrade():
+    for table, column in reversed(VARIANT_COLUMNS):
+        op.drop_column(table, column)
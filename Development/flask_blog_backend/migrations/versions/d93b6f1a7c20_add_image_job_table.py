@@ -0,0 +1,41 @@
+"""add image_job table for background cartoonization
+
+Revision ID: d93b6f1a7c20
+Revises: c41f0e9d2b6a
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd93b6f1a7c20'
+down_revision = 'c41f0e9d2b6a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'image_job',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=30), nullable=False),
+        sa.Column('source_path', sa.String(length=1024), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_image_job_user_id', 'image_job', ['user_id'])
+    op.create_index('ix_image_job_status', 'image_job', ['status'])
+
+
+def downgrade():
+    op.drop_index('ix_image_job_status', table_name='image_job')
+    op.drop_index('ix_image_job_user_id', table_name='image_job')
+    op.drop_table('image_job')
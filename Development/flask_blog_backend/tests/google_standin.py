@@ -0,0 +1,171 @@
+"""
+Local stand-in for Google's OAuth token endpoint and JWKS, for exercising
+the Google sign-in flow offline.
+
+    python -m tests.google_standin --port 8026
+    GOOGLE_TOKEN_URL=http://localhost:8026/token \\
+    GOOGLE_JWKS_URL=http://localhost:8026/certs flask run
+
+Signs id_tokens with its own RSA key and publishes that key:
+
+- POST /token:  any code is accepted; returns access/refresh tokens and an
+                id_token for `profile` (email, name, picture), issued by
+                accounts.google.com for `client_id` (or `token_status`
+                as an error, to simulate an outage);
+- GET /certs:   the JWKS, with Cache-Control max-age=`max_age`;
+- POST /revoke: answers `revoke_status` after sleeping `revoke_delay`
+                seconds; accepted tokens are kept in `revoked`.
+
+`hits` counts requests per path and `connections` the TCP connections, so
+tests can check that the JWKS is cached and the HTTP session is pooled.
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jwt.algorithms import RSAAlgorithm
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like Google
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, payload, status=200, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        server.count(self.path)
+        if self.path == "/certs":
+            self.send_json({"keys": [server.jwk]},
+                           headers={"Cache-Control": f"public, max-age={server.max_age}"})
+        else:
+            self.send_json({"error": "not_found"}, status=404)
+
+    def do_POST(self):
+        server = self.server
+        server.count(self.path)
+        length = int(self.headers.get("Content-Length", 0))
+        form = parse_qs(self.rfile.read(length).decode())
+        if self.path == "/revoke":
+            if server.revoke_delay:
+                time.sleep(server.revoke_delay)
+            if server.revoke_status == 200:
+                with server.lock:
+                    server.revoked.extend(form.get("token", []))
+                self.send_json({})
+            else:
+                self.send_json({"error": "backend_error"}, status=server.revoke_status)
+        elif self.path != "/token":
+            self.send_json({"error": "not_found"}, status=404)
+        elif server.token_status != 200:
+            self.send_json({"error": "backend_error"}, status=server.token_status)
+        elif not form.get("code"):
+            self.send_json({"error": "invalid_grant"}, status=400)
+        else:
+            self.send_json({
+                "access_token": f"ya29.{uuid.uuid4().hex}",
+                "refresh_token": f"1//{uuid.uuid4().hex}",
+                "expires_in": 3599,
+                "token_type": "Bearer",
+                "id_token": server.id_token(),
+            })
+
+
+class GoogleStandIn(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=0, client_id="standin-client-id", max_age=3600):
+        super().__init__((host, port), _Handler)
+        self.lock = threading.Lock()
+        self.hits = {}
+        self.connections = 0
+        self.client_id = client_id
+        self.max_age = max_age
+        self.profile = {
+            "email": "standin.user@gmail.com",
+            "email_verified": True,
+            "name": "Standin User",
+            "picture": "https://lh3.googleusercontent.com/a/standin",
+        }
+        self.issuer = "https://accounts.google.com"
+        self.audience = None  # defaults to client_id
+        self.token_status = 200
+        self.revoked = []
+        self.revoke_status = 200
+        self.revoke_delay = 0.0
+        self.rotate_key()
+
+    def rotate_key(self):
+        self.private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.kid = uuid.uuid4().hex
+        self.jwk = RSAAlgorithm.to_jwk(self.private_key.public_key(), as_dict=True)
+        self.jwk.update({"kid": self.kid, "alg": "RS256", "use": "sig"})
+
+    def id_token(self, **overrides):
+        now = int(time.time())
+        claims = {
+            "iss": self.issuer,
+            "aud": self.audience or self.client_id,
+            "sub": "1234567890",
+            "iat": now,
+            "exp": now + 3600,
+            **self.profile,
+            **overrides,
+        }
+        return jwt.encode(claims, self.private_key, algorithm="RS256", headers={"kid": self.kid})
+
+    def count(self, path):
+        with self.lock:
+            self.hits[path] = self.hits.get(path, 0) + 1
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Google OAuth/JWKS stand-in")
+    parser.add_argument("--port", type=int, default=8026)
+    parser.add_argument("--client-id", default="standin-client-id")
+    parser.add_argument("--email", default="standin.user@gmail.com")
+    parser.add_argument("--revoke-delay", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = GoogleStandIn(port=args.port, client_id=args.client_id)
+    server.profile["email"] = args.email
+    server.revoke_delay = args.revoke_delay
+    print(f"Google stand-in listening on {server.url} (client_id={args.client_id})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n{server.hits} over {server.connections} connections")
@@ -0,0 +1,121 @@
+"""
+Local SMTP stand-in for exercising the email outbox offline.
+
+    python -m tests.smtp_standin --port 8025
+    MAIL_SERVER=localhost MAIL_PORT=8025 ... flask deliver-emails
+
+Speaks just enough SMTP for smtplib (EHLO/HELO, MAIL, RCPT, DATA, RSET,
+NOOP, QUIT), keeps every accepted message in memory and can be told to
+misbehave:
+
+- reject_rcpt:     addresses answered with 550 at RCPT TO;
+- drop_after:      close the connection after this many messages on it
+                   (a server-side per-connection limit / idle drop);
+- delay:           seconds to sleep before accepting each message.
+"""
+import argparse
+import socketserver
+import threading
+import time
+from email import message_from_bytes
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        sent_here = 0
+        sender, rcpts = None, []
+        self.reply("220 standin ESMTP")
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            line = raw.decode(errors="replace").rstrip("\r\n")
+            verb = line[:4].upper()
+
+            if verb in ("EHLO", "HELO"):
+                self.reply("250 standin")
+            elif verb == "MAIL":
+                sender, rcpts = line.split(":", 1)[1].strip(), []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                address = line.split(":", 1)[1].strip().strip("<>")
+                if address in server.reject_rcpt:
+                    self.reply("550 No such user")
+                else:
+                    rcpts.append(address)
+                    self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = bytearray()
+                while True:
+                    chunk = self.rfile.readline()
+                    if chunk in (b".\r\n", b".\n", b""):
+                        break
+                    data += chunk[1:] if chunk.startswith(b"..") else chunk
+                if server.delay:
+                    time.sleep(server.delay)
+                with server.lock:
+                    server.messages.append((sender, rcpts, message_from_bytes(bytes(data))))
+                self.reply("250 OK queued")
+                sent_here += 1
+                if server.drop_after and sent_here >= server.drop_after:
+                    return  # hang up without QUIT
+            elif verb == "RSET":
+                sender, rcpts = None, []
+                self.reply("250 OK")
+            elif verb == "NOOP":
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=0, reject_rcpt=(), drop_after=0, delay=0.0):
+        super().__init__((host, port), _Handler)
+        self.lock = threading.Lock()
+        self.messages = []
+        self.connections = 0
+        self.reject_rcpt = set(reject_rcpt)
+        self.drop_after = drop_after
+        self.delay = delay
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local SMTP stand-in")
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--drop-after", type=int, default=0)
+    parser.add_argument("--delay", type=float, default=0.0)
+    parser.add_argument("--reject", action="append", default=[])
+    args = parser.parse_args()
+
+    server = SMTPStandIn(port=args.port, reject_rcpt=args.reject,
+                         drop_after=args.drop_after, delay=args.delay)
+    print(f"SMTP stand-in listening on 127.0.0.1:{server.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n{len(server.messages)} messages over {server.connections} connections")
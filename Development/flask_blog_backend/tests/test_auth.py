@@ -1,10 +1,10 @@
 import pytest
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from flask_jwt_extended import decode_token
-from app.models.user import User
+from app.models.user import User, RefreshToken
 from app.extensions import db
 
-from tests.utils import register_any_user, login
+from tests.utils import register_any_user, login, create_user
 
 
 
@@ -76,3 +76,153 @@ def test_blocked_commentator_cannot_login(client):
     r = login(client, email)
     assert r.status_code == 403
     assert r.json["msg"].lower().startswith("account blocked")
+
+
+def _register_author_with_picture(client, data, filename):
+    from io import BytesIO
+    suffix = datetime.now(timezone.utc).strftime("%H%M%S%f")
+    r = client.post("/api/auth/register", data={
+        "username": f"pic_author_{suffix}",
+        "email": f"pic_author_{suffix}@test.com",
+        "password": "password",
+        "role": "author",
+        "profile_picture": (BytesIO(data), filename),
+    }, content_type="multipart/form-data")
+    assert r.status_code == 201, r.json
+    return User.query.filter_by(email=f"pic_author_{suffix}@test.com").first()
+
+
+def test_registration_swaps_in_cartoonized_profile_picture(app, client):
+    import os
+    import cv2
+    import numpy as np
+    from app.models.image_job import ImageJob
+
+    ok, png = cv2.imencode(".png", np.random.randint(0, 255, (400, 600, 3), dtype=np.uint8))
+    user = _register_author_with_picture(client, png.tobytes(), "me.png")
+
+    job = ImageJob.query.filter_by(user_id=user.id).one()
+    assert job.status == ImageJob.DONE
+    assert user.profile_picture == job.source_path[:-len(".png")] + "_cartoon.jpg"
+
+    upload_root = os.path.join(app.root_path, app.config["UPLOAD_FOLDER"])
+    cartoon = cv2.imread(os.path.join(upload_root, user.profile_picture))
+    assert cartoon.shape[:2] == (171, 256)  # downscaled to the avatar size before filtering
+    assert not os.path.exists(os.path.join(upload_root, job.source_path))
+    os.remove(os.path.join(upload_root, user.profile_picture))
+
+
+def test_failed_cartoonization_keeps_original_and_cli_retries(app, client):
+    import os
+    from app.models.image_job import ImageJob
+
+    user = _register_author_with_picture(client, b"not really a jpeg", "me.jpg")
+    job = ImageJob.query.filter_by(user_id=user.id).one()
+    assert job.status == ImageJob.FAILED
+    assert user.profile_picture == job.source_path
+
+    result = app.test_cli_runner().invoke(args=["process-image-jobs"])
+    assert "Processed 0 image jobs" in result.output
+
+    result = app.test_cli_runner().invoke(args=["process-image-jobs", "--retry-failed"])
+    assert "Processed 1 image jobs (1 failed)" in result.output
+    db.session.refresh(job)
+    assert job.attempts == 2
+
+    os.remove(os.path.join(app.root_path, app.config["UPLOAD_FOLDER"], job.source_path))
+
+
+def test_image_jobs_beyond_the_queue_start_once_a_slot_frees(app, monkeypatch):
+    import threading
+    import time
+    from app.utils.image_worker import ImageWorker
+
+    app.config.update(IMAGE_WORKER_PROCESSES=1, IMAGE_WORKER_MAX_PENDING=1)
+    worker = ImageWorker(app)
+    release, done = threading.Event(), []
+
+    def run(job_id, executor=None):
+        release.wait(5)
+        done.append(job_id)
+
+    monkeypatch.setattr(worker, "run", run)
+    monkeypatch.setattr(worker, "_get_pool", lambda: None)
+
+    assert worker.submit(1) is True
+    assert worker.submit(2) is False  # queue full: waits instead of staying pending
+    release.set()
+    deadline = time.monotonic() + 5
+    while len(done) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert done == [1, 2]
+
+
+def test_refresh_rotates_token_and_revokes_all_on_reuse(client):
+    user = create_user("commentator")
+    _, raw = RefreshToken.issue(user.id, timedelta(days=30))
+    db.session.commit()
+
+    r = client.post("/api/auth/refresh", json={"refresh_token": raw})
+    assert r.status_code == 200
+    rotated = r.json["refresh_token"]
+    assert rotated != raw
+    headers = {"Authorization": f"Bearer {r.json['access_token']}"}
+    assert client.get("/api/auth/user/me", headers=headers).status_code == 200
+
+    # Stored as a keyed digest, never as the raw token
+    record = RefreshToken.find(rotated)
+    assert record.user_id == user.id
+    assert record.token_hash == RefreshToken.digest(rotated) != rotated
+
+    # Replaying the rotated-out token revokes the whole family
+    assert client.post("/api/auth/refresh", json={"refresh_token": raw}).status_code == 401
+    assert client.post("/api/auth/refresh", json={"refresh_token": rotated}).status_code == 401
+    assert client.post("/api/auth/refresh", json={"refresh_token": "bogus"}).status_code == 401
+
+
+def test_purge_refresh_tokens_deletes_expired_and_old_revoked_rows(app):
+    user = create_user("commentator")
+    now = datetime.now(timezone.utc)
+    live, _ = RefreshToken.issue(user.id, timedelta(days=30))
+    expired, _ = RefreshToken.issue(user.id, timedelta(days=30))
+    expired.expires_at = now - timedelta(minutes=1)
+    recently_revoked, _ = RefreshToken.issue(user.id, timedelta(days=30))
+    recently_revoked.revoke()
+    long_revoked, _ = RefreshToken.issue(user.id, timedelta(days=30))
+    long_revoked.revoked, long_revoked.revoked_at = True, now - timedelta(days=8)
+    db.session.commit()
+    kept = {live.id, recently_revoked.id}
+
+    assert RefreshToken.purge(timedelta(days=7), batch_size=1) == 2
+    assert {t.id for t in RefreshToken.query.all()} == kept
+
+    result = app.test_cli_runner().invoke(args=["purge-refresh-tokens"])
+    assert "Purged 0 refresh tokens" in result.output
+
+
+def test_login_rehashes_outdated_password_hash(app, client):
+    user = create_user("commentator")
+    assert user.password.startswith("scrypt:32768:8:1$")
+
+    app.extensions["password_hasher"].method = "scrypt:16384:8:1"
+    assert login(client, user.email).status_code == 200
+    db.session.refresh(user)
+    assert user.password.startswith("scrypt:16384:8:1$")
+    # The new hash still verifies
+    assert login(client, user.email).status_code == 200
+
+
+def test_saturated_password_hasher_answers_503(app, client):
+    user = create_user("commentator")
+    hasher = app.extensions["password_hasher"]
+    for _ in range(hasher.max_pending):
+        hasher._slots.acquire()  # every queue slot taken by other requests
+    try:
+        r = login(client, user.email)
+        assert r.status_code == 503
+        assert int(r.headers["Retry-After"]) >= 1
+        assert hasher.stats()["rejected"] == 1
+    finally:
+        for _ in range(hasher.max_pending):
+            hasher._slots.release()
+    assert login(client, user.email).status_code == 200
@@ -6,8 +6,10 @@ from flask_jwt_extended import decode_token
 
 from app.extensions import db
 from app.models.user import User
+from app.models.comment import Comment
+from app.models.rating import CommentRating
 
-from tests.utils import register_any_user, login
+from tests.utils import register_any_user, login, create_user, create_post, auth_header, count_queries
 
 
 
@@ -398,4 +400,56 @@ def test_full_post_comment_rating_flow(client):
     paginated = client.get(f"/api/comments/post/{post_id}?page=2&per_page=5")
     assert paginated.status_code == 200
     assert "comments" in paginated.json
-    assert len(paginated.json["comments"]) <= 5
\ No newline at end of file
+    assert len(paginated.json["comments"]) <= 5
+
+
+def test_post_detail_comment_page_uses_constant_queries(client):
+    author = create_user("author")
+    viewer = create_user("commentator")
+    other = create_user("commentator")
+    post = create_post(author)
+
+    for i in range(40):
+        comment = Comment(content=f"Comment {i}", post_id=post.id, user_id=other.id)
+        db.session.add(comment)
+        db.session.flush()
+        db.session.add_all([
+            CommentRating(comment_id=comment.id, user_id=viewer.id, value=4),
+            CommentRating(comment_id=comment.id, user_id=other.id, value=2),
+        ])
+    db.session.commit()
+
+    headers = auth_header(viewer)
+    counts = {}
+    for per_page in (5, 40):
+        db.session.expire_all()
+        with count_queries() as statements:
+            resp = client.get(f"/api/posts/{post.id}?per_page={per_page}", headers=headers)
+        assert resp.status_code == 200
+        items = resp.json["comments"]["items"]
+        assert len(items) == per_page
+        assert all(c["rating"] == 3.0 and c["user_rating"] == 4 for c in items)
+        assert all(c["author"] == other.username for c in items)
+        counts[per_page] = len(statements)
+
+    assert counts[5] == counts[40]
+
+
+def test_comment_list_etag_changes_when_a_comment_is_rated(client):
+    author = create_user("author")
+    rater = create_user("commentator")
+    post = create_post(author)
+    comment = Comment(content="Rate me", post_id=post.id, user_id=author.id)
+    db.session.add(comment)
+    db.session.commit()
+
+    etag = client.get(f"/api/comments/posts/{post.id}").headers["ETag"]
+    assert client.get(
+        f"/api/comments/posts/{post.id}", headers={"If-None-Match": etag}
+    ).status_code == 304
+
+    client.post(f"/api/comments/rate/{comment.id}", json={"value": 5}, headers=auth_header(rater))
+
+    resp = client.get(f"/api/comments/posts/{post.id}", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.json["comments"][0]["rating"] == 5.0
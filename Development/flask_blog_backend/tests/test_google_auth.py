@@ -0,0 +1,138 @@
+import time
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from app.extensions import db
+from app.models.google_revocation import GoogleRevocation
+from app.models.user import User, RefreshToken
+from app.routes import google_auth
+from app.utils import google_oidc
+from tests.google_standin import GoogleStandIn
+
+
+@pytest.fixture
+def google(app, monkeypatch):
+    server = GoogleStandIn().start()
+    monkeypatch.setattr(google_auth, "GOOGLE_CLIENT_ID", server.client_id)
+    monkeypatch.setattr(google_auth, "GOOGLE_TOKEN_URL", f"{server.url}/token")
+    monkeypatch.setattr(google_auth, "FRONTEND_URL", "http://localhost:3000")
+    app.config["GOOGLE_JWKS_URL"] = f"{server.url}/certs"
+    app.config["GOOGLE_REVOKE_URL"] = f"{server.url}/revoke"
+    google_oidc.init_app(app)
+    yield server
+    app.extensions["google_oidc"].session.close()
+    server.stop()
+
+
+def test_google_login_reads_profile_from_verified_id_token(client, google):
+    for _ in range(2):
+        r = client.get("/api/auth/google_callback?code=abc")
+        assert r.status_code == 302
+        query = parse_qs(urlparse(r.headers["Location"]).query)
+        assert RefreshToken.find(query["refresh"][0]) is not None
+
+    user = User.query.filter_by(email="standin.user@gmail.com").one()
+    assert user.username == "Standin User"
+    assert user.profile_picture == "https://lh3.googleusercontent.com/a/standin"
+
+    # One exchange per login, the JWKS fetched once, no userinfo call, and
+    # everything over a single pooled connection
+    assert google.hits == {"/token": 2, "/certs": 1}
+    assert google.connections == 1
+
+
+def test_google_login_rejects_untrusted_id_tokens(client, google, monkeypatch):
+    google.audience = "someone-elses-client-id"
+    assert client.get("/api/auth/google_callback?code=abc").status_code == 401
+
+    google.audience = None
+    google.issuer = "https://evil.example.com"
+    assert client.get("/api/auth/google_callback?code=abc").status_code == 401
+
+    # A key rotated on Google's side is picked up with one early refetch
+    google.issuer = "https://accounts.google.com"
+    monkeypatch.setattr(google_oidc, "JWKS_MIN_REFETCH_INTERVAL", 0)
+    google.rotate_key()
+    assert client.get("/api/auth/google_callback?code=abc").status_code == 302
+    assert google.hits["/certs"] == 2
+    assert User.query.filter_by(email="standin.user@gmail.com").count() == 1
+
+
+def test_logout_returns_before_google_revocation(app, client, google):
+    r = client.get("/api/auth/google_callback?code=abc")
+    query = parse_qs(urlparse(r.headers["Location"]).query)
+    headers = {"Authorization": f"Bearer {query['token'][0]}"}
+    user = User.query.filter_by(email="standin.user@gmail.com").one()
+    google_token = user.google_refresh_token
+
+    google.revoke_delay = 1.5
+    started = time.perf_counter()
+    r = client.post("/api/auth/logout", headers=headers)
+    elapsed = time.perf_counter() - started
+    assert r.status_code == 200
+    assert elapsed < 1.0, f"logout waited on Google ({elapsed:.2f}s)"
+    assert "/revoke" not in google.hits
+
+    # The session is already gone; the revocation waits in the queue
+    assert client.get("/api/auth/user/me", headers=headers).status_code == 401
+    assert client.post("/api/auth/refresh", json={"refresh_token": query["refresh"][0]}).status_code == 401
+    row = GoogleRevocation.query.one()
+    assert row.token == google_token and row.status == GoogleRevocation.PENDING
+
+    # Google failing: rescheduled with backoff
+    google.revoke_delay, google.revoke_status = 0, 503
+    worker = app.extensions["google_revoke"]
+    assert worker.drain() == (0, 1)
+    db.session.refresh(row)
+    assert row.status == GoogleRevocation.PENDING and row.attempts == 1
+    assert "503" in row.last_error
+
+    google.revoke_status = 200
+    row.next_attempt_at = row.created_at
+    db.session.commit()
+    assert worker.drain() == (1, 0)
+    db.session.refresh(row)
+    assert row.status == GoogleRevocation.DONE
+    assert len(google.revoked) == 1
+
+
+def test_revocations_queued_before_a_restart_are_sent(app, client, google):
+    from app.utils.google_revoke import queue_revocation
+
+    queue_revocation(google_auth.encrypt_token("left-over-token"))
+    db.session.info.pop("google_revocation_queued")  # committed by a previous process
+    db.session.commit()
+    app.config["GOOGLE_REVOKE_WORKER"] = "thread"
+
+    client.get("/api/categories/list_categories")  # the first request starts the worker
+    deadline = time.monotonic() + 5
+    while not google.revoked and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert google.revoked == ["left-over-token"]
+    worker = app.extensions["google_revoke"]
+    worker.stop()
+    worker._thread.join(5)
+
+
+def test_google_outage_opens_the_circuit_then_probes(app, client, google):
+    dependency = app.extensions["outbound"].get("google_token")
+    dependency.breaker.failure_threshold = 2
+    google.token_status = 503
+
+    for _ in range(2):
+        assert client.get("/api/auth/google_callback?code=abc").status_code == 400
+    # Open: fails fast without calling Google
+    assert client.get("/api/auth/google_callback?code=abc").status_code == 503
+    assert google.hits["/token"] == 2
+
+    stats = app.extensions["outbound"].stats()["google_token"]
+    assert stats["state"] == "open"
+    assert (stats["calls"], stats["failures"], stats["rejected"]) == (2, 2, 1)
+
+    # After the reset timeout a single probe goes out; its success closes it
+    google.token_status = 200
+    dependency.breaker.opened_at -= dependency.breaker.reset_timeout
+    assert client.get("/api/auth/google_callback?code=abc").status_code == 302
+    assert dependency.breaker.state == "closed"
+    assert google.hits["/token"] == 3
@@ -0,0 +1,123 @@
+def test_media_fallback_serves_with_cache_headers_and_ranges(client):
+    resp = client.get("/media/PostPics/image1.jpg")
+    assert resp.status_code == 200
+    assert resp.mimetype == "image/jpeg"
+    assert resp.headers["Cache-Control"].startswith("public, max-age=")
+    assert resp.headers["ETag"] and resp.headers["Last-Modified"]
+
+    revalidated = client.get("/media/PostPics/image1.jpg", headers={"If-None-Match": resp.headers["ETag"]})
+    assert revalidated.status_code == 304
+
+    partial = client.get("/media/PostPics/image1.jpg", headers={"Range": "bytes=0-99"})
+    assert partial.status_code == 206
+    assert len(partial.data) == 100
+
+
+def test_media_rejects_unknown_folders_and_traversal(client):
+    assert client.get("/media/Secrets/image1.jpg").status_code == 404
+    assert client.get("/media/PostPics/../../config.py").status_code == 404
+    assert client.get("/media/PostPics/missing.jpg").status_code == 404
+
+
+def test_media_hands_off_to_nginx_when_configured(app, client):
+    app.config["MEDIA_ACCEL_REDIRECT_PREFIX"] = "/protected-media/"
+
+    resp = client.get("/media/CategoryPics/cat_action.jpg")
+    assert resp.status_code == 200
+    assert resp.headers["X-Accel-Redirect"] == "/protected-media/CategoryPics/cat_action.jpg"
+    assert resp.mimetype == "image/jpeg"
+    assert resp.headers["Cache-Control"].startswith("public")
+    assert resp.data == b""
+
+
+def test_upload_variants_are_downscaled_oriented_and_stripped(tmp_path):
+    import cv2
+    import numpy as np
+    from app.utils.images import generate_variants, variant_files
+
+    # 2000x1000 JPEG carrying an EXIF APP1 segment (orientation 6: rotate 90° CW)
+    ok, jpeg = cv2.imencode(".jpg", np.full((1000, 2000, 3), 200, dtype=np.uint8))
+    assert ok
+    tiff = b"MM\x00*\x00\x00\x00\x08\x00\x01\x01\x12\x00\x03\x00\x00\x00\x01\x00\x06\x00\x00\x00\x00\x00\x00"
+    app1 = b"\xff\xe1" + (len(tiff) + 8).to_bytes(2, "big") + b"Exif\x00\x00" + tiff
+    original = tmp_path / "post_photo.jpg"
+    original.write_bytes(jpeg.tobytes()[:2] + app1 + jpeg.tobytes()[2:])
+
+    variants = generate_variants(str(original))
+
+    assert set(variants) == {"thumb", "card", "full"}
+    # Rotated to 1000x2000 portrait, never upscaled past its own width
+    assert (variants["full"]["width"], variants["full"]["height"]) == (1000, 2000)
+    assert (variants["card"]["width"], variants["card"]["height"]) == (480, 960)
+    assert variants["thumb"]["webp"] == "post_photo_thumb.webp"
+    for name in variant_files(variants):
+        data = (tmp_path / name).read_bytes()
+        assert b"Exif" not in data
+
+    (tmp_path / "broken.jpg").write_bytes(b"not an image")
+    assert generate_variants(str(tmp_path / "broken.jpg")) == {}
+
+
+def test_save_image_writes_variants_next_to_the_original(app, tmp_path):
+    from io import BytesIO
+    import cv2
+    import numpy as np
+    from werkzeug.datastructures import FileStorage
+    from app.utils.file import save_image
+
+    app.config["UPLOAD_FOLDER"] = str(tmp_path)
+    ok, jpeg = cv2.imencode(".jpg", np.full((600, 900, 3), 90, dtype=np.uint8))
+    upload = FileStorage(BytesIO(jpeg.tobytes()), filename="me.jpg", content_type="image/jpeg")
+
+    with app.test_request_context():
+        filename, variants = save_image(upload, "Some User")
+
+    assert filename.startswith("Some_User_") and (tmp_path / filename).exists()
+    assert variants["card"]["width"] == 480
+    assert (tmp_path / variants["thumb"]["webp"]).exists()
+
+
+def test_resize_endpoint_negotiates_format_and_reuses_the_derivative(app, client, tmp_path):
+    app.config["IMAGE_DERIVATIVE_DIR"] = str(tmp_path)
+    app.extensions.pop("image_derivatives", None)
+
+    resp = client.get("/api/images/PostPics/image1.jpg?w=160", headers={"Accept": "image/webp,*/*"})
+    assert resp.status_code == 200
+    assert resp.mimetype == "image/webp"
+    assert "Accept" in resp.headers["Vary"]
+
+    again = client.get("/api/images/PostPics/image1.jpg?w=160", headers={"Accept": "image/webp,*/*"})
+    assert again.data == resp.data
+    assert len([p for p in tmp_path.iterdir() if p.suffix == ".webp"]) == 1
+
+    jpeg = client.get("/api/images/PostPics/image1.jpg?w=160&fmt=jpeg")
+    assert jpeg.mimetype == "image/jpeg"
+
+    assert client.get("/api/images/PostPics/image1.jpg?w=161").status_code == 400
+    assert client.get("/api/images/PostPics/image1.jpg").status_code == 400
+    assert client.get("/api/images/PostPics/missing.jpg?w=160").status_code == 404
+
+
+def test_derivative_cache_evicts_least_recently_used(tmp_path):
+    import os
+    import time
+    from app.utils.derivatives import DerivativeCache
+
+    source = tmp_path / "source.jpg"
+    source.write_bytes(b"x")
+    cache = DerivativeCache(str(tmp_path / "cache"), max_bytes=250)
+    calls = []
+
+    def render(n):
+        calls.append(n)
+        return b"." * 100
+
+    first = cache.get_or_create(str(source), 160, 0, "jpg", lambda: render(160))
+    second = cache.get_or_create(str(source), 320, 0, "jpg", lambda: render(320))
+    os.utime(first, (time.time() - 60, time.time() - 60))
+    os.utime(second, (time.time() - 30, time.time() - 30))
+    cache.get_or_create(str(source), 160, 0, "jpg", lambda: render(160))  # hit: now most recent
+    cache.get_or_create(str(source), 480, 0, "jpg", lambda: render(480))
+
+    assert calls == [160, 320, 480]
+    assert os.path.exists(first) and not os.path.exists(second)
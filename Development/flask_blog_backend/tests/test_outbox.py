@@ -0,0 +1,135 @@
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from app.extensions import db
+from app.models.email_outbox import EmailOutbox
+from app.models.user import User
+from app.utils.outbox import queue_email
+from tests.smtp_standin import SMTPStandIn
+
+
+@pytest.fixture
+def smtp(app):
+    server = SMTPStandIn().start()
+    mail = app.extensions["mail"]
+    mail.server, mail.port = "127.0.0.1", server.port
+    mail.use_tls = mail.use_ssl = False
+    mail.username = mail.password = None
+    mail.suppress = False
+    yield server
+    app.extensions["email_outbox"].stop()
+    server.stop()
+
+
+def deliver(app):
+    return app.extensions["email_outbox"].drain()
+
+
+def test_registration_email_is_queued_with_the_user_and_sent_after_commit(app, client, smtp):
+    r = client.post("/api/auth/register", data={
+        "username": "outbox_reader", "email": "outbox_reader@test.com",
+        "password": "password", "role": "commentator",
+    })
+    assert r.status_code == 201
+    assert smtp.messages == []  # the request never touched SMTP
+
+    row = EmailOutbox.query.one()
+    assert row.recipients == ["outbox_reader@test.com"]
+    assert User.query.filter_by(email="outbox_reader@test.com").count() == 1
+
+    assert deliver(app) == (1, 0)
+    assert smtp.messages[0][2]["Subject"] == "Confirm Your Email"
+    db.session.refresh(row)
+    assert row.status == EmailOutbox.SENT and row.sent_at is not None
+
+
+def test_worker_thread_sends_the_backlog_after_a_restart(app, client, smtp):
+    queue_email("Left over", ["backlog@test.com"], "<p>x</p>")
+    db.session.info.pop("email_outbox_queued")  # committed by a previous process
+    db.session.commit()
+    app.config["EMAIL_OUTBOX_WORKER"] = "thread"
+
+    # No new email wakes the worker; the first request starts it
+    client.get("/api/categories/list_categories")
+    deadline = time.monotonic() + 5
+    while not smtp.messages and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert [m[2]["Subject"] for m in smtp.messages] == ["Left over"]
+    worker = app.extensions["email_outbox"]
+    worker.stop()
+    worker._thread.join(5)
+
+
+def test_rolled_back_transaction_queues_nothing(app, smtp):
+    queue_email("Never", ["ghost@test.com"], "<p>x</p>")
+    db.session.rollback()
+    assert deliver(app) == (0, 0)
+    assert EmailOutbox.query.count() == 0
+
+
+def test_batch_reuses_one_connection_and_survives_drops(app, smtp):
+    for i in range(12):
+        queue_email(f"Hello {i}", [f"reader{i}@test.com"], "<p>hi</p>")
+    db.session.commit()
+
+    smtp.drop_after = 5  # server hangs up after every 5th message
+    assert deliver(app) == (12, 0)
+    assert len(smtp.messages) == 12
+    assert smtp.connections == 3
+    assert [m[2]["Subject"] for m in smtp.messages] == [f"Hello {i}" for i in range(12)]
+
+
+def test_rejected_recipient_backs_off_without_blocking_the_batch(app, smtp):
+    smtp.reject_rcpt = {"bounce@test.com"}
+    queue_email("A", ["ok@test.com"], "<p>a</p>")
+    bad = queue_email("B", ["bounce@test.com"], "<p>b</p>")
+    queue_email("C", ["ok2@test.com"], "<p>c</p>")
+    db.session.commit()
+
+    assert deliver(app) == (2, 1)
+    db.session.refresh(bad)
+    assert bad.status == EmailOutbox.PENDING
+    assert bad.attempts == 1 and "bounce@test.com" in bad.last_error
+    assert bad.next_attempt_at > datetime.now(timezone.utc)
+
+    # Not due yet; once due it is retried, and given up after the last attempt
+    assert deliver(app) == (0, 0)
+    app.config["EMAIL_OUTBOX_MAX_ATTEMPTS"] = 2
+    bad.next_attempt_at = datetime.now(timezone.utc)
+    db.session.commit()
+    assert deliver(app) == (0, 1)
+    db.session.refresh(bad)
+    assert bad.status == EmailOutbox.FAILED and bad.attempts == 2
+
+
+def test_unreachable_server_defers_the_whole_batch(app, smtp):
+    queue_email("A", ["a@test.com"], "<p>a</p>")
+    queue_email("B", ["b@test.com"], "<p>b</p>")
+    db.session.commit()
+    smtp.stop()
+
+    assert deliver(app) == (0, 2)
+    assert {row.status for row in EmailOutbox.query} == {EmailOutbox.PENDING}
+    assert all(row.attempts == 1 for row in EmailOutbox.query)
+
+
+def test_open_circuit_pauses_delivery_without_spending_attempts(app, smtp):
+    smtp_dependency = app.extensions["outbound"].get("smtp")
+    smtp_dependency.breaker.failure_threshold = 1
+    queue_email("A", ["a@test.com"], "<p>a</p>")
+    db.session.commit()
+    smtp.stop()
+
+    assert deliver(app) == (0, 1)  # the connect failure opens the circuit
+    row = EmailOutbox.query.one()
+    row.next_attempt_at = datetime.now(timezone.utc)
+    db.session.commit()
+
+    assert deliver(app) == (0, 0)  # fails fast, the row is left as it was
+    db.session.refresh(row)
+    assert row.attempts == 1 and row.status == EmailOutbox.PENDING
+    stats = app.extensions["outbound"].stats()["smtp"]
+    assert stats["state"] == "open"
+    assert stats["failures"] == 1 and stats["rejected"] == 1
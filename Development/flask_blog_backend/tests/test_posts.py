@@ -3,7 +3,11 @@ from io import BytesIO
 from werkzeug.datastructures import MultiDict, FileStorage
 
 
-from tests.utils import register_any_user, login
+from app.extensions import db
+from app.models.rating import PostRatingSummary
+from tests.utils import (
+    register_any_user, login, create_user, create_post, auth_header, SharedStoreStandIn
+)
 
 
 # pytest tests/test_posts.py
@@ -32,6 +36,33 @@ def test_create_post_without_image_returns_400(client):
 
 
 
+def test_create_post_endpoint_stores_post_for_current_user(app, client, tmp_path):
+    import cv2
+    import numpy as np
+    from app.models.post import Post
+
+    app.config["UPLOAD_FOLDER"] = str(tmp_path)  # absolute: keeps uploads out of static/
+    ok, jpeg = cv2.imencode(".jpg", np.full((40, 60, 3), 120, dtype=np.uint8))
+    assert ok
+    author = create_user("author")
+
+    resp = client.post(
+        "/api/posts/create_post",
+        headers=auth_header(author),
+        data={
+            "title": "Created through the endpoint",
+            "content": "<p>Body</p>",
+            "main_image": FileStorage(BytesIO(jpeg.tobytes()), filename="cover.jpg", content_type="image/jpeg"),
+        },
+        content_type="multipart/form-data",
+    )
+
+    assert resp.status_code == 201, resp.json
+    post = db.session.get(Post, resp.json["post_id"])
+    assert post.author_id == author.id
+    assert post.images[0].file_path == "post_cover.jpg"
+
+
 def test_post_creation_by_roles(client):
     roles = ["superadmin", "admin", "author"]
 
@@ -591,4 +622,297 @@ def test_search_posts(client):
 
     data = search_resp.get_json()
     assert data["total"] >= 2
-    assert any("flask" in p["title"].lower() or "flask" in p["content"].lower() for p in data["results"])
\ No newline at end of file
+    assert any("flask" in p["title"].lower() or "flask" in p["content"].lower() for p in data["results"])
+
+def test_rating_summary_follows_rating_writes(client):
+    author = create_user("author")
+    post = create_post(author)
+    first, second = create_user("commentator"), create_user("commentator")
+
+    assert client.post(f"/api/posts/rate/{post.id}", headers=auth_header(first), json={"value": 5}).status_code == 200
+    resp = client.post(f"/api/posts/rate/{post.id}", headers=auth_header(second), json={"value": 2})
+    assert resp.json["rating"] == 3.5
+
+    # Re-rating moves the vote between histogram buckets without adding a new one
+    resp = client.post(f"/api/posts/rate/{post.id}", headers=auth_header(second), json={"value": 4})
+    assert resp.json["msg"] == "Rating updated"
+    assert resp.json["rating"] == 4.5
+
+    summary = db.session.get(PostRatingSummary, post.id)
+    assert summary.rating_count == 2
+    assert summary.rating_sum == 9
+    assert summary.histogram == {1: 0, 2: 0, 3: 0, 4: 1, 5: 1}
+
+    listing = client.get("/api/posts").json["posts"]
+    assert [p["rating"] for p in listing if p["id"] == post.id] == [4.5]
+
+
+def test_bulk_rating_upserts_and_skips_missing_posts(client):
+    author = create_user("author")
+    first, second = create_post(author), create_post(author)
+    rater = create_user("commentator")
+
+    resp = client.post("/api/posts/rate", headers=auth_header(rater), json={"ratings": [
+        {"post_id": first.id, "value": 3},
+        {"post_id": second.id, "value": 5},
+        {"post_id": 999999, "value": 1},
+    ]})
+    assert resp.status_code == 200
+    results = {r["post_id"]: r for r in resp.json["results"]}
+    assert results[first.id]["rating"] == 3.0
+    assert results[second.id]["rating_count"] == 1
+    assert resp.json["not_found"] == [999999]
+
+    # Sending the same post again updates instead of tripping the unique constraint
+    resp = client.post("/api/posts/rate", headers=auth_header(rater), json={"ratings": [
+        {"post_id": first.id, "value": 1},
+    ]})
+    assert resp.json["results"][0]["rating"] == 1.0
+    assert resp.json["results"][0]["rating_count"] == 1
+    assert db.session.get(PostRatingSummary, first.id).histogram[3] == 0
+
+
+def test_cursor_pagination_walks_feed_without_gaps(client):
+    author = create_user("author")
+    created = {create_post(author).id for _ in range(7)}
+    create_post(author, published=False)
+
+    seen, cursor = [], ""
+    while True:
+        resp = client.get(f"/api/posts?per_page=3&cursor={cursor}")
+        assert resp.status_code == 200
+        assert "total" not in resp.json
+        seen.extend(p["id"] for p in resp.json["posts"])
+        if not resp.json["has_next"]:
+            break
+        cursor = resp.json["next_cursor"]
+
+    assert len(seen) == len(set(seen)) == 7
+    assert set(seen) == created
+
+    assert client.get("/api/posts?cursor=not-a-cursor").status_code == 400
+
+
+def test_feed_total_is_cached_until_a_post_is_written(client):
+    author = create_user("author")
+    create_post(author)
+    headers = auth_header(author)   # authenticated: bypasses the response cache
+
+    first = client.get("/api/posts", headers=headers).json
+    assert first["total"] == 1 and first["total_exact"] is True
+
+    cached = client.get("/api/posts", headers=headers).json
+    assert cached["total"] == 1 and cached["total_exact"] is False
+
+    create_post(author)
+    fresh = client.get("/api/posts", headers=headers).json
+    assert fresh["total"] == 2 and fresh["total_exact"] is True
+
+
+def test_full_text_search_ranks_title_above_content(client):
+    from app.models.post import Post
+
+    author = create_user("author")
+    in_content = create_post(author, title="Quiet evening")
+    in_content.content = "<p>A heist thriller with a <b>submarine</b> chase.</p>"
+    in_title = create_post(author, title="Submarine stories")
+    db.session.flush()
+    Post.refresh_search_vectors([in_content.id, in_title.id])
+    db.session.commit()
+
+    resp = client.get("/api/categories/search?q=submarine")
+    assert resp.status_code == 200
+    results = resp.json["results"]
+    assert [r["id"] for r in results] == [in_title.id, in_content.id]
+    assert "<b>submarine</b>" in results[1]["snippet"].lower()
+
+
+def test_filter_facets_count_the_whole_result_set(client):
+    from app.models.category import Category
+
+    alice = create_user("author")
+    bob = create_user("admin")
+    travel = Category(name="Travel")
+    food = Category(name="Food")
+    db.session.add_all([travel, food])
+    db.session.commit()
+
+    both = create_post(alice)
+    both.categories.extend([travel, food])
+    create_post(alice).categories.append(travel)
+    create_post(bob)                      # uncategorized
+    db.session.commit()
+
+    resp = client.get("/api/posts/filter?facets=true&per_page=1")
+    assert resp.status_code == 200
+    facets = resp.json["facets"]
+    assert facets["categories"] == [
+        {"id": travel.id, "name": "Travel", "count": 2},
+        {"id": food.id, "name": "Food", "count": 1},
+    ]
+    assert [(a["id"], a["count"]) for a in facets["authors"]] == [(alice.id, 2), (bob.id, 1)]
+
+    narrowed = client.get(f"/api/posts/filter?facets=true&category_id={food.id}").json["facets"]
+    assert narrowed["authors"] == [{"id": alice.id, "username": alice.username, "count": 1}]
+
+    assert "facets" not in client.get("/api/posts/filter").json
+
+
+def test_anonymous_feed_is_cached_until_a_post_is_written(client):
+    author = create_user("author")
+    create_post(author)
+
+    first = client.get("/api/posts?per_page=5&page=1")
+    assert first.headers["X-Cache"] == "MISS"
+    again = client.get("/api/posts?page=1&per_page=5")
+    assert again.headers["X-Cache"] == "HIT"
+    assert again.json == first.json
+
+    # Authenticated requests never touch the cache
+    assert "X-Cache" not in client.get("/api/posts", headers=auth_header(author)).headers
+
+    create_post(author)
+    fresh = client.get("/api/posts?per_page=5&page=1")
+    assert fresh.headers["X-Cache"] == "MISS"
+    assert fresh.json["total"] == 2
+
+
+def test_post_detail_cache_is_dropped_by_ratings_on_shared_store(app, client):
+    from app.utils import response_cache
+
+    response_cache.init_app(app, backend=response_cache.RedisBackend(SharedStoreStandIn()))
+    author = create_user("author")
+    rater = create_user("commentator")
+    post = create_post(author)
+
+    assert client.get(f"/api/posts/{post.id}").json["rating"] is None
+    assert client.get(f"/api/posts/{post.id}").headers["X-Cache"] == "HIT"
+
+    client.post(f"/api/posts/rate/{post.id}", json={"value": 4}, headers=auth_header(rater))
+
+    resp = client.get(f"/api/posts/{post.id}")
+    assert resp.headers["X-Cache"] == "MISS"
+    assert resp.json["rating"] == 4.0
+
+
+def test_deleting_a_user_drops_cached_pages_of_their_posts_and_comments(client):
+    from app.models.comment import Comment
+    from app.utils.response_cache import get_cache
+
+    author = create_user("author")
+    commenter = create_user("commentator")
+    own_post_id = create_post(author).id
+    commented_post_id = create_post(create_user("author")).id
+    db.session.add(Comment(content="Soon gone", post_id=commented_post_id, user_id=commenter.id))
+    db.session.commit()
+    for post_id in (own_post_id, commented_post_id):
+        client.get(f"/api/posts/{post_id}")
+        assert client.get(f"/api/posts/{post_id}").headers["X-Cache"] == "HIT"
+
+    tags = [f"post:{own_post_id}", f"post:{commented_post_id}"]
+    before = get_cache().backend.versions(tags)
+    admin = create_user("superadmin")
+    for user_id in (author.id, commenter.id):
+        assert client.delete(f"/api/users/delete/{user_id}", headers=auth_header(admin)).status_code == 200
+    after = get_cache().backend.versions(tags)
+    assert all(after[tag] > before[tag] for tag in tags)
+
+    assert client.get(f"/api/posts/{own_post_id}").status_code == 404
+    resp = client.get(f"/api/posts/{commented_post_id}")
+    assert resp.headers["X-Cache"] == "MISS"
+    assert resp.json["comments"]["total"] == 0
+
+
+def test_post_detail_revalidates_with_etag(client):
+    from app.models.comment import Comment
+
+    author = create_user("author")
+    post = create_post(author)
+
+    first = client.get(f"/api/posts/{post.id}")
+    etag = first.headers["ETag"]
+    assert first.headers["Last-Modified"]
+
+    unchanged = client.get(f"/api/posts/{post.id}", headers={"If-None-Match": etag})
+    assert unchanged.status_code == 304
+    assert unchanged.data == b""
+
+    # Each viewer gets their own validator
+    viewer = client.get(f"/api/posts/{post.id}", headers={
+        **auth_header(author), "If-None-Match": etag
+    })
+    assert viewer.status_code == 200
+
+    db.session.add(Comment(content="New comment", post_id=post.id, user_id=author.id))
+    db.session.commit()
+
+    changed = client.get(f"/api/posts/{post.id}", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.json["comments"]["total"] == 1
+
+
+def test_cached_post_detail_is_not_served_under_a_newer_etag(client):
+    from sqlalchemy import update
+    from app.models.post import Post
+
+    author = create_user("author")
+    post = create_post(author)
+    first = client.get(f"/api/posts/{post.id}")
+    assert client.get(f"/api/posts/{post.id}").headers["X-Cache"] == "HIT"
+
+    # A Core UPDATE moves updated_at (so the ETag) without bumping the cache tag
+    db.session.execute(update(Post).where(Post.id == post.id).values(title="Renamed"))
+    db.session.commit()
+
+    resp = client.get(f"/api/posts/{post.id}", headers={"If-None-Match": first.headers["ETag"]})
+    assert resp.status_code == 200
+    assert resp.headers["X-Cache"] == "MISS"
+    assert resp.json["title"] == "Renamed"
+    assert client.get(f"/api/posts/{post.id}").headers["X-Cache"] == "HIT"
+
+
+def test_bulk_watch_is_idempotent_and_skips_missing_posts(client):
+    author = create_user("author")
+    first, second, third = (create_post(author) for _ in range(3))
+    viewer = create_user("commentator")
+    headers = auth_header(viewer)
+
+    resp = client.post("/api/watched/posts", headers=headers,
+                       json={"post_ids": [first.id, second.id, 999999]})
+    assert resp.status_code == 200
+    assert resp.json["added"] == sorted([first.id, second.id])
+    # Again: nothing new, and no unique violation
+    assert client.post("/api/watched/posts", headers=headers,
+                       json={"post_ids": [first.id]}).json["added"] == []
+    assert client.post(f"/api/watched/posts/{first.id}/watch",
+                       headers=headers).json["message"] == "Post already marked as watched"
+    assert client.post("/api/watched/posts/999999/watch", headers=headers).status_code == 404
+
+    resp = client.delete("/api/watched/posts", headers=headers, json={"post_ids": [first.id, third.id]})
+    assert resp.json["removed"] == [first.id]
+    assert client.delete("/api/watched/posts", headers=headers, json={"post_ids": "all"}).status_code == 400
+
+    unwatched = client.get("/api/watched/dashboard/unwatched", headers=headers).json["unwatched"]
+    assert sorted(p["id"] for p in unwatched) == sorted([first.id, third.id])
+    filtered = client.get("/api/posts/filter?watched=true", headers=headers).json["posts"]
+    assert [(p["id"], p["isWatched"]) for p in filtered] == [(second.id, True)]
+
+
+def test_dashboard_watch_totals_follow_bulk_watches(client):
+    author = create_user("author")
+    posts = [create_post(author) for _ in range(4)]
+    viewer = create_user("commentator")
+    headers = auth_header(viewer)
+
+    resp = client.get("/api/posts/user_dashboard?watch_status=watched", headers=headers).json
+    assert resp["total"] == 0
+
+    client.post("/api/watched/posts", headers=headers, json={"post_ids": [p.id for p in posts[:3]]})
+    # The cached total is dropped by the Core insert, like by an ORM write
+    resp = client.get("/api/posts/user_dashboard?watch_status=watched", headers=headers).json
+    assert resp["total"] == 3 and resp["total_exact"] is True
+    assert all(r["isWatched"] for r in resp["results"])
+
+    resp = client.get("/api/posts/user_dashboard?watch_status=unwatched", headers=headers).json
+    assert [(r["id"], r["isWatched"]) for r in resp["results"]] == [(posts[3].id, False)]
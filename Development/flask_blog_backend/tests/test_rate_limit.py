@@ -0,0 +1,95 @@
+import os
+import time
+import uuid
+
+import pytest
+
+from app.models.contact import ContactMessage
+from app.utils import rate_limit
+
+from tests.utils import create_user, SharedStoreStandIn
+
+
+@pytest.fixture
+def redis_client():
+    """A real Redis (REDIS_TEST_URL, e.g. the compose service); skipped without one."""
+    redis = pytest.importorskip("redis")
+    client = redis.Redis.from_url(os.environ.get("REDIS_TEST_URL", "redis://localhost:6379/15"))
+    try:
+        client.ping()
+    except redis.exceptions.ConnectionError:
+        pytest.skip("no Redis server at REDIS_TEST_URL")
+    yield client
+    for key in client.scan_iter("ratelimit-test:*"):
+        client.delete(key)
+    client.close()
+
+
+def _limit(app, name, **rules):
+    app.config["RATE_LIMIT_ENABLED"] = True
+    app.config["RATE_LIMITS"] = {name: rules}
+
+
+def test_login_is_limited_per_account_across_workers_and_addresses(app, client):
+    user = create_user("commentator")
+    _limit(app, "login", ip=(100, 60), account=(3, 300))
+    store = SharedStoreStandIn()
+
+    def attempt(ip, email=user.email):
+        # A fresh limiter per attempt: each request lands on another worker
+        rate_limit.init_app(app, backend=rate_limit.RedisBackend(store))
+        return client.post("/api/auth/login", json={"email": email, "password": "wrong"},
+                           environ_base={"REMOTE_ADDR": ip})
+
+    for i in range(3):
+        assert attempt(f"203.0.113.{i}").status_code == 401
+    r = attempt("203.0.113.9")
+    assert r.status_code == 429
+    assert 1 <= int(r.headers["Retry-After"]) <= 100
+
+    # Other accounts aren't affected, and no address is stored in clear
+    assert attempt("203.0.113.9", email="someone.else@test.com").status_code == 401
+    assert not any(user.email in key for key in store.data)
+
+
+def test_contact_form_is_limited_per_ip(app, client):
+    _limit(app, "contact", ip=(2, 600))
+    rate_limit.init_app(app, backend=rate_limit.MemoryBackend())
+
+    def send(ip, n):
+        return client.post("/api/contact/send_message", environ_base={"REMOTE_ADDR": ip}, json={
+            "email": f"visitor{n}@example.com", "subject": "Hello", "message": "Hi there",
+        })
+
+    assert send("198.51.100.1", 1).status_code == 201
+    assert send("198.51.100.1", 2).status_code == 201
+    r = send("198.51.100.1", 3)
+    assert r.status_code == 429
+    assert int(r.headers["Retry-After"]) == 300
+    assert send("198.51.100.2", 4).status_code == 201
+    assert ContactMessage.query.count() == 3
+
+
+@pytest.mark.redis
+def test_token_bucket_script_on_redis_agrees_with_the_stand_in(redis_client):
+    prefix = f"ratelimit-test:{uuid.uuid4().hex}:"
+    on_redis = rate_limit.RedisBackend(redis_client, prefix=prefix)
+    stand_in = rate_limit.RedisBackend(SharedStoreStandIn(), prefix=prefix)
+
+    # Burst of 3 refilled over 6s: three takes pass, then ~2s to the next token
+    takes = {name: [backend.take("bucket", 3, 0.5) for _ in range(5)]
+             for name, backend in (("redis", on_redis), ("stand-in", stand_in))}
+    assert [allowed for allowed, _ in takes["redis"]] == [True, True, True, False, False]
+    assert [allowed for allowed, _ in takes["stand-in"]] == [True, True, True, False, False]
+    for (_, wait), (_, expected) in zip(takes["redis"], takes["stand-in"]):
+        assert wait == pytest.approx(expected, abs=0.1)
+    # The key expires once the bucket would be full again (6s + 1s slack)
+    assert 0 < redis_client.pttl(prefix + "bucket") <= 7000
+
+    # Refill: 20 tokens/s with a burst of 1
+    for backend in (on_redis, stand_in):
+        assert backend.take("fast", 1, 20)[0]
+        allowed, wait = backend.take("fast", 1, 20)
+        assert not allowed and 0 < wait <= 0.05
+        time.sleep(0.06)
+        assert backend.take("fast", 1, 20)[0]
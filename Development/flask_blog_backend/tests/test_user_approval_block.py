@@ -1,8 +1,15 @@
 import pytest
+from sqlalchemy import select, text
+
 from app.extensions import db
 from app.models.user import User
+from app.models.contact import ContactMessage
+from app.models.rejections import RejectedRequest
+from app.utils.search import contains, iequals
 
-from tests.utils import register_any_user, login
+from tests.utils import (
+    register_any_user, login, create_user, auth_header, count_queries, SharedStoreStandIn
+)
 
 
 @pytest.mark.parametrize("approver_role,target_role,expected_status", [
@@ -73,5 +80,116 @@ def test_block_user_by_role(client, blocker_role, target_role, expected_status):
         assert refreshed.is_blocked, f"{target_role} should be marked as blocked"
 
 
+def explain(stmt):
+    """Plan for `stmt` with sequential scans priced out, as a single string."""
+    compiled = stmt.compile(dialect=db.engine.dialect)
+    db.session.execute(text("SET LOCAL enable_seqscan = off"))
+    rows = db.session.connection().exec_driver_sql(
+        f"EXPLAIN {compiled}", compiled.params
+    ).scalars().all()
+    db.session.rollback()
+    return "\n".join(rows)
+
+
+def test_admin_substring_searches_use_trigram_indexes(client):
+    plan = explain(select(User.id).where(contains("ali", User.username, User.email)))
+    assert "ix_users_username_trgm" in plan
+    assert "ix_users_email_trgm" in plan
+
+    plan = explain(select(ContactMessage.id).where(contains(
+        "refund", ContactMessage.email, ContactMessage.subject, ContactMessage.message
+    )))
+    assert "ix_contact_message_email_trgm" in plan
+    assert "ix_contact_message_subject_trgm" in plan
+    assert "ix_contact_message_message_trgm" in plan
+
+    plan = explain(select(RejectedRequest.id).where(iequals(RejectedRequest.title, "Some Title")))
+    assert "ix_rejected_requests_title_trgm" in plan
+
+
+def test_user_search_treats_wildcards_literally(client):
+    admin = create_user("superadmin")
+    literal = create_user("commentator")
+    lookalike = create_user("author")
+    literal.username = "box_yard"
+    lookalike.username = "boxeyard"
+    db.session.commit()
+
+    res = client.get("/api/users/all-users?search=%25", headers=auth_header(admin))
+    assert res.status_code == 200
+    assert res.json["results"] == []
+
+    res = client.get("/api/users/all-users?search=x_y", headers=auth_header(admin))
+    assert [u["id"] for u in res.json["results"]] == [literal.id]
+
+
+def test_authenticated_request_loads_the_user_once(client):
+    admin = create_user("admin")
+    headers = auth_header(admin)
+    db.session.expire_all()  # nothing served from the identity map
+
+    with count_queries() as statements:
+        r = client.get("/api/auth/user/me", headers=headers)
+    assert r.status_code == 200
+    assert r.json["id"] == admin.id
+    assert sum("FROM users" in s for s in statements) == 1
+
+
+def test_identity_context_rejects_blocked_and_rotated_sessions(client):
+    user = create_user("author")
+    headers = auth_header(user)
+    assert client.get("/api/auth/user/me", headers=headers).status_code == 200
+
+    user.session_token = "rotated"
+    db.session.commit()
+    assert client.get("/api/auth/user/me", headers=headers).status_code == 401
+
+    blocked = create_user("author", blocked=True)
+    assert client.get("/api/auth/user/me", headers=auth_header(blocked)).status_code == 401
+
+
+def test_session_cache_skips_users_query_and_revokes_immediately(client, app):
+    from app.utils import session_cache
+    from app.utils.response_cache import RedisBackend
+
+    cache = session_cache.init_app(app, backend=RedisBackend(SharedStoreStandIn()))
+    superadmin = create_user("superadmin")
+    admin = create_user("admin")
+    headers = auth_header(admin)
+
+    assert client.put("/api/contact/mark_read/999999", headers=headers).status_code == 404
+    with count_queries() as statements:
+        r = client.put("/api/contact/mark_read/999999", headers=headers)
+    assert r.status_code == 404
+    assert not any("FROM users" in s for s in statements)
+
+    # A role change applies to the open session, not the role in the token
+    r = client.patch(f"/api/users/update-role/{admin.id}", json={"role": "author"},
+                     headers=auth_header(superadmin))
+    assert r.status_code == 200
+    assert client.put("/api/contact/mark_read/999999", headers=headers).status_code == 403
+
+    r = client.put(f"/api/users/block/{admin.id}", headers=auth_header(superadmin))
+    assert r.status_code == 200
+    assert client.put("/api/contact/mark_read/999999", headers=headers).status_code == 401
+
+    stats = cache.stats()
+    assert stats["hits"] >= 2
+    assert stats["misses"] >= 3
+    assert stats["invalidations"] == 2
+
 
+def test_password_reset_revokes_cached_session(client, app):
+    from app.routes.auth import get_serializer
+    from app.utils import session_cache
+
+    session_cache.init_app(app, backend=session_cache.MemoryBackend())
+    user = create_user("author")
+    headers = auth_header(user)
+    assert client.get("/api/auth/user/me", headers=headers).status_code == 200
+    assert client.get("/api/auth/user/me", headers=headers).status_code == 200
 
+    token = get_serializer().dumps(user.email, salt="password-reset-salt")
+    r = client.post("/api/auth/reset-password/confirm", json={"token": token, "new_password": "new-password"})
+    assert r.status_code == 200
+    assert client.get("/api/auth/user/me", headers=headers).status_code == 401
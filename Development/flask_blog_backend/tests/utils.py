@@ -1,6 +1,16 @@
+import threading
+import time
+import uuid
+from contextlib import contextmanager
 from datetime import datetime, timezone
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
 from app.extensions import db
 from app.models.user import User
+from app.models.post import Post
+from app.models.image import Image
+from app.utils import rate_limit
 
 
 def unique_credentials(role):
@@ -38,3 +48,94 @@ def login(client, email):
         "password": "password"
     })
 
+
+
+def create_user(role, approved=True, blocked=False):
+    """Insert a confirmed user directly, bypassing the registration flow."""
+    suffix = uuid.uuid4().hex[:8]
+    user = User(
+        username=f"{role}_user_{suffix}",
+        email=f"{role}_{suffix}@test.com",
+        password=generate_password_hash("password"),
+        role=role,
+        is_approved=approved,
+        is_blocked=blocked,
+        is_confirmed=True,
+    )
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def auth_header(user):
+    token = create_access_token(
+        identity=str(user.id),
+        additional_claims={"role": user.role, "session_token": user.session_token},
+    )
+    return {"Authorization": f"Bearer {token}"}
+
+
+def create_post(author, title=None, published=True):
+    """Insert a post (with one image row) directly."""
+    post = Post(
+        title=title or f"Post {uuid.uuid4().hex[:8]}",
+        content="Post content",
+        author_id=author.id,
+        is_published=published,
+    )
+    db.session.add(post)
+    db.session.flush()
+    db.session.add(Image(file_path="post_test.jpg", post_id=post.id))
+    db.session.commit()
+    return post
+
+
+@contextmanager
+def count_queries():
+    """Collect every SQL statement sent to the database inside the block."""
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", _record)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, "before_cursor_execute", _record)
+
+
+class SharedStoreStandIn:
+    """In-memory replacement for the Redis client used by RedisBackend."""
+
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def incr(self, key, amount=1):
+        self.data[key] = int(self.data.get(key, 0)) + amount
+        return self.data[key]
+
+    def delete(self, key):
+        return int(self.data.pop(key, None) is not None)
+
+    def eval(self, script, numkeys, *keys_and_args):
+        """Runs the rate limiter's token-bucket script, atomically like Redis."""
+        assert script == rate_limit.TOKEN_BUCKET_SCRIPT, "unsupported script"
+        key = keys_and_args[0]
+        burst, rate, cost = (float(arg) for arg in keys_and_args[numkeys:])
+        with self.lock:
+            tokens, updated = self.data.get(key, (None, None))
+            now = time.time()
+            allowed, tokens, wait = rate_limit.take_token(tokens, updated, now, burst, rate, cost)
+            self.data[key] = (tokens, now)
+        return [int(allowed), str(tokens).encode(), str(wait).encode()]